@@ -0,0 +1,32 @@
+-- Indexes for the hot query paths of DatabaseManager. All statements are idempotent.
+
+-- fetch_user_transaction_history / fetch_transaction_histories: user_id = ? AND transaction_timestamp >= ?
+-- Covers every transactions column the history queries read, so only the merchant join touches another table.
+CREATE INDEX IF NOT EXISTS idx_transactions_user_ts
+    ON transactions (user_id, transaction_timestamp)
+    INCLUDE (device_id, transaction_amount_usd, transaction_status, payment_id, transaction_country, merchant_id,
+             transaction_channel);
+
+-- fetch_device_recent_transactions: device_id = ? AND transaction_timestamp >= ? (index only scan)
+CREATE INDEX IF NOT EXISTS idx_transactions_device_ts
+    ON transactions (device_id, transaction_timestamp);
+
+-- fetch_active_payment_method: user_id = ? AND payment_is_active = 1 ORDER BY created_at LIMIT 1
+-- Partial index, deactivated payment methods (most of them after card probing) are never indexed.
+CREATE INDEX IF NOT EXISTS idx_payment_methods_user_active_created
+    ON payment_methods (user_id, created_at)
+    WHERE payment_is_active = 1;
+
+-- fetch_random_device_id: user_id = ?
+CREATE INDEX IF NOT EXISTS idx_user_devices_user
+    ON user_devices (user_id)
+    INCLUDE (device_id);
+
+-- Lookups of alerts by transaction and the fk_alert_transaction check on transaction deletes
+CREATE INDEX IF NOT EXISTS idx_fraud_alerts_transaction
+    ON fraud_alerts (transaction_id);
+
+ANALYZE transactions;
+ANALYZE payment_methods;
+ANALYZE user_devices;
+ANALYZE fraud_alerts;
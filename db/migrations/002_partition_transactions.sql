@@ -0,0 +1,93 @@
+-- Converts transactions into a table range partitioned by month on transaction_timestamp, so history queries only
+-- touch the newest partitions and old months can be detached/dropped instead of deleted row by row.
+-- Partitions are named transactions_pYYYY_MM, new ones are created by DatabaseManager.create_transaction_partitions.
+-- Skipped if transactions is already partitioned.
+DO $$
+DECLARE
+    month_start timestamp;
+    last_month timestamp;
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_partitioned_table pt
+        JOIN pg_class c ON c.oid = pt.partrelid
+        WHERE c.relname = 'transactions'
+    ) THEN
+        RETURN;
+    END IF;
+
+    -- Every unique constraint of a partitioned table has to contain the partition key. fraud_alerts only stores the
+    -- transaction_id, so the alert foreign key can't be kept.
+    ALTER TABLE fraud_alerts DROP CONSTRAINT IF EXISTS fk_alert_transaction;
+
+    ALTER TABLE transactions RENAME TO transactions_unpartitioned;
+    ALTER INDEX IF EXISTS transactions_pkey RENAME TO transactions_unpartitioned_pkey;
+    DROP INDEX IF EXISTS idx_transactions_user_ts;
+    DROP INDEX IF EXISTS idx_transactions_device_ts;
+
+    CREATE TABLE transactions (
+        transaction_id UUID NOT NULL DEFAULT gen_random_uuid(),
+        transaction_amount_local NUMERIC(15,2),
+        transaction_amount_usd NUMERIC(15,2),
+        transaction_timestamp timestamp NOT NULL,
+        transaction_status varchar(255),
+        transaction_currency varchar(255),
+        transaction_country varchar(255),
+        transaction_channel varchar(255),
+        user_id integer NOT NULL,
+        merchant_id integer NOT NULL,
+        payment_id integer NOT NULL,
+        device_id integer NOT NULL,
+        is_fraudulent integer,
+        fraud_type varchar(255),
+        PRIMARY KEY (transaction_id, transaction_timestamp)
+    ) PARTITION BY RANGE (transaction_timestamp);
+
+    ALTER TABLE transactions_unpartitioned DROP CONSTRAINT IF EXISTS fk_transaction_user;
+    ALTER TABLE transactions_unpartitioned DROP CONSTRAINT IF EXISTS fk_transaction_merchant;
+    ALTER TABLE transactions_unpartitioned DROP CONSTRAINT IF EXISTS fk_transaction_payment;
+    ALTER TABLE transactions_unpartitioned DROP CONSTRAINT IF EXISTS fk_transaction_device;
+
+    ALTER TABLE transactions
+        ADD CONSTRAINT fk_transaction_user FOREIGN KEY (user_id) REFERENCES users (user_id) ON DELETE RESTRICT;
+    ALTER TABLE transactions
+        ADD CONSTRAINT fk_transaction_merchant FOREIGN KEY (merchant_id) REFERENCES merchants (merchant_id);
+    ALTER TABLE transactions
+        ADD CONSTRAINT fk_transaction_payment FOREIGN KEY (payment_id) REFERENCES payment_methods (payment_method_id);
+    ALTER TABLE transactions
+        ADD CONSTRAINT fk_transaction_device FOREIGN KEY (device_id) REFERENCES user_devices (device_id);
+
+    -- Safety net for rows outside the created months. Keep it empty: a new month can't be attached while the default
+    -- partition holds rows of that month.
+    CREATE TABLE transactions_default PARTITION OF transactions DEFAULT;
+
+    -- Monthly partitions from the oldest existing row up to three months ahead
+    SELECT date_trunc('month', COALESCE(MIN(transaction_timestamp), NOW())) INTO month_start FROM transactions_unpartitioned;
+    last_month := date_trunc('month', NOW()) + INTERVAL '3 months';
+    WHILE month_start <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF transactions FOR VALUES FROM (%L) TO (%L)',
+            'transactions_p' || to_char(month_start, 'YYYY_MM'), month_start, month_start + INTERVAL '1 month'
+        );
+        month_start := month_start + INTERVAL '1 month';
+    END LOOP;
+
+    INSERT INTO transactions (transaction_id, transaction_amount_local, transaction_amount_usd, transaction_timestamp,
+                              transaction_status, transaction_currency, transaction_country, transaction_channel,
+                              user_id, merchant_id, payment_id, device_id, is_fraudulent, fraud_type)
+    SELECT transaction_id, transaction_amount_local, transaction_amount_usd, transaction_timestamp,
+           transaction_status, transaction_currency, transaction_country, transaction_channel,
+           user_id, merchant_id, payment_id, device_id, is_fraudulent, fraud_type
+    FROM transactions_unpartitioned;
+
+    DROP TABLE transactions_unpartitioned;
+
+    -- Indexes of migration 001, created on the parent so every partition (including future ones) gets them
+    CREATE INDEX idx_transactions_user_ts
+        ON transactions (user_id, transaction_timestamp)
+        INCLUDE (device_id, transaction_amount_usd, transaction_status, payment_id, transaction_country, merchant_id,
+                 transaction_channel);
+    CREATE INDEX idx_transactions_device_ts
+        ON transactions (device_id, transaction_timestamp);
+END $$;
+
+ANALYZE transactions;
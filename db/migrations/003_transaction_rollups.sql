@@ -0,0 +1,160 @@
+-- Pre-aggregated hourly and daily buckets per user and per device, maintained on insert by a statement level trigger.
+-- The streaming job reads 24 hours of raw transactions and takes the 7 day amounts, 30 day merchant categories and the
+-- last transaction from O(buckets) rollup rows (DatabaseManager.fetch_users_rollup_aggregates) instead of up to
+-- 30 days of raw rows. Windows are aligned to bucket boundaries, so a 7 day window covers up to one more hour.
+
+-- Fixed bit per merchant category for the category_bits columns (bit n <=> 1::bigint << n). Categories without a bit
+-- don't set any bit, new categories have to be added here.
+CREATE TABLE IF NOT EXISTS merchant_category_bits (
+    merchant_category varchar(255) PRIMARY KEY,
+    bit smallint NOT NULL UNIQUE CHECK (bit BETWEEN 0 AND 62)
+);
+
+INSERT INTO merchant_category_bits (merchant_category, bit) VALUES
+    ('Groceries', 0),
+    ('Electronics', 1),
+    ('Restaurants', 2),
+    ('Travel', 3),
+    ('Clothing', 4),
+    ('Gift Cards', 5),
+    ('Healthcare', 6),
+    ('Other', 7)
+ON CONFLICT (merchant_category) DO NOTHING;
+
+-- Amounts are transaction_amount_usd. Sample stddev = sqrt((amount_sumsq - amount_sum^2 / n) / (n - 1))
+CREATE TABLE IF NOT EXISTS user_transaction_rollups_hourly (
+    user_id integer NOT NULL,
+    bucket_start timestamp NOT NULL,
+    transaction_count integer NOT NULL,
+    amount_sum NUMERIC(20,2) NOT NULL,
+    amount_sumsq NUMERIC(30,4) NOT NULL,
+    decline_count integer NOT NULL,
+    category_bits bigint NOT NULL,
+    PRIMARY KEY (user_id, bucket_start)
+);
+
+CREATE TABLE IF NOT EXISTS user_transaction_rollups_daily (LIKE user_transaction_rollups_hourly INCLUDING ALL);
+CREATE TABLE IF NOT EXISTS device_transaction_rollups_hourly (
+    device_id integer NOT NULL,
+    bucket_start timestamp NOT NULL,
+    transaction_count integer NOT NULL,
+    amount_sum NUMERIC(20,2) NOT NULL,
+    amount_sumsq NUMERIC(30,4) NOT NULL,
+    decline_count integer NOT NULL,
+    category_bits bigint NOT NULL,
+    PRIMARY KEY (device_id, bucket_start)
+);
+CREATE TABLE IF NOT EXISTS device_transaction_rollups_daily (LIKE device_transaction_rollups_hourly INCLUDING ALL);
+
+-- One pass over the inserted rows (transition table) feeds all four rollups. Also fires for COPY and multi row inserts.
+CREATE OR REPLACE FUNCTION rollup_inserted_transactions() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    WITH src AS (
+        SELECT n.user_id, n.device_id, n.transaction_timestamp,
+               COALESCE(n.transaction_amount_usd, 0) AS amount,
+               (n.transaction_status = 'Declined')::integer AS declined,
+               COALESCE(1::bigint << b.bit, 0) AS category_bit
+        FROM inserted_transactions n
+        JOIN merchants m ON m.merchant_id = n.merchant_id
+        LEFT JOIN merchant_category_bits b ON b.merchant_category = m.merchant_category
+        WHERE n.transaction_timestamp IS NOT NULL
+    ),
+    user_hourly AS (
+        INSERT INTO user_transaction_rollups_hourly AS r
+        SELECT user_id, date_trunc('hour', transaction_timestamp), COUNT(*), SUM(amount), SUM(amount * amount),
+               SUM(declined), bit_or(category_bit)
+        FROM src GROUP BY 1, 2
+        ON CONFLICT (user_id, bucket_start) DO UPDATE SET
+            transaction_count = r.transaction_count + EXCLUDED.transaction_count,
+            amount_sum = r.amount_sum + EXCLUDED.amount_sum,
+            amount_sumsq = r.amount_sumsq + EXCLUDED.amount_sumsq,
+            decline_count = r.decline_count + EXCLUDED.decline_count,
+            category_bits = r.category_bits | EXCLUDED.category_bits
+    ),
+    user_daily AS (
+        INSERT INTO user_transaction_rollups_daily AS r
+        SELECT user_id, date_trunc('day', transaction_timestamp), COUNT(*), SUM(amount), SUM(amount * amount),
+               SUM(declined), bit_or(category_bit)
+        FROM src GROUP BY 1, 2
+        ON CONFLICT (user_id, bucket_start) DO UPDATE SET
+            transaction_count = r.transaction_count + EXCLUDED.transaction_count,
+            amount_sum = r.amount_sum + EXCLUDED.amount_sum,
+            amount_sumsq = r.amount_sumsq + EXCLUDED.amount_sumsq,
+            decline_count = r.decline_count + EXCLUDED.decline_count,
+            category_bits = r.category_bits | EXCLUDED.category_bits
+    ),
+    device_hourly AS (
+        INSERT INTO device_transaction_rollups_hourly AS r
+        SELECT device_id, date_trunc('hour', transaction_timestamp), COUNT(*), SUM(amount), SUM(amount * amount),
+               SUM(declined), bit_or(category_bit)
+        FROM src GROUP BY 1, 2
+        ON CONFLICT (device_id, bucket_start) DO UPDATE SET
+            transaction_count = r.transaction_count + EXCLUDED.transaction_count,
+            amount_sum = r.amount_sum + EXCLUDED.amount_sum,
+            amount_sumsq = r.amount_sumsq + EXCLUDED.amount_sumsq,
+            decline_count = r.decline_count + EXCLUDED.decline_count,
+            category_bits = r.category_bits | EXCLUDED.category_bits
+    )
+    INSERT INTO device_transaction_rollups_daily AS r
+    SELECT device_id, date_trunc('day', transaction_timestamp), COUNT(*), SUM(amount), SUM(amount * amount),
+           SUM(declined), bit_or(category_bit)
+    FROM src GROUP BY 1, 2
+    ON CONFLICT (device_id, bucket_start) DO UPDATE SET
+        transaction_count = r.transaction_count + EXCLUDED.transaction_count,
+        amount_sum = r.amount_sum + EXCLUDED.amount_sum,
+        amount_sumsq = r.amount_sumsq + EXCLUDED.amount_sumsq,
+        decline_count = r.decline_count + EXCLUDED.decline_count,
+        category_bits = r.category_bits | EXCLUDED.category_bits;
+
+    RETURN NULL;
+END;
+$$;
+
+-- Creating the trigger locks transactions against writes until the migration commits, so the backfill below sees every
+-- row that is not counted by the trigger.
+DROP TRIGGER IF EXISTS trg_transactions_rollup ON transactions;
+CREATE TRIGGER trg_transactions_rollup
+    AFTER INSERT ON transactions
+    REFERENCING NEW TABLE AS inserted_transactions
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION rollup_inserted_transactions();
+
+-- Backfill from the existing transactions
+TRUNCATE user_transaction_rollups_hourly, user_transaction_rollups_daily,
+         device_transaction_rollups_hourly, device_transaction_rollups_daily;
+
+CREATE TEMPORARY TABLE rollup_backfill_src ON COMMIT DROP AS
+SELECT t.user_id, t.device_id, t.transaction_timestamp,
+       COALESCE(t.transaction_amount_usd, 0) AS amount,
+       (t.transaction_status = 'Declined')::integer AS declined,
+       COALESCE(1::bigint << b.bit, 0) AS category_bit
+FROM transactions t
+JOIN merchants m ON m.merchant_id = t.merchant_id
+LEFT JOIN merchant_category_bits b ON b.merchant_category = m.merchant_category
+WHERE t.transaction_timestamp IS NOT NULL;
+
+INSERT INTO user_transaction_rollups_hourly
+SELECT user_id, date_trunc('hour', transaction_timestamp), COUNT(*), SUM(amount), SUM(amount * amount),
+       SUM(declined), bit_or(category_bit)
+FROM rollup_backfill_src GROUP BY 1, 2;
+
+INSERT INTO user_transaction_rollups_daily
+SELECT user_id, date_trunc('day', transaction_timestamp), COUNT(*), SUM(amount), SUM(amount * amount),
+       SUM(declined), bit_or(category_bit)
+FROM rollup_backfill_src GROUP BY 1, 2;
+
+INSERT INTO device_transaction_rollups_hourly
+SELECT device_id, date_trunc('hour', transaction_timestamp), COUNT(*), SUM(amount), SUM(amount * amount),
+       SUM(declined), bit_or(category_bit)
+FROM rollup_backfill_src GROUP BY 1, 2;
+
+INSERT INTO device_transaction_rollups_daily
+SELECT device_id, date_trunc('day', transaction_timestamp), COUNT(*), SUM(amount), SUM(amount * amount),
+       SUM(declined), bit_or(category_bit)
+FROM rollup_backfill_src GROUP BY 1, 2;
+
+ANALYZE user_transaction_rollups_hourly;
+ANALYZE user_transaction_rollups_daily;
+ANALYZE device_transaction_rollups_hourly;
+ANALYZE device_transaction_rollups_daily;
@@ -0,0 +1,116 @@
+# Builds fixed size benchmark datasets (TPC style scale factors) as parquet. The same scale factor always produces the
+# same rows, so feature engineering, training and streaming runs can be compared against each other.
+import argparse
+import json
+import math
+import shutil
+import time
+from datetime import datetime
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.DatasetBuilder import ShardedDatasetBuilder
+from src.EntityStateStore import TABLE_LOAD_ORDER
+from src.constants import (
+    BENCHMARK_PATH, BENCHMARK_DATASET_PARAMS, BENCHMARK_CONVERSION_RATES, SHARDED_INIT_PARAMS
+)
+
+
+ROOT = Path(__file__).resolve().parent.parent
+DATASET_FILE = "dataset.json"
+SHARDS_DIR = "_shards"
+
+
+def scale_factor_config(scale_factor: int) -> dict:
+    """
+    Derives the dataset size of a scale factor. Shards have a fixed number of users, so the shard layout (and with it
+    every derived seed) only depends on the scale factor.
+
+    Args:
+        scale_factor (int): Scale factor, e.g. 1, 10 or 100
+    Returns:
+        dict: scale_factor, n_users, n_merchants, n_shards, seed, as_of
+    Raises:
+        ValueError: If scale_factor is not positive.
+    """
+    if scale_factor <= 0:
+        raise ValueError(f"Scale factor must be positive, got {scale_factor}")
+
+    n_users = scale_factor * BENCHMARK_DATASET_PARAMS["users_per_scale_factor"]
+    return {
+        "scale_factor": scale_factor,
+        "n_users": n_users,
+        "n_merchants": scale_factor * BENCHMARK_DATASET_PARAMS["merchants_per_scale_factor"],
+        "n_shards": math.ceil(n_users / BENCHMARK_DATASET_PARAMS["users_per_shard"]),
+        "seed": BENCHMARK_DATASET_PARAMS["seed"],
+        "as_of": BENCHMARK_DATASET_PARAMS["as_of"],
+    }
+
+
+def build_benchmark_dataset(scale_factor: int, output_dir: Path, workers: int | None, keep_shards: bool) -> dict:
+    """
+    Builds the dataset of a scale factor into <output_dir>/<table>/part-<n>.parquet (merchants, users, user_devices,
+    payment_methods and transactions with is_fraudulent/fraud_type labels) and describes it in dataset.json. Shards are
+    built in <output_dir>/_shards and resume after an interruption. A complete dataset is not built again.
+
+    Args:
+        scale_factor (int): Scale factor, e.g. 1, 10 or 100
+        output_dir (Path): Output directory of the dataset
+        workers (int | None): Number of worker processes, None for one per CPU
+        keep_shards (bool): Keep the shard files after merging
+    Returns:
+        dict: Content of dataset.json
+    """
+    config = scale_factor_config(scale_factor)
+    dataset_path = output_dir / DATASET_FILE
+    if dataset_path.exists():
+        with open(dataset_path, encoding="utf-8") as f:
+            dataset = json.load(f)
+        if dataset["config"] == config:
+            print(f"SF{scale_factor} already built in {output_dir}")
+            return dataset
+        raise ValueError(f"{output_dir} contains a different dataset ({dataset['config']}), use another --output")
+
+    builder = ShardedDatasetBuilder(
+        output_dir / SHARDS_DIR,
+        n_users=config["n_users"],
+        n_merchants=config["n_merchants"],
+        n_shards=config["n_shards"],
+        seed=config["seed"],
+        users_per_chunk=SHARDED_INIT_PARAMS["users_per_chunk"],
+        as_of=datetime.fromisoformat(config["as_of"]),
+        conversion_rates=BENCHMARK_CONVERSION_RATES,
+    )
+
+    start = time.perf_counter()
+    builder.build(workers=workers)
+    for table in TABLE_LOAD_ORDER:
+        shutil.rmtree(output_dir / table, ignore_errors=True)  # Leftovers of an interrupted merge
+    rows = builder.write_merged(output_dir)
+
+    dataset = {"config": config, "rows": rows, "build_seconds": round(time.perf_counter() - start, 2)}
+    with open(dataset_path, "w", encoding="utf-8") as f:
+        json.dump(dataset, f, indent=2)
+
+    if not keep_shards:
+        shutil.rmtree(output_dir / SHARDS_DIR)
+
+    return dataset
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a deterministic scale factor benchmark dataset as parquet")
+    parser.add_argument("--scale-factor", type=int, required=True, help="SF1 = 100k users, e.g. 1, 10 or 100")
+    parser.add_argument("--output", type=Path, default=None, help="Output directory, defaults to data/benchmark/sf<N>")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes, defaults to one per CPU")
+    parser.add_argument("--keep-shards", action="store_true", help="Keep the shard files after merging")
+    args = parser.parse_args()
+
+    output_dir = args.output or ROOT / BENCHMARK_PATH / f"sf{args.scale_factor}"
+    dataset = build_benchmark_dataset(args.scale_factor, output_dir, args.workers, args.keep_shards)
+
+    print(f"\nSF{args.scale_factor} dataset in {output_dir}:")
+    for table in TABLE_LOAD_ORDER:
+        print(f"  {table:<16} {dataset['rows'][table]:>12} rows")
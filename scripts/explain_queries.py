@@ -0,0 +1,175 @@
+# EXPLAIN ANALYZE report for the queries DatabaseManager runs on the hot paths. Run it before and after applying
+# migrations to measure index wins instead of guessing them.
+import argparse
+import json
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.DatabaseManager import DatabaseManager
+
+
+# Query text mirrors the corresponding DatabaseManager methods. Parameters are filled from sample_parameters().
+HOT_QUERIES = {
+    "fetch_user_transaction_history": """
+        SELECT t.user_id, t.device_id, t.transaction_amount_usd, t.transaction_status, t.payment_id,
+               t.transaction_timestamp, t.transaction_country, t.merchant_id, t.transaction_channel,
+               m.merchant_category
+        FROM transactions t
+        JOIN merchants m ON t.merchant_id = m.merchant_id
+        WHERE t.user_id = %(user_id)s
+        AND t.transaction_timestamp >= NOW() - INTERVAL '%(hours)s hours'
+        ORDER BY t.transaction_timestamp ASC
+    """,
+    "fetch_transaction_histories": """
+        SELECT t.user_id, t.device_id, t.transaction_amount_usd, t.transaction_status, t.payment_id,
+               t.transaction_timestamp, t.transaction_country, t.merchant_id, t.transaction_channel,
+               m.merchant_category
+        FROM transactions t
+        JOIN merchants m ON t.merchant_id = m.merchant_id
+        WHERE (t.user_id = ANY(%(user_ids)s) OR t.device_id = ANY(%(device_ids)s))
+        AND t.transaction_timestamp >= NOW() - INTERVAL '%(hours)s hours'
+        ORDER BY t.transaction_timestamp ASC
+    """,
+    "fetch_device_recent_transactions": """
+        SELECT device_id, transaction_timestamp
+        FROM transactions
+        WHERE device_id = %(device_id)s
+        AND transaction_timestamp >= NOW() - INTERVAL '%(hours)s hours'
+        ORDER BY transaction_timestamp ASC
+    """,
+    "fetch_active_payment_method": """
+        SELECT *
+        FROM payment_methods
+        WHERE user_id = %(user_id)s AND payment_is_active = 1
+        ORDER BY created_at ASC
+        LIMIT 1
+    """,
+    "fetch_payment_info": """
+        SELECT *
+        FROM payment_methods
+        WHERE payment_method_id = %(payment_id)s
+    """,
+    "deactivate_payment_method": """
+        UPDATE payment_methods
+        SET payment_is_active = 0
+        WHERE payment_method_id = %(payment_id)s
+    """,
+    "fetch_merchant_info": """
+        SELECT * FROM merchants
+        WHERE merchant_id = %(merchant_id)s
+    """,
+    "fetch_random_user_id": """
+        SELECT user_id
+        FROM users
+        ORDER BY RANDOM()
+        LIMIT 1
+    """,
+    "fetch_random_device_id": """
+        SELECT device_id
+        FROM user_devices
+        WHERE user_id = %(user_id)s
+        ORDER BY RANDOM()
+        LIMIT 1
+    """,
+}
+
+
+def sample_parameters(dbm: DatabaseManager, hours: int) -> dict:
+    """
+    Picks realistic worst case parameters: the user with the most transactions, plus one of their devices, payment
+    methods and merchants.
+
+    Args:
+        dbm (DatabaseManager): DatabaseManager instance
+        hours (int): Look back window for the history queries
+    Returns:
+        dict: Named query parameters
+    """
+    with dbm.get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT user_id, device_id, payment_id, merchant_id
+                FROM transactions
+                WHERE user_id = (SELECT user_id FROM transactions GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT 1)
+                LIMIT 1;
+            """)
+            row = cursor.fetchone()
+
+    if row is None:
+        raise RuntimeError("The transactions table is empty, seed it with scripts/init_data.py first")
+
+    user_id, device_id, payment_id, merchant_id = row
+    return {
+        "user_id": user_id,
+        "device_id": device_id,
+        "payment_id": payment_id,
+        "merchant_id": merchant_id,
+        "user_ids": [user_id],
+        "device_ids": [device_id],
+        "hours": hours,
+    }
+
+
+def _plan_nodes(plan: dict) -> list[str]:
+    """Flattens a JSON plan tree into 'Node Type [on index]' strings."""
+    node = plan["Node Type"]
+    if "Index Name" in plan:
+        node += f" using {plan['Index Name']}"
+    elif "Relation Name" in plan:
+        node += f" on {plan['Relation Name']}"
+
+    nodes = [node]
+    for child in plan.get("Plans", []):
+        nodes.extend(_plan_nodes(child))
+    return nodes
+
+
+def run_report(dbm: DatabaseManager, hours: int, repeat: int) -> dict:
+    """
+    Runs EXPLAIN ANALYZE for every hot query and keeps the fastest of `repeat` runs, so cold caches don't skew the
+    numbers.
+
+    Args:
+        dbm (DatabaseManager): DatabaseManager instance
+        hours (int): Look back window for the history queries
+        repeat (int): Number of runs per query
+    Returns:
+        dict: Per query planning/execution time in ms, shared buffer hits/reads and the plan nodes
+    """
+    params = sample_parameters(dbm, hours)
+    report = {}
+
+    for name, query in HOT_QUERIES.items():
+        runs = [dbm.explain_analyze(query, params) for _ in range(repeat)]
+        best = min(runs, key=lambda run: run["Execution Time"])
+        report[name] = {
+            "planning_ms": round(best["Planning Time"], 3),
+            "execution_ms": round(best["Execution Time"], 3),
+            "shared_hit_blocks": best["Plan"].get("Shared Hit Blocks"),
+            "shared_read_blocks": best["Plan"].get("Shared Read Blocks"),
+            "plan": _plan_nodes(best["Plan"]),
+        }
+
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE report for DatabaseManager queries")
+    parser.add_argument("--hours", type=int, default=720, help="Look back window for history queries")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per query, the fastest one is reported")
+    parser.add_argument("--output", type=str, default=None, help="Optional path to write the report as JSON")
+    args = parser.parse_args()
+
+    report = run_report(DatabaseManager(), hours=args.hours, repeat=args.repeat)
+
+    for name, entry in report.items():
+        print(f"{name:<36} plan {entry['planning_ms']:>8.3f} ms  exec {entry['execution_ms']:>9.3f} ms")
+        for node in entry["plan"]:
+            print(f"    {node}")
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"Report written to {args.output}")
@@ -1,59 +1,316 @@
 # Initial script to fill the database with sample data. Needed for initial model training and before kafka streaming
+import argparse
+import random
+import time
+from datetime import datetime
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
 import src.DatabaseManager as DBM
 import src.DataGenerator as DG
 import src.CurrencyConvertor as CC
 import src.TransactionGenerator as TG
 import src.utility as util
-from src.constants import INIT_DATA_PARAMS
+from src.DatasetBuilder import ShardedDatasetBuilder, generate_user_patterns
+from src.EntityStateStore import (
+    TABLE_COLUMNS, TABLE_LOAD_ORDER, ID_COLUMNS, write_parquet_batches, write_copy_batches
+)
+from src.constants import INIT_DATA_PARAMS, SHARDED_INIT_PARAMS, TRANSACTION_PARTITION_PARAMS
 
-import random
-from datetime import datetime
 
+def _print_throughput(table_stats: dict, label: str) -> None:
+    """
+    Prints rows and rows/sec per table.
+
+    Args:
+        table_stats (dict): {table: {"rows": int, "seconds": float}}
+        label (str): Name of the seeding mode, printed as header
+    Returns:
+        None
+    """
+    print(f"\n{label} throughput:")
+    for table, stats in table_stats.items():
+        rate = stats["rows"] / stats["seconds"] if stats["seconds"] > 0 else 0.0
+        print(f"  {table:<16} {stats['rows']:>10} rows  {stats['seconds']:>9.2f}s  {rate:>12.1f} rows/s")
+
+
+def seed_row_by_row(n_users: int, n_merchants: int) -> None:
+    """
+    Seeds the database with one INSERT and commit per entity. Transactions of one pattern are written together.
+
+    Args:
+        n_users (int): Number of users to generate
+        n_merchants (int): Number of merchants to generate
+    Returns:
+        None
+    """
+    # Initialize all DataGenerator classes
+    UserGen = DG.UserGenerator()
+    DeviceGen = DG.DeviceGenerator()
+    PaymentMethodGen = DG.PaymentMethodGenerator()
+    MerchantGen = DG.MerchantGenerator()
+
+    # Initialize DataBaseManage and CurrencyConvertor classes
+    DBManager = DBM.create_database_manager(pooled=True, min_connections=1, max_connections=1)
+    CurrencyConvertor = CC.CurrencyConvertor()
+
+    # Get conv rates and initialize TransactionGenerator
+    conversion_rates = CurrencyConvertor.fetch_conversion_rates()
+    TransactionGen = TG.TransactionGenerator(conversion_rates=conversion_rates, db_manager=DBManager)
+
+    # Payment methods are written inside the generator and are therefore not timed here
+    table_stats = {table: {"rows": 0, "seconds": 0.0} for table in ["merchants", "users", "user_devices", "transactions"]}
+
+    start = time.perf_counter()
+    for m in range(n_merchants):
+        print(f"Generating Merchant: {m}")
+        merchant_data = MerchantGen.generate_merchant()
+        DBManager.insert_merchant(merchant_data)
+    table_stats["merchants"] = {"rows": n_merchants, "seconds": time.perf_counter() - start}
+
+    merchant_ids = DBManager.fetch_all_merchant_ids()
+    now = datetime.now()
+
+    for u in range(n_users):
+        print(f"Generating User: {u}")
+        generated_timestamp = util.generate_random_past_timestamp()
+        user = UserGen.generate_user(generated_timestamp)
+
+        start = time.perf_counter()
+        user_id = DBManager.insert_user(user)
+        table_stats["users"]["seconds"] += time.perf_counter() - start
+        table_stats["users"]["rows"] += 1
+
+        user_device = DeviceGen.generate_device(user_id, generated_timestamp)
+        start = time.perf_counter()
+        device_id = DBManager.insert_device(user_device)
+        table_stats["user_devices"]["seconds"] += time.perf_counter() - start
+        table_stats["user_devices"]["rows"] += 1
+
+        user_payment_method = PaymentMethodGen.generate_payment_method(user_id, generated_timestamp)
+        DBManager.insert_payment_method(user_payment_method)
+
+        pattern_timestamp = generated_timestamp
+        for _ in range(random.randint(INIT_DATA_PARAMS["min_patterns"], INIT_DATA_PARAMS["max_patterns"])):
+            merchant_id = random.choice(merchant_ids)
+            # Change in timestamp generation due to a reoccurring bug:
+            # The bug occurred when multiple transactions for a user were created and the second transaction has a timestamp
+            # previous to the first created transaction and the payment method of the first transaction got declined. Then
+            # a new payment method got created at transaction timestamp that is in the future relative to the second created
+            # transaction. So now we generate transactions in chronological order.
+            pattern_timestamp = util.generate_random_timestamp_in_range(pattern_timestamp, now)
+            data = TransactionGen.generate_transaction_pattern(user_id, device_id, merchant_id, pattern_start_time=pattern_timestamp)
+
+            start = time.perf_counter()
+            DBManager.insert_transactions(data)  # Whole pattern in one statement and commit
+            table_stats["transactions"]["seconds"] += time.perf_counter() - start
+            table_stats["transactions"]["rows"] += len(data)
+
+    _print_throughput(table_stats, "Row by row insert")
+    DBManager.close()
+
+
+def seed_bulk(n_users: int, n_merchants: int, users_per_chunk: int) -> None:
+    """
+    Seeds the database through COPY ... FROM STDIN. Entities are generated into an EntityStateStore that assigns ids
+    on the client side (continuing after the current MAX(id) of each table), so payment methods created or deactivated
+    during pattern generation never touch the database. Every chunk of users is copied table by table in foreign key
+    order, which keeps memory bounded for large datasets. Assumes no other process writes to these tables meanwhile.
+
+    Args:
+        n_users (int): Number of users to generate
+        n_merchants (int): Number of merchants to generate
+        users_per_chunk (int): Number of users generated before their rows are copied into the database
+    Returns:
+        None
+    """
+    generators = {"user": DG.UserGenerator(), "device": DG.DeviceGenerator(), "payment_method": DG.PaymentMethodGenerator()}
+    MerchantGen = DG.MerchantGenerator()
+
+    DBManager = DBM.create_database_manager(pooled=True, min_connections=1, max_connections=1)
+    CurrencyConvertor = CC.CurrencyConvertor()
+    conversion_rates = CurrencyConvertor.fetch_conversion_rates()
+
+    id_offsets = {table: DBManager.fetch_max_id(table, id_column) for table, id_column in ID_COLUMNS.items()}
+    TransactionGen = TG.TransactionGenerator(conversion_rates=conversion_rates, offline=True, id_offsets=id_offsets)
+    store = TransactionGen.DBM
+
+    table_stats = {table: {"rows": 0, "seconds": 0.0} for table in TABLE_LOAD_ORDER}
+    generation_seconds = 0.0
+
+    def copy_store() -> None:
+        for table, rows in store.drain().items():
+            start = time.perf_counter()
+            table_stats[table]["rows"] += DBManager.copy_rows(table, TABLE_COLUMNS[table], rows)
+            table_stats[table]["seconds"] += time.perf_counter() - start
+
+    start = time.perf_counter()
+    merchant_ids = store.add_merchants(MerchantGen.generate_merchants(n_merchants))
+    generation_seconds += time.perf_counter() - start
+    copy_store()
+    merchant_ids = merchant_ids or DBManager.fetch_all_merchant_ids()  # Allow seeding users against existing merchants
+
+    now = datetime.now()
+    for chunk_start in range(0, n_users, users_per_chunk):
+        start = time.perf_counter()
+        chunk_users = min(chunk_start + users_per_chunk, n_users) - chunk_start
+        generate_user_patterns(store, TransactionGen, generators, merchant_ids, chunk_users, now)
+        generation_seconds += time.perf_counter() - start
+
+        copy_store()
+        print(f"Copied users {chunk_start} - {min(chunk_start + users_per_chunk, n_users) - 1}")
+
+    # Regular inserts (e.g. the producer) have to continue after the client side ids
+    for table, id_column in ID_COLUMNS.items():
+        DBManager.sync_serial_sequence(table, id_column)
+
+    total_rows = sum(stats["rows"] for stats in table_stats.values())
+    print(f"\nGenerated {total_rows} rows in {generation_seconds:.2f}s ({total_rows / max(generation_seconds, 1e-9):.1f} rows/s)")
+    _print_throughput(table_stats, "COPY")
+    DBManager.close()
+
+
+def generate_offline(n_users: int, n_merchants: int, users_per_chunk: int, output_dir: Path, output_format: str) -> None:
+    """
+    Generates the same dataset as seed_bulk without any database connection. Ids start at 1 and every chunk of users
+    is written as one part file per table to <output_dir>/<table>/. Parquet parts can be read directly by Spark, CSV
+    parts are COPY-ready (load them in TABLE_LOAD_ORDER into empty tables and sync the serial sequences afterward).
+
+    Args:
+        n_users (int): Number of users to generate
+        n_merchants (int): Number of merchants to generate, must be > 0 because there is no database to fall back to
+        users_per_chunk (int): Number of users per part file
+        output_dir (Path): Root directory of the export
+        output_format (str): 'parquet' or 'csv'
+    Returns:
+        None
+    Raises:
+        ValueError: If n_merchants is not positive.
+    """
+    if n_merchants <= 0:
+        raise ValueError("Offline generation needs at least one merchant")
+
+    write_batches = write_parquet_batches if output_format == "parquet" else write_copy_batches
+    generators = {"user": DG.UserGenerator(), "device": DG.DeviceGenerator(), "payment_method": DG.PaymentMethodGenerator()}
+    MerchantGen = DG.MerchantGenerator()
+
+    conversion_rates = CC.CurrencyConvertor().fetch_conversion_rates()
+    TransactionGen = TG.TransactionGenerator(conversion_rates=conversion_rates, offline=True)
+    store = TransactionGen.DBM
+
+    table_rows = {table: 0 for table in TABLE_LOAD_ORDER}
+    start = time.perf_counter()
+
+    merchant_ids = store.add_merchants(MerchantGen.generate_merchants(n_merchants))
+    now = datetime.now()
+    for part, chunk_start in enumerate(range(0, n_users, users_per_chunk)):
+        generate_user_patterns(store, TransactionGen, generators, merchant_ids, min(users_per_chunk, n_users - chunk_start), now)
+        # Merchants end up in part 0 together with the first chunk of users
+        for table, rows in write_batches(store.drain(), output_dir, part).items():
+            table_rows[table] += rows
+        print(f"Wrote users {chunk_start} - {min(chunk_start + users_per_chunk, n_users) - 1}")
+
+    if n_users == 0:
+        for table, rows in write_batches(store.drain(), output_dir, 0).items():
+            table_rows[table] += rows
+
+    seconds = time.perf_counter() - start
+    total_rows = sum(table_rows.values())
+    print(f"\nGenerated {total_rows} rows in {seconds:.2f}s ({total_rows / max(seconds, 1e-9):.1f} rows/s) to {output_dir}")
+    for table in TABLE_LOAD_ORDER:
+        print(f"  {table:<16} {table_rows[table]:>10} rows")
+
+
+def seed_sharded(
+        n_users: int,
+        n_merchants: int,
+        output_dir: Path,
+        n_shards: int,
+        seed: int,
+        users_per_chunk: int,
+        workers: int | None,
+        merge_to: Path | None,
+        load: bool,
+) -> None:
+    """
+    Builds a reproducible dataset with ShardedDatasetBuilder: shards are generated in parallel worker processes into
+    output_dir and a rerun with the same arguments only builds the shards that are missing. Afterward the shards are
+    optionally merged into one parquet dataset and/or copied into the database.
+
+    Args:
+        n_users (int): Number of users to generate
+        n_merchants (int): Number of merchants to generate
+        output_dir (Path): Directory of the manifest and the shard files
+        n_shards (int): Number of shards
+        seed (int): Dataset seed
+        users_per_chunk (int): Users per part file within a shard
+        workers (int | None): Number of worker processes, None for one per CPU
+        merge_to (Path | None): Directory for the merged parquet dataset, None to skip
+        load (bool): Copy the merged dataset into the database
+    Returns:
+        None
+    """
+    builder = ShardedDatasetBuilder(output_dir, n_users, n_merchants, n_shards=n_shards, seed=seed,
+                                    users_per_chunk=users_per_chunk)
+
+    start = time.perf_counter()
+    row_counts = builder.build(workers=workers)
+    seconds = time.perf_counter() - start
+    total_rows = sum(row_counts.values())
+    print(f"\nDataset as of {builder.as_of} has {total_rows} rows, built in {seconds:.2f}s")
+    for table in TABLE_LOAD_ORDER:
+        print(f"  {table:<16} {row_counts[table]:>10} rows")
+
+    if merge_to is not None:
+        builder.write_merged(merge_to)
+        print(f"Merged dataset written to {merge_to}")
+
+    if load:
+        # Generated history reaches back 12 months before the as-of timestamp of the dataset
+        DBManager = DBM.create_database_manager()
+        DBManager.create_transaction_partitions(
+            start=util.add_months(builder.as_of, -TRANSACTION_PARTITION_PARAMS["retention_months"]))
+
+        start = time.perf_counter()
+        copied_rows = sum(builder.load_into(DBManager).values())
+        seconds = time.perf_counter() - start
+        print(f"Copied {copied_rows} rows into the database in {seconds:.2f}s ({copied_rows / max(seconds, 1e-9):.1f} rows/s)")
+        DBManager.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed the database with synthetic users, merchants and transactions")
+    parser.add_argument("--bulk", action="store_true", help="Load through COPY with client side ids instead of row by row inserts")
+    parser.add_argument("--users", type=int, default=INIT_DATA_PARAMS["users"])
+    parser.add_argument("--merchants", type=int, default=INIT_DATA_PARAMS["merchants"])
+    parser.add_argument("--chunk-users", type=int, default=10000, help="Users per COPY round / part file in bulk, offline and sharded mode")
+    parser.add_argument("--offline", action="store_true", help="Generate without a database and write part files to --output")
+    parser.add_argument("--output", type=Path, default=Path("data/generated"), help="Output directory in offline and sharded mode")
+    parser.add_argument("--format", choices=["parquet", "csv"], default="parquet", help="Part file format in offline mode")
+    parser.add_argument("--shards", type=int, default=0,
+                        help=f"Build a reproducible dataset in this many parallel shards (e.g. {SHARDED_INIT_PARAMS['shards']}) into --output")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes in sharded mode, defaults to one per CPU")
+    parser.add_argument("--seed", type=int, default=SHARDED_INIT_PARAMS["seed"], help="Dataset seed in sharded mode")
+    parser.add_argument("--merge-to", type=Path, default=None, help="Write the merged sharded dataset to this directory")
+    parser.add_argument("--load", action="store_true", help="Copy the sharded dataset into the database")
+    args = parser.parse_args()
+
+    if args.shards:
+        seed_sharded(args.users, args.merchants, args.output, n_shards=args.shards, seed=args.seed,
+                     users_per_chunk=args.chunk_users, workers=args.workers, merge_to=args.merge_to, load=args.load)
+        sys.exit(0)
+
+    if args.offline:
+        generate_offline(args.users, args.merchants, args.chunk_users, args.output, args.format)
+        sys.exit(0)
+
+    # Generated history reaches back 12 months, so all monthly partitions have to exist before seeding
+    DBM.create_database_manager().create_transaction_partitions(
+        start=util.add_months(datetime.now(), -TRANSACTION_PARTITION_PARAMS["retention_months"]))
 
-# Initialize all DataGenerator classes
-UserGen = DG.UserGenerator()
-DeviceGen = DG.DeviceGenerator()
-PaymentMethodGen = DG.PaymentMethodGenerator()
-MerchantGen = DG.MerchantGenerator()
-
-# Initialize DataBaseManage and CurrencyConvertor classes
-DBManager = DBM.DatabaseManager()
-CurrencyConvertor = CC.CurrencyConvertor()
-
-# Get conv rates and initialize TransactionGenerator
-conversion_rates = CurrencyConvertor.fetch_conversion_rates()
-TransactionGen = TG.TransactionGenerator(conversion_rates=conversion_rates)
-
-
-for m in range(INIT_DATA_PARAMS["merchants"]):
-    print(f"Generating Merchant: {m}")
-    merchant_data = MerchantGen.generate_merchant()
-    DBManager.insert_merchant(merchant_data)
-
-merchant_ids = DBManager.fetch_all_merchant_ids()
-now = datetime.now()
-
-for u in range(INIT_DATA_PARAMS["users"]):
-    print(f"Generating User: {u}")
-    generated_timestamp = util.generate_random_past_timestamp()
-    user = UserGen.generate_user(generated_timestamp)
-    user_id = DBManager.insert_user(user)
-
-    user_device = DeviceGen.generate_device(user_id, generated_timestamp)
-    device_id = DBManager.insert_device(user_device)
-
-    user_payment_method = PaymentMethodGen.generate_payment_method(user_id, generated_timestamp)
-    DBManager.insert_payment_method(user_payment_method)
-
-    pattern_timestamp = generated_timestamp
-    for _ in range(random.randint(INIT_DATA_PARAMS["min_patterns"], INIT_DATA_PARAMS["max_patterns"])):
-        merchant_id = random.choice(merchant_ids)
-        # Change in timestamp generation due to a reoccurring bug:
-        # The bug occurred when multiple transactions for a user were created and the second transaction has a timestamp
-        # previous to the first created transaction and the payment method of the first transaction got declined. Then
-        # a new payment method got created at transaction timestamp that is in the future relative to the second created
-        # transaction. So now we generate transactions in chronological order.
-        pattern_timestamp = util.generate_random_timestamp_in_range(pattern_timestamp, now)
-        data = TransactionGen.generate_transaction_pattern(user_id, device_id, merchant_id, pattern_start_time=pattern_timestamp)
-        for transaction in data:
-            DBManager.insert_transaction(transaction)
+    if args.bulk:
+        seed_bulk(args.users, args.merchants, users_per_chunk=args.chunk_users)
+    else:
+        seed_row_by_row(args.users, args.merchants)
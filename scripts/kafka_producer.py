@@ -1,4 +1,7 @@
+import argparse
 import json
+import multiprocessing
+import queue
 import time
 import random
 from datetime import datetime
@@ -11,6 +14,13 @@ sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 import src.CurrencyConvertor as CC
 import src.TransactionGenerator as TG
 import src.DatabaseManager as DBM
+from src.EntitySampler import EntitySampler
+from src.DatasetBuilder import derive_seeds
+from src.ThroughputProducer import ThroughputProducer
+from src.constants import PRODUCER_RATE_PARAMS
+
+
+TRANSACTIONS_TOPIC = "transactions"
 
 
 def serialize(data: dict) -> bytes:
@@ -32,7 +42,7 @@ def run_producer(transactions_per_second: float = 1.0) -> None:
     the specified rate.
 
     Args:
-        transactions_per_second (float): Target publish rate. Defaults to 1.0.
+        transactions_per_second (float): Target publish rate, 0 or less for as fast as possible. Defaults to 1.0.
     Returns:
         None
     """
@@ -43,17 +53,22 @@ def run_producer(transactions_per_second: float = 1.0) -> None:
 
     CurrencyConvertor = CC.CurrencyConvertor()
     conversion_rates = CurrencyConvertor.fetch_conversion_rates()
-    TransactionGen = TG.TransactionGenerator(conversion_rates=conversion_rates)
-    DBManager = DBM.DatabaseManager()
+    # The producer is single threaded, so one pooled connection is reused for every lookup
+    DBManager = DBM.create_database_manager(pooled=True, min_connections=1, max_connections=1, cached=True, instrumented=True)
+    TransactionGen = TG.TransactionGenerator(conversion_rates=conversion_rates, db_manager=DBManager)
 
     merchant_ids = DBManager.fetch_all_merchant_ids()
-    sleep_time = 1.0 / transactions_per_second
+    # Loads all user/device ids once instead of an ORDER BY RANDOM() scan per pattern
+    sampler = EntitySampler(DBManager)
+    sleep_time = 1.0 / transactions_per_second if transactions_per_second > 0 else 0.0
 
-    print(f"Producer started publishing {transactions_per_second} tx/s")
+    rate_label = f"{transactions_per_second} tx/s" if sleep_time else "as fast as possible"
+    print(f"Producer started publishing {rate_label}")
 
+    patterns_sent = 0
     while True:
-        user_id = DBManager.fetch_random_user_id()
-        device_id = DBManager.fetch_random_device_id(user_id)
+        sampler.maybe_refresh()  # Picks up users and devices inserted since the last refresh
+        user_id, device_id = sampler.sample_user_and_device()
         merchant_id = random.choice(merchant_ids)
         pattern_start_time = datetime.now()
 
@@ -64,16 +79,146 @@ def run_producer(transactions_per_second: float = 1.0) -> None:
             pattern_start_time=pattern_start_time,
         )
 
+        # Transactions carry payment_created_at (needed for feature compute) from the generator
         for transaction in transactions:
-            # We have to extract the corresponding data for the payment method because we need
-            # the creation time for feature compute
-            payment_info = DBManager.fetch_payment_info(transaction["payment_id"])
-            transaction["payment_created_at"] = payment_info["created_at"]
-            producer.send("transactions", value=transaction)
+            producer.send(TRANSACTIONS_TOPIC, value=transaction)
 
         producer.flush()
-        time.sleep(sleep_time)
+        patterns_sent += 1
+        if patterns_sent % 100 == 0:
+            print(f"Sent {patterns_sent} patterns, lookup cache stats: {DBManager.cache_stats()}")
+            print(f"DatabaseManager query metrics:\n{DBManager.metrics.format_summary()}")
+        if sleep_time:
+            time.sleep(sleep_time)
+
+
+def _generate_patterns(worker_index: int, seed: int | None, conversion_rates: dict, pattern_queue, stop_event) -> None:
+    """
+    Worker process of the high throughput mode: generates patterns with its own pooled DatabaseManager, EntitySampler
+    and TransactionGenerator and puts every pattern as a list of serialized transactions on the queue. Blocks while
+    the queue is full, so generation never runs far ahead of the sender.
+
+    Args:
+        worker_index (int): Index of the worker
+        seed (int | None): Producer seed, the worker derives its own seeds from it. None for unseeded workers.
+        conversion_rates (dict): Conversion rates fetched once by the parent process
+        pattern_queue (multiprocessing.Queue): Queue the serialized patterns are put on
+        stop_event (multiprocessing.Event): Set by the parent to stop the worker
+    Returns:
+        None
+    """
+    python_seed, numpy_seed = derive_seeds(seed, (2, worker_index), n=2) if seed is not None else (None, None)
+    random.seed(python_seed)
+
+    DBManager = DBM.create_database_manager(pooled=True, min_connections=1, max_connections=1, cached=True)
+    TransactionGen = TG.TransactionGenerator(conversion_rates=conversion_rates, db_manager=DBManager, seed=numpy_seed)
+    merchant_ids = DBManager.fetch_all_merchant_ids()
+    sampler = EntitySampler(DBManager, seed=python_seed)
+
+    try:
+        while not stop_event.is_set():
+            sampler.maybe_refresh()
+            user_id, device_id = sampler.sample_user_and_device()
+            transactions = TransactionGen.generate_transaction_pattern(
+                user_id=user_id,
+                device_id=device_id,
+                merchant_id=random.choice(merchant_ids),
+                pattern_start_time=datetime.now(),
+            )
+            pattern = [serialize(transaction) for transaction in transactions]
+
+            while not stop_event.is_set():
+                try:
+                    pattern_queue.put(pattern, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+    finally:
+        DBManager.close()
+
+
+def run_high_throughput_producer(
+        events_per_second: float | None,
+        workers: int,
+        poisson: bool = False,
+        seed: int | None = None,
+        duration_seconds: float | None = None,
+        report_interval_seconds: float = PRODUCER_RATE_PARAMS["report_interval_seconds"],
+) -> dict:
+    """
+    Publishes transaction patterns generated by a pool of worker processes through one batched, compressed producer.
+    A token bucket holds the target rate (optionally with Poisson arrivals), the achieved rate and the send latency
+    are printed every report_interval_seconds.
+
+    Args:
+        events_per_second (float | None): Target transactions per second, None for as fast as possible
+        workers (int): Number of pattern generation processes
+        poisson (bool): Poisson arrivals instead of evenly spaced sends. Defaults to False.
+        seed (int | None): Seed for the workers and the arrival process. Defaults to None.
+        duration_seconds (float | None): Stop after this many seconds. Defaults to None (until interrupted).
+        report_interval_seconds (float): Seconds between progress reports
+    Returns:
+        dict: Final ThroughputProducer report
+    Raises:
+        RuntimeError: If all workers died.
+    """
+    conversion_rates = CC.CurrencyConvertor().fetch_conversion_rates()
+
+    pattern_queue = multiprocessing.Queue(maxsize=workers * PRODUCER_RATE_PARAMS["queued_patterns_per_worker"])
+    stop_event = multiprocessing.Event()
+    processes = [
+        multiprocessing.Process(target=_generate_patterns, args=(i, seed, conversion_rates, pattern_queue, stop_event), daemon=True)
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    producer = ThroughputProducer(TRANSACTIONS_TOPIC, events_per_second=events_per_second, poisson=poisson, seed=seed)
+    rate_label = f"{events_per_second} tx/s" if events_per_second else "max rate"
+    print(f"High throughput producer started with {workers} workers at {rate_label}{' (Poisson)' if poisson else ''}")
+
+    started = time.monotonic()
+    last_report = started
+    try:
+        while duration_seconds is None or time.monotonic() - started < duration_seconds:
+            try:
+                pattern = pattern_queue.get(timeout=1.0)
+            except queue.Empty:
+                if not any(process.is_alive() for process in processes):
+                    raise RuntimeError("All pattern workers died, see their output above")
+                continue
+
+            producer.send_batch(pattern)
+
+            if time.monotonic() - last_report >= report_interval_seconds:
+                print(producer.format_report())
+                last_report = time.monotonic()
+    except KeyboardInterrupt:
+        print("Stopping producer")
+    finally:
+        stop_event.set()
+        producer.close()
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+    print(f"Final: {producer.format_report()}")
+    return producer.report()
 
 
 if __name__ == "__main__":
-    run_producer(transactions_per_second=1.0)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Publish generated transaction patterns to Kafka")
+    parser.add_argument("--rate", type=float, default=1.0, help="Target transactions per second, 0 for as fast as possible")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="High throughput mode with this many pattern generation processes and one batched producer")
+    parser.add_argument("--poisson", action="store_true", help="Poisson arrivals instead of evenly spaced sends (--workers mode)")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for the workers and the arrival process (--workers mode)")
+    parser.add_argument("--duration", type=float, default=None, help="Stop after this many seconds (--workers mode)")
+    args = parser.parse_args()
+
+    if args.workers:
+        run_high_throughput_producer(args.rate or None, args.workers, poisson=args.poisson, seed=args.seed,
+                                     duration_seconds=args.duration)
+    else:
+        run_producer(transactions_per_second=args.rate)
\ No newline at end of file
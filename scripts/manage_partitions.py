@@ -0,0 +1,31 @@
+# Partition lifecycle for the monthly partitioned transactions table. Meant to run periodically (e.g. daily cron):
+# creates upcoming months ahead of time and detaches or drops months outside the retention window.
+import argparse
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.DatabaseManager import DatabaseManager
+from src.constants import TRANSACTION_PARTITION_PARAMS
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create upcoming and detach old transactions partitions")
+    parser.add_argument("--months-ahead", type=int, default=TRANSACTION_PARTITION_PARAMS["months_ahead"])
+    parser.add_argument("--retention-months", type=int, default=TRANSACTION_PARTITION_PARAMS["retention_months"])
+    parser.add_argument("--drop", action="store_true", help="Drop old partitions instead of only detaching them")
+    parser.add_argument("--list", action="store_true", help="Only list the attached partitions")
+    args = parser.parse_args()
+
+    dbm = DatabaseManager()
+
+    if not args.list:
+        created = dbm.create_transaction_partitions(months_ahead=args.months_ahead)
+        print(f"Created partitions: {created or 'none'}")
+
+        detached = dbm.detach_transaction_partitions(retention_months=args.retention_months, drop=args.drop)
+        print(f"{'Dropped' if args.drop else 'Detached'} partitions: {detached or 'none'}")
+
+    for partition in dbm.list_transaction_partitions():
+        print(f"{partition['name']:<24} {partition['month_start']:%Y-%m-%d} - {partition['month_end']:%Y-%m-%d}")
@@ -0,0 +1,244 @@
+# Replays historical transactions into the Kafka 'transactions' topic in timestamp order, optionally time compressed.
+# Unlike the generated stream of kafka_producer.py the traffic is realistic and the same on every run, which makes
+# consumer lag and scoring throughput measurements of the streaming job comparable.
+import argparse
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import src.DatabaseManager as DBM
+from src.EntityStateStore import TABLE_COLUMNS
+from src.ThroughputProducer import ThroughputProducer
+from src.constants import FEATURE_PATH, PRODUCER_RATE_PARAMS, REPLAY_PARAMS
+from scripts.kafka_producer import TRANSACTIONS_TOPIC, serialize
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Fields of a transaction message, see spark.utils.message_utils.TRANSACTION_MESSAGE_SCHEMA
+PAYMENT_COLUMNS = ["payment_created_at", "payment_method", "payment_service_provider"]
+MESSAGE_COLUMNS = TABLE_COLUMNS["transactions"] + PAYMENT_COLUMNS
+
+
+def _naive(ts: datetime | None) -> datetime | None:
+    """Spark writes timestamps normalized to UTC, they are converted back to naive local time like the database rows."""
+    if ts is not None and ts.tzinfo is not None:
+        return ts.astimezone().replace(tzinfo=None)
+    return ts
+
+
+def iter_parquet_transactions(
+        path: str | Path,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        window_hours: float = REPLAY_PARAMS["parquet_window_hours"],
+):
+    """
+    Streams transactions from a parquet file or directory (e.g. the feature table of the batch job) in timestamp order.
+    The data is read one time window at a time with a pushed down timestamp filter and sorted in memory, so only one
+    window is held at once. Feature files have no payment_created_at, it is derived from payment_method_age_days.
+
+    Args:
+        path (str | Path): Parquet file or directory
+        start (datetime | None): First transaction timestamp (inclusive). Defaults to None (no lower bound).
+        end (datetime | None): Last transaction timestamp (exclusive). Defaults to None (no upper bound).
+        window_hours (float): Hours of transactions read and sorted at once
+    Yields:
+        dict: Rows with the MESSAGE_COLUMNS found in the file, ordered by timestamp
+    """
+    import pyarrow as pa  # Only needed for parquet sources
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(str(path), format="parquet", partitioning="hive")
+    ts_type = dataset.schema.field("transaction_timestamp").type
+    columns = [column for column in [*MESSAGE_COLUMNS, "payment_method_age_days"] if column in dataset.schema.names]
+
+    def to_scalar(value: datetime):
+        if ts_type.tz is not None and value.tzinfo is None:
+            value = value.astimezone()  # Bounds are local time like _naive output
+        return pa.scalar(value, type=ts_type)
+
+    # Timestamp range from the timestamp column only, batch by batch
+    low, high = None, None
+    for batch in dataset.to_batches(columns=["transaction_timestamp"]):
+        bounds = pc.min_max(batch.column(0)).as_py()
+        if bounds["min"] is None:
+            continue
+        low = bounds["min"] if low is None else min(low, bounds["min"])
+        high = bounds["max"] if high is None else max(high, bounds["max"])
+    if low is None:
+        return
+
+    if start is not None:
+        low = max(low, to_scalar(start).as_py())
+    if end is not None:
+        end = to_scalar(end).as_py()
+
+    window = timedelta(hours=window_hours)
+    window_start = low
+    while window_start <= high and (end is None or window_start < end):
+        window_end = window_start + window if end is None else min(window_start + window, end)
+        field = ds.field("transaction_timestamp")
+        table = dataset.to_table(
+            columns=columns,
+            filter=(field >= to_scalar(window_start)) & (field < to_scalar(window_end)),
+        ).sort_by("transaction_timestamp")
+
+        for row in table.to_pylist():
+            row["transaction_timestamp"] = _naive(row["transaction_timestamp"])
+            if "payment_created_at" in row:
+                row["payment_created_at"] = _naive(row["payment_created_at"])
+            else:
+                age_days = row.pop("payment_method_age_days", None)
+                row["payment_created_at"] = (
+                    row["transaction_timestamp"] - timedelta(days=age_days) if age_days is not None else None
+                )
+            yield row
+
+        window_start = window_end
+
+
+def _to_message(row: dict, ts: datetime | None, keep_transaction_id: bool) -> dict:
+    """
+    Turns a replayed row into a transaction message. With a rebased timestamp ts the payment method keeps its age
+    relative to the transaction.
+    """
+    message = {column: row.get(column) for column in MESSAGE_COLUMNS}
+    if not keep_transaction_id:
+        message.pop("transaction_id")  # Replayed rows are new transactions for the consumer
+
+    if ts is not None:
+        if message["payment_created_at"] is not None:
+            message["payment_created_at"] = ts - (message["transaction_timestamp"] - message["payment_created_at"])
+        message["transaction_timestamp"] = ts
+
+    for column, value in message.items():
+        if isinstance(value, Decimal):  # NUMERIC amounts, the message schema expects floats
+            message[column] = float(value)
+    return message
+
+
+def run_replay(
+        source: str,
+        path: str | Path | None = None,
+        speedup: float = REPLAY_PARAMS["speedup"],
+        start: datetime | None = None,
+        end: datetime | None = None,
+        rebase: bool = True,
+        keep_transaction_ids: bool = False,
+        duration_seconds: float | None = None,
+        report_interval_seconds: float = PRODUCER_RATE_PARAMS["report_interval_seconds"],
+) -> dict:
+    """
+    Replays transactions in timestamp order. With speedup > 0 every transaction is sent when
+    (transaction_timestamp - first transaction_timestamp) / speedup seconds have passed since the start, on an absolute
+    schedule so send time doesn't add up. With speedup 0 transactions are sent as fast as possible.
+
+    With rebase the timestamps are moved to the replay time (and compressed by speedup), so the streaming job's look
+    back windows see the replayed history as recent. With speedup 0 every transaction gets the time it is sent, so
+    no timestamp lies in the future. Transaction ids are dropped unless keep_transaction_ids is set,
+    the replayed transactions would collide with the stored ones otherwise.
+
+    Args:
+        source (str): 'db' for the transactions table or 'parquet'
+        path (str | Path | None): Parquet file or directory for the 'parquet' source. Defaults to FEATURE_PATH.
+        speedup (float): Event time seconds per wall clock second, 0 for as fast as possible
+        start (datetime | None): First transaction timestamp (inclusive). Defaults to None (no lower bound).
+        end (datetime | None): Last transaction timestamp (exclusive). Defaults to None (no upper bound).
+        rebase (bool): Move the timestamps to the replay time. Defaults to True.
+        keep_transaction_ids (bool): Send the original transaction ids. Defaults to False.
+        duration_seconds (float | None): Stop after this many seconds. Defaults to None (until the source is exhausted).
+        report_interval_seconds (float): Seconds between progress reports
+    Returns:
+        dict: Final ThroughputProducer report plus the replayed event time span in seconds
+    Raises:
+        ValueError: If the source is unknown or speedup is negative.
+    """
+    if speedup < 0:
+        raise ValueError(f"Speedup must not be negative, got {speedup}")
+
+    if source == "db":
+        DBManager = DBM.create_database_manager()
+        rows = DBManager.iter_transactions_for_replay(start, end)
+    elif source == "parquet":
+        rows = iter_parquet_transactions(path or ROOT / FEATURE_PATH, start, end)
+    else:
+        raise ValueError(f"Unknown source '{source}', expected 'db' or 'parquet'")
+
+    producer = ThroughputProducer(TRANSACTIONS_TOPIC)
+    speed_label = f"{speedup}x" if speedup else "max rate"
+    print(f"Replaying transactions from {source} at {speed_label}{' with rebased timestamps' if rebase else ''}")
+
+    pending, keys = [], []
+
+    def flush() -> None:
+        if pending:
+            producer.send_batch(pending, keys)
+            pending.clear()
+            keys.clear()
+
+    first_ts, last_ts = None, None
+    started = time.monotonic()
+    replay_start = datetime.now()
+    last_report = started
+    try:
+        for row in rows:
+            last_ts = row["transaction_timestamp"]
+            if first_ts is None:
+                first_ts = last_ts
+            if speedup:
+                offset = (last_ts - first_ts) / speedup
+                wait = started + offset.total_seconds() - time.monotonic()
+                if wait > 0:
+                    flush()  # Everything due is sent before sleeping
+                    time.sleep(wait)
+                ts = replay_start + offset if rebase else None
+            else:
+                # Without a schedule the event time would run ahead of the clock, so rows get their send time
+                ts = datetime.now() if rebase else None
+            pending.append(serialize(_to_message(row, ts, keep_transaction_ids)))
+            keys.append(str(row["user_id"]).encode("utf-8"))  # Keeps each user's transactions in order
+            if len(pending) >= REPLAY_PARAMS["batch_size"]:
+                flush()
+
+            now = time.monotonic()
+            if now - last_report >= report_interval_seconds:
+                print(f"{producer.format_report()} | event time {last_ts}")
+                last_report = now
+            if duration_seconds is not None and now - started >= duration_seconds:
+                break
+        flush()
+    except KeyboardInterrupt:
+        print("Stopping replay")
+    finally:
+        rows.close()
+        producer.close()
+
+    print(f"Final: {producer.format_report()}")
+    report = producer.report()
+    report["event_seconds"] = (last_ts - first_ts).total_seconds() if first_ts is not None else 0.0
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay historical transactions to Kafka in timestamp order")
+    parser.add_argument("--source", choices=["db", "parquet"], default="db", help="Read the transactions table or a parquet file")
+    parser.add_argument("--path", type=Path, default=None, help=f"Parquet file or directory, defaults to {FEATURE_PATH}")
+    parser.add_argument("--speedup", type=float, default=REPLAY_PARAMS["speedup"],
+                        help="Time compression, e.g. 1 for real time or 100, 0 for as fast as possible")
+    parser.add_argument("--start", type=datetime.fromisoformat, default=None, help="First transaction timestamp (ISO format)")
+    parser.add_argument("--end", type=datetime.fromisoformat, default=None, help="End of the replay, exclusive (ISO format)")
+    parser.add_argument("--keep-timestamps", action="store_true", help="Send the original timestamps instead of rebasing them to now")
+    parser.add_argument("--keep-transaction-ids", action="store_true", help="Send the original transaction ids")
+    parser.add_argument("--duration", type=float, default=None, help="Stop after this many seconds")
+    args = parser.parse_args()
+
+    report = run_replay(args.source, args.path, speedup=args.speedup, start=args.start, end=args.end,
+                        rebase=not args.keep_timestamps, keep_transaction_ids=args.keep_transaction_ids,
+                        duration_seconds=args.duration)
+    print(f"Replayed {report['event_seconds'] / 3600:.1f} hours of transactions")
@@ -0,0 +1,27 @@
+# Applies pending SQL migrations from db/migrations. Safe to run repeatedly, applied versions are skipped.
+import argparse
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.DatabaseManager import DatabaseManager
+from src.MigrationRunner import MigrationRunner
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply versioned schema migrations")
+    parser.add_argument("--status", action="store_true", help="Only list migrations and whether they are applied")
+    args = parser.parse_args()
+
+    runner = MigrationRunner(DatabaseManager())
+
+    if args.status:
+        for migration in runner.status():
+            state = "applied" if migration["applied"] else "pending"
+            if migration["modified"]:
+                state += " (modified since applied!)"
+            print(f"{migration['version']:03d}_{migration['name']:<40} {state}")
+    else:
+        applied = runner.apply()
+        print(f"Applied {len(applied)} migration(s)" if applied else "Schema is up to date")
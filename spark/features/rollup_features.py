@@ -0,0 +1,51 @@
+from datetime import datetime
+
+
+def apply_rollup_features(features: dict, transaction: dict, batch_rows: list[dict], aggregates: dict) -> dict:
+    """
+    Replaces the features whose windows are longer than the 24 hours of raw history the streaming job reads with
+    values reconstructed from the rollup aggregates (see DatabaseManager.fetch_users_rollup_aggregates). The
+    aggregates only count stored transactions, the transactions of the current micro-batch are added from batch_rows.
+    Rollup windows are aligned to bucket boundaries, so they cover up to one hour (7d) or one day (30d) more than the
+    Spark windows.
+
+    Features replaced:
+        - user_avg_amount_7d, user_amount_ratio_7d: 7 day average including the current transaction
+        - is_new_merchant_category: 1 if the merchant category was not seen in the last 30 days before the transaction
+        - seconds_since_last_transaction: only if the raw history has no earlier transaction
+
+    Args:
+        features (dict): Features computed by the Spark feature functions for the transaction
+        transaction (dict): Scored transaction with merchant_category set
+        batch_rows (list[dict]): The user's transactions of the current micro-batch (filter_single_transaction format),
+            including the scored one
+        aggregates (dict): The user's entry of fetch_users_rollup_aggregates
+    Returns:
+        dict: features with the replaced values
+    """
+    features = dict(features)
+    transaction_timestamp = datetime.fromisoformat(str(transaction["transaction_timestamp"]))
+    amount = float(transaction["transaction_amount_usd"])
+
+    # Batch rows are not stored yet, so they are missing from the aggregates
+    batch_until_now = [r for r in batch_rows if r["transaction_timestamp"] <= transaction_timestamp]
+    count_7d = aggregates["transaction_count_7d"] + len(batch_until_now)
+    sum_7d = float(aggregates["amount_sum_7d"]) + sum(float(r["transaction_amount_usd"]) for r in batch_until_now)
+    avg_7d = sum_7d / count_7d if count_7d else None
+    features["user_avg_amount_7d"] = avg_7d
+    features["user_amount_ratio_7d"] = amount / avg_7d if avg_7d else None
+
+    # Like the Spark window, transactions in the same second as the scored one don't count as seen
+    seen_categories = set(aggregates["merchant_categories_30d"])
+    seen_categories.update(r["merchant_category"] for r in batch_rows
+                           if int(r["transaction_timestamp"].timestamp()) < int(transaction_timestamp.timestamp()))
+    features["is_new_merchant_category"] = int(transaction["merchant_category"] not in seen_categories)
+
+    last_timestamp = aggregates["last_transaction_timestamp"]
+    if features.get("seconds_since_last_transaction") is None and last_timestamp is not None \
+            and last_timestamp <= transaction_timestamp:
+        features["seconds_since_last_transaction"] = (
+            int(transaction_timestamp.timestamp()) - int(last_timestamp.timestamp())
+        )
+
+    return features
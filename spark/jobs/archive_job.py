@@ -0,0 +1,123 @@
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+from pyspark.sql import SparkSession, DataFrame
+
+from spark.utils.spark_utils import create_spark_session
+from spark.utils.db_utils import read_table, read_query
+
+import src.utility as util
+import src.constants as const
+from src.DatabaseManager import DatabaseManager
+
+
+ROOT = Path(__file__).resolve().parent.parent.parent
+ARCHIVE_ROOT = ROOT / const.ARCHIVE_PATH
+MONTH_PARTITION_COLUMN = "transaction_month"
+
+
+def archived_months(archive_root: Path = ARCHIVE_ROOT) -> list[datetime]:
+    """
+    Lists the months that were archived to parquet.
+
+    Args:
+        archive_root (Path): Root directory of the transaction archive
+    Returns:
+        list[datetime]: Start of every archived month, sorted
+    """
+    prefix = f"{MONTH_PARTITION_COLUMN}="
+    return sorted(
+        datetime.strptime(path.name.removeprefix(prefix), "%Y-%m")
+        for path in archive_root.glob(f"{prefix}*") if path.is_dir()
+    )
+
+
+def read_transactions(spark: SparkSession, archive_root: Path = ARCHIVE_ROOT) -> DataFrame:
+    """
+    Reads all transactions: archived months from parquet and only the rows after the last archived month over JDBC.
+    The JDBC filter also keeps rows of an archived month that was not dropped yet from being read twice.
+
+    Args:
+        spark (SparkSession): Active SparkSession
+        archive_root (Path): Root directory of the transaction archive
+    Returns:
+        DataFrame: All transactions with the columns of the transactions table
+    """
+    months = archived_months(archive_root)
+    if not months:
+        return read_table(spark, "transactions")
+
+    cutoff = util.add_months(months[-1], 1)
+    cold_df = spark.read.parquet(str(archive_root)).drop(MONTH_PARTITION_COLUMN)
+    hot_df = read_query(spark, f"SELECT * FROM transactions WHERE transaction_timestamp >= '{cutoff:%Y-%m-%d}'")
+
+    return cold_df.unionByName(hot_df)
+
+
+def archive_closed_months(
+        spark: SparkSession,
+        dbm: DatabaseManager,
+        hot_months: int = const.TRANSACTION_ARCHIVE_PARAMS["hot_months"],
+        drop: bool = True,
+        archive_root: Path = ARCHIVE_ROOT,
+) -> list[str]:
+    """
+    Moves every monthly partition that ended before the hot window to parquet (one transaction_month=YYYY-MM directory
+    per month) and detaches it from transactions once the written row count matches. Re-running is safe, a month is
+    overwritten until its partition is gone. Rows in the default partition are not archived.
+
+    Args:
+        spark (SparkSession): Active SparkSession
+        dbm (DatabaseManager): DatabaseManager used to list and detach partitions
+        hot_months (int): Months (including the current one) that stay in postgres
+        drop (bool): Drop archived partitions instead of only detaching them. Defaults to True.
+        archive_root (Path): Root directory of the transaction archive
+    Returns:
+        list[str]: Names of the archived partitions
+    Raises:
+        RuntimeError: If the row count of the written parquet doesn't match the partition.
+    """
+    partitions = dbm.list_transaction_partitions()
+    if not partitions:
+        print("transactions has no monthly partitions, apply db/migrations/002_partition_transactions.sql first")
+        return []
+
+    cutoff = util.add_months(datetime.now(), -(hot_months - 1))
+    archived = []
+
+    for partition in partitions:
+        if partition["month_end"] > cutoff:
+            continue
+
+        name = partition["name"]
+        target = archive_root / f"{MONTH_PARTITION_COLUMN}={partition['month_start']:%Y-%m}"
+        expected = read_query(spark, f"SELECT COUNT(*) AS row_count FROM {name}").first()["row_count"]
+
+        if expected > 0:
+            # Sorting by user and time keeps row groups selective for the user/time filters of the feature jobs
+            (read_table(spark, name)
+             .sortWithinPartitions("user_id", "transaction_timestamp")
+             .write.mode("overwrite").parquet(str(target)))
+
+            written = spark.read.parquet(str(target)).count()
+            if written != expected:
+                raise RuntimeError(f"Archive of {name} has {written} rows, expected {expected}. Partition is kept.")
+
+        dbm.detach_transaction_partition(name, drop=drop)
+        archived.append(name)
+        print(f"Archived {expected} rows of {name} to {target}")
+
+    return archived
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move closed transaction months from postgres to parquet")
+    parser.add_argument("--hot-months", type=int, default=const.TRANSACTION_ARCHIVE_PARAMS["hot_months"],
+                        help="Months (including the current one) that stay in postgres")
+    parser.add_argument("--keep-tables", action="store_true", help="Only detach archived partitions instead of dropping them")
+    args = parser.parse_args()
+
+    spark = create_spark_session(app_name="FraudDetection_Archive")
+    archive_closed_months(spark, DatabaseManager(), hot_months=args.hot_months, drop=not args.keep_tables)
+    spark.stop()
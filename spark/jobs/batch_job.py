@@ -3,6 +3,7 @@ from pyspark.sql import SparkSession
 
 from spark.utils.spark_utils import create_spark_session
 from spark.utils.db_utils import read_table
+from spark.jobs.archive_job import read_transactions
 from spark.features.velocity_features import compute_velocity_features
 from spark.features.amount_features import compute_amount_features
 from spark.features.behavioral_features import compute_behavioral_features
@@ -17,13 +18,14 @@ OUTPUT_PATH = ROOT / const.FEATURE_PATH
 
 def run_batch(spark_sess: SparkSession) -> None:
     """
-    Reads raw transaction data from database, computes all features, and writes the feature table to parquet.
+    Reads raw transaction data (archived months from parquet, the rest from the database), computes all features, and
+    writes the feature table to parquet.
 
     Args:
         spark_sess (SparkSession): Active SparkSession
     """
     # Read from db write to parquet
-    transactions_df = read_table(spark_sess, "transactions")
+    transactions_df = read_transactions(spark_sess)
     merchants_df = read_table(spark_sess, "merchants")
     payment_methods_df = read_table(spark_sess, "payment_methods")
 
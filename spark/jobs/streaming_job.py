@@ -1,4 +1,6 @@
 import json
+import uuid
+import asyncio
 import joblib
 import numpy as np
 from datetime import datetime
@@ -17,42 +19,51 @@ from spark.features.velocity_features import compute_velocity_features
 from spark.features.amount_features import compute_amount_features
 from spark.features.behavioral_features import compute_behavioral_features
 from spark.features.device_features import compute_device_features
+from spark.features.rollup_features import apply_rollup_features
 
-from src.DatabaseManager import DatabaseManager
+from src.DatabaseManager import DatabaseManager, create_database_manager
+from src.AsyncDatabaseManager import AsyncDatabaseManager, BackgroundEventLoop
+from src.BufferedWriter import BufferedDatabaseWriter
 from src.constants import MODEL_OUTPUT_DIR, MERCHANT_CATEGORY_DATA, ONLINE_TX_CHANNEL
 
 
 ROOT = Path(__file__).resolve().parent.parent.parent
 MODEL_DIR = ROOT / MODEL_OUTPUT_DIR
+METRICS_REPORT_EVERY_N_BATCHES = 10
+# Raw history read per user, the longest Spark window computed from raw rows. Longer windows (7d amounts, 30d merchant
+# categories) come from the rollup tables.
+RAW_HISTORY_HOURS = 24
 
 
 def _compute_streaming_features(
         transaction: dict,
-        dbm: DatabaseManager,
+        user_history: list[dict],
+        batch_rows: list[dict],
+        rollup_aggregates: dict,
         spark: SparkSession,
         feature_column_list: list[str]
 ) -> np.ndarray | None:
     """
     Computes features for a single incoming transaction by combining it with historical records from Postgres and
-    running the existing batch feature functions. Guarantees identical features between batch and streaming pipelines.
+    running the existing batch feature functions. Features with windows longer than the raw history are taken from the
+    rollup aggregates instead, see apply_rollup_features.
 
     Args:
-        transaction (dict): Incoming transaction dictionary from Kafka
-        dbm (DatabaseManager): DatabaseManager instance
+        transaction (dict): Incoming transaction dictionary from Kafka, with merchant_category already set
+        user_history (list[dict]): The user's transactions of the past RAW_HISTORY_HOURS, including the transactions
+            of the current micro-batch. Shared across the micro-batch
+        batch_rows (list[dict]): The user's transactions of the current micro-batch
+        rollup_aggregates (dict): The user's entry of fetch_users_rollup_aggregates
         spark (SparkSession): Active SparkSession used to create the historical DataFrame
         feature_column_list (list[str]): List of feature_names that will be used to construct the feature vector
     Returns:
         np.ndarray | None: Computed feature vector or None if computation fails.
     """
     try:
-        # We extract user history from past 720 hours (30 days) as this is the max window length we check with spark
-        user_history = dbm.fetch_user_transaction_history(transaction["user_id"], hours=720)
-        # We need the merchant category for latest transaction
-        merchant_info = dbm.fetch_merchant_info(transaction["merchant_id"])
-        transaction["merchant_category"] = merchant_info["merchant_category"]
-
-        transaction_filtered = filter_single_transaction(transaction)
-        user_history.append(transaction_filtered)
+        # The history contains the whole micro-batch (including the current transaction), so we drop rows that happened
+        # after the current transaction. Otherwise, the last row would not belong to the transaction we are scoring.
+        transaction_timestamp = datetime.fromisoformat(str(transaction["transaction_timestamp"]))
+        user_history = [r for r in user_history if r["transaction_timestamp"] <= transaction_timestamp]
 
         # We extract the merchant historical data, because a separate df is needed for 'compute_behavioral_features'
         merchant_history = [{"merchant_id": r["merchant_id"], "merchant_category": r["merchant_category"]} for r in user_history]
@@ -90,7 +101,8 @@ def _compute_streaming_features(
         # Extract the last row which corresponds to the incoming transaction and build the feature vector from previously
         # saved feature_columns file.
         last_row = df.orderBy("transaction_timestamp").tail(1)[0]
-        feature_vector = np.array([last_row[f_column] for f_column in feature_column_list],dtype=np.float32)
+        features = apply_rollup_features(last_row.asDict(), transaction, batch_rows, rollup_aggregates)
+        feature_vector = np.array([features[f_column] for f_column in feature_column_list], dtype=np.float32)
 
         print(f"Feature computation completed for user {transaction.get('user_id')}")
         return feature_vector
@@ -100,6 +112,26 @@ def _compute_streaming_features(
         return None
 
 
+async def _fetch_batch_lookups(async_dbm: AsyncDatabaseManager, transactions: list[dict]) -> tuple[dict, dict, dict]:
+    """
+    Runs the lookups of a micro-batch concurrently, so they take as long as the slowest query instead of their sum.
+
+    Args:
+        async_dbm (AsyncDatabaseManager): Open async manager
+        transactions (list[dict]): Transactions of the micro-batch
+    Returns:
+        tuple[dict, dict, dict]: User histories of the past RAW_HISTORY_HOURS and rollup aggregates keyed by user_id,
+        merchant rows keyed by merchant_id
+    """
+    user_ids = [t["user_id"] for t in transactions]
+    histories, aggregates, merchants = await asyncio.gather(
+        async_dbm.fetch_transaction_histories(user_ids, hours=RAW_HISTORY_HOURS),
+        async_dbm.fetch_users_rollup_aggregates(user_ids),
+        async_dbm.fetch_merchant_infos([t["merchant_id"] for t in transactions]),
+    )
+    return histories["user_id"], aggregates, merchants
+
+
 def _process_batch(
         batch_df: DataFrame,
         batch_id: int,
@@ -109,6 +141,10 @@ def _process_batch(
         scaler,
         feature_column_list: list[str],
         alert_producer: KafkaProducer,
+        dbm: DatabaseManager,
+        writer: BufferedDatabaseWriter,
+        async_dbm: AsyncDatabaseManager | None,
+        event_loop: BackgroundEventLoop | None,
 ) -> None:
     """
     Processes a micro-batch of transactions from Kafka. Computes features, scores each transaction and prints fraud
@@ -123,18 +159,48 @@ def _process_batch(
         scaler: Fitted StandardScaler matching the training pipeline
         feature_column_list (list[str]): List of feature_names that will be used to construct the feature vector
         alert_producer (KafkaProducer): Kafka producer used to publish fraud alerts to the fraud_alerts topic
+        dbm (DatabaseManager): Pooled DatabaseManager shared across micro-batches
+        writer (BufferedDatabaseWriter): Write-behind sink for transactions and fraud alerts
+        async_dbm (AsyncDatabaseManager | None): Async manager used for the concurrent history and merchant lookups,
+            None for the in-memory backend
+        event_loop (BackgroundEventLoop | None): Persistent event loop async_dbm runs on
     Returns:
         None
     """
     if batch_df.isEmpty():
         return
 
-    dbm = DatabaseManager()
     transactions = [row.asDict() for row in batch_df.collect()]
 
+    # One history and one rollup query for all users in the micro-batch, running concurrently with the merchant
+    # lookups. They run before any row of this batch is queued, so the rollups don't contain the batch yet.
+    if async_dbm is not None:
+        user_histories, rollup_aggregates, merchants = event_loop.run(_fetch_batch_lookups(async_dbm, transactions))
+    else:
+        user_ids = [t["user_id"] for t in transactions]
+        user_histories = dbm.fetch_transaction_histories(user_ids, hours=RAW_HISTORY_HOURS)["user_id"]
+        rollup_aggregates = dbm.fetch_users_rollup_aggregates(user_ids)
+        merchants = {m: dbm.fetch_merchant_info(m) for m in {t["merchant_id"] for t in transactions}}
+
+    batch_rows = {user_id: [] for user_id in user_histories}
+
     for transaction in transactions:
-        dbm.insert_transaction(transaction)
-        features = _compute_streaming_features(transaction, dbm, spark, feature_column_list)
+        # Ids are assigned here instead of by Postgres, so alerts can reference transactions that are not written yet
+        if transaction.get("transaction_id") is None:
+            transaction["transaction_id"] = str(uuid.uuid4())
+        # We need the merchant category for every transaction of the batch
+        transaction["merchant_category"] = merchants[transaction["merchant_id"]]["merchant_category"]
+
+        # Transactions are written behind, so we add the batch to the histories ourselves
+        batch_row = filter_single_transaction(transaction)
+        user_histories[transaction["user_id"]].append(batch_row)
+        batch_rows[transaction["user_id"]].append(batch_row)
+        writer.write_transaction(transaction)
+
+    for transaction in transactions:
+        user_id = transaction["user_id"]
+        features = _compute_streaming_features(transaction, user_histories[user_id], batch_rows[user_id],
+                                               rollup_aggregates[user_id], spark, feature_column_list)
         if features is None:
             continue
 
@@ -152,12 +218,22 @@ def _process_batch(
             }
 
             alert_producer.send("fraud_alerts", value=alert) # Write to Kafka fraud_alerts topic
-
-            dbm.insert_fraud_alert(alert)
+            writer.write_fraud_alert(alert)
 
             print(f"FRAUD ALERT: {alert}")
 
     alert_producer.flush()  # Flush once after all transactions in batch are processed
+    # Rows have to be visible to the next batch's history query. A failed write raises here, so Spark fails this
+    # micro-batch and replays it instead of committing its offsets.
+    writer.flush()
+    lookup_dbm = async_dbm if async_dbm is not None else dbm
+    print(f"Batch {batch_id} connection pool stats: {dbm.pool_stats()}, lookups: {lookup_dbm.pool_stats()}")
+    print(f"Batch {batch_id} buffered writer stats: {writer.stats()}")
+    if batch_id % METRICS_REPORT_EVERY_N_BATCHES == 0:
+        print(f"DatabaseManager query metrics after batch {batch_id}:\n{dbm.metrics.format_summary()}")
+        if async_dbm is not None:
+            print(f"AsyncDatabaseManager query metrics after batch {batch_id}:\n{async_dbm.metrics.format_summary()}")
+    print(f"Batch {batch_id} lookup cache stats: {lookup_dbm.cache_stats()}")
 
 
 def run_streaming(model_name: str = "xgb") -> None:
@@ -200,18 +276,39 @@ def run_streaming(model_name: str = "xgb") -> None:
         value_serializer=lambda x: json.dumps(x, default=str).encode("utf-8")
     )
 
+    # One pooled manager for the whole stream, so connections are reused across transactions and micro-batches
+    dbm = create_database_manager(pooled=True, instrumented=True)
+    dbm.create_transaction_partitions()  # Make sure upcoming months exist before we insert into them
+    writer = BufferedDatabaseWriter(dbm)
+    # With postgres, lookups run on the async manager. Its pool lives on one persistent event loop shared by all
+    # micro-batches. The in-memory backend (DATABASE_BACKEND=memory) answers lookups directly.
+    event_loop = async_dbm = None
+    if isinstance(dbm, DatabaseManager):
+        event_loop = BackgroundEventLoop()
+        async_dbm = event_loop.run(AsyncDatabaseManager(cached=True, instrumented=True).open())
+
     # We wrap _process_batch in lambda because it doesnt match the function signature of foreachBatch. With lambda,
     # we have access to the previously calculated variables in the scope and can therefore call _process_batch inside
     # foreachBatch
     query = (
         parsed_stream.writeStream
         .foreachBatch(lambda df, batch_id:
-                              _process_batch(df, batch_id, spark, model, model_name, scaler, feature_column_list, alert_producer))
+                              _process_batch(df, batch_id, spark, model, model_name, scaler, feature_column_list,
+                                             alert_producer, dbm, writer, async_dbm, event_loop))
         .option("checkpointLocation", "/tmp/fraud_checkpoint")
         .start()
     )
 
-    query.awaitTermination()
+    try:
+        query.awaitTermination()
+    finally:
+        try:
+            writer.close()  # Writes every queued row before the pool is closed, raises if rows failed
+        finally:
+            dbm.close()
+            if async_dbm is not None:
+                event_loop.run(async_dbm.close())
+                event_loop.close()
 
 
 if __name__ == "__main__":
@@ -29,6 +29,19 @@ def read_table(spark: SparkSession, table_name: str) -> DataFrame:
     return spark.read.jdbc(url=JDBC_URL, table=table_name, properties=JDBC_PROPERTIES)
 
 
+def read_query(spark: SparkSession, query: str) -> DataFrame:
+    """
+    Reads the result of a query from postgres into a spark df via JDBC, so filters run in postgres instead of spark.
+
+    Args:
+        spark (SparkSession): Active spark session used to create the df
+        query (str): SELECT statement without trailing semicolon
+    Returns:
+        DataFrame: Spark df containing the query result.
+    """
+    return spark.read.jdbc(url=JDBC_URL, table=f"({query}) AS query_result", properties=JDBC_PROPERTIES)
+
+
 def write_table(df: DataFrame, table_name: str, mode: str = "overwrite") -> None:
     """
     Writes a spark df to a postgres table via JDBC.
@@ -17,4 +17,6 @@ TRANSACTION_MESSAGE_SCHEMA = StructType([
     StructField("is_fraudulent", IntegerType()),
     StructField("fraud_type", StringType()),
     StructField("payment_created_at", StringType()),  # Needed for payment_method_age_days
+    StructField("payment_method", StringType()),
+    StructField("payment_service_provider", StringType()),
 ])
\ No newline at end of file
@@ -0,0 +1,957 @@
+import os
+import time
+import uuid
+import asyncio
+import functools
+import threading
+from collections import namedtuple
+from decimal import Decimal
+from datetime import datetime
+from pathlib import Path
+
+import asyncpg
+from dotenv import load_dotenv
+
+from src.LookupCache import LRUTTLCache
+from src.QueryMetrics import QueryMetrics
+from src.DatabaseManager import _count_rows, _users_rollup_row
+from src.columnar import NUMERIC_OID, STRING_OIDS, COLUMNAR_OUTPUTS, to_numpy_columns, to_arrow_table
+from src.constants import DB_POOL_PARAMS, LOOKUP_CACHE_PARAMS, SERVER_CURSOR_ITERSIZE
+
+
+env_path = Path(__file__).resolve().parent.parent / "credentials.env"
+load_dotenv(dotenv_path=env_path)
+
+# Same queries as in DatabaseManager, with asyncpg's $n placeholders. The look back window is passed as number of hours.
+USER_HISTORY_QUERY = """
+    SELECT t.user_id, t.device_id, t.transaction_amount_usd, t.transaction_status, t.payment_id,
+           t.transaction_timestamp, t.transaction_country, t.merchant_id, t.transaction_channel,
+           m.merchant_category
+    FROM transactions t
+    JOIN merchants m ON t.merchant_id = m.merchant_id
+    WHERE t.user_id = $1
+    AND t.transaction_timestamp >= NOW() - make_interval(hours => $2)
+    ORDER BY t.transaction_timestamp ASC;
+"""
+
+HISTORIES_QUERY = """
+    SELECT t.user_id, t.device_id, t.transaction_amount_usd, t.transaction_status, t.payment_id,
+           t.transaction_timestamp, t.transaction_country, t.merchant_id, t.transaction_channel,
+           m.merchant_category
+    FROM transactions t
+    JOIN merchants m ON t.merchant_id = m.merchant_id
+    WHERE (t.user_id = ANY($1::integer[]) OR t.device_id = ANY($2::integer[]))
+    AND t.transaction_timestamp >= NOW() - make_interval(hours => $3)
+    ORDER BY t.transaction_timestamp ASC;
+"""
+
+DEVICE_RECENT_QUERY = """
+    SELECT device_id, transaction_timestamp
+    FROM transactions
+    WHERE device_id = $1
+    AND transaction_timestamp >= NOW() - make_interval(hours => $2)
+    ORDER BY transaction_timestamp ASC;
+"""
+
+REPLAY_QUERY = """
+    SELECT t.*, p.created_at AS payment_created_at, p.payment_method, p.payment_service_provider
+    FROM transactions t
+    LEFT JOIN payment_methods p ON p.payment_method_id = t.payment_id
+    WHERE t.transaction_timestamp >= COALESCE($1::timestamp, '-infinity'::timestamp)
+    AND t.transaction_timestamp < COALESCE($2::timestamp, 'infinity'::timestamp)
+    ORDER BY t.transaction_timestamp, t.transaction_id;
+"""
+
+USERS_ROLLUP_QUERY = """
+    WITH bounds AS (SELECT COALESCE($2::timestamp, LOCALTIMESTAMP) AS as_of),
+    users AS (SELECT DISTINCT unnest($1::integer[]) AS user_id),
+    amounts AS (
+        SELECT r.user_id, SUM(r.transaction_count) AS transaction_count_7d, SUM(r.amount_sum) AS amount_sum_7d
+        FROM bounds b
+        JOIN user_transaction_rollups_hourly r
+            ON r.user_id = ANY($1::integer[])
+            AND r.bucket_start >= date_trunc('hour', b.as_of - INTERVAL '7 days')
+            AND r.bucket_start <= b.as_of
+        GROUP BY r.user_id
+    ),
+    categories AS (
+        SELECT r.user_id, bit_or(r.category_bits) AS bits
+        FROM bounds b
+        JOIN user_transaction_rollups_daily r
+            ON r.user_id = ANY($1::integer[])
+            AND r.bucket_start >= date_trunc('day', b.as_of - INTERVAL '30 days')
+            AND r.bucket_start <= b.as_of
+        GROUP BY r.user_id
+    )
+    SELECT u.user_id,
+           COALESCE(a.transaction_count_7d, 0) AS transaction_count_7d,
+           COALESCE(a.amount_sum_7d, 0) AS amount_sum_7d,
+           ARRAY(SELECT m.merchant_category FROM merchant_category_bits m
+                 WHERE COALESCE(c.bits, 0) & (1::bigint << m.bit) <> 0) AS merchant_categories_30d,
+           (SELECT MAX(t.transaction_timestamp) FROM transactions t, bounds b
+            WHERE t.user_id = u.user_id AND t.transaction_timestamp <= b.as_of) AS last_transaction_timestamp
+    FROM users u
+    LEFT JOIN amounts a ON a.user_id = u.user_id
+    LEFT JOIN categories c ON c.user_id = u.user_id;
+"""
+
+# asyncpg doesn't report the declared precision of NUMERIC columns, the columnar methods take it from db/init.sql
+NUMERIC_PRECISION = {"transaction_amount_local": (15, 2), "transaction_amount_usd": (15, 2)}
+
+# Stand-in for a psycopg2 cursor.description entry, as expected by src.columnar
+_Column = namedtuple("_Column", ["name", "type_code", "precision", "scale"])
+
+
+def _instrumented_async(method):
+    """Async counterpart of DatabaseManager's instrumentation decorator."""
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        if self.metrics is None:
+            return await method(self, *args, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            result = await method(self, *args, **kwargs)
+        except Exception:
+            self.metrics.record(method.__name__, time.perf_counter() - start, error=True)
+            raise
+        self.metrics.record(method.__name__, time.perf_counter() - start, rows=_count_rows(result))
+
+        return result
+
+    return wrapper
+
+
+def _instrumented_async_stream(method):
+    """Async counterpart of DatabaseManager's stream instrumentation decorator, for async generator methods."""
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        if self.metrics is None:
+            async for row in method(self, *args, **kwargs):
+                yield row
+            return
+
+        start = time.perf_counter()
+        rows = 0
+        error = False
+        try:
+            async for row in method(self, *args, **kwargs):
+                rows += 1
+                yield row
+        except GeneratorExit:
+            raise  # Caller stopped early, not an error
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.metrics.record(method.__name__, time.perf_counter() - start, rows=rows, error=error)
+
+    return wrapper
+
+
+def _quote_identifier(name: str) -> str:
+    # asyncpg has no counterpart of psycopg2.sql.Identifier
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _to_datetime(value) -> datetime | None:
+    # asyncpg only accepts datetime objects, Kafka messages carry ISO strings
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+
+def _to_float(value) -> float | None:
+    # Faker returns coordinates as Decimal or str, asyncpg only accepts floats for float columns
+    return float(value) if value is not None else None
+
+
+def _to_decimal(value) -> Decimal | None:
+    return Decimal(str(value)) if value is not None else None
+
+
+def _to_uuid(value) -> uuid.UUID | None:
+    if value is None or isinstance(value, uuid.UUID):
+        return value
+    return uuid.UUID(str(value))
+
+
+class AsyncDatabaseManager:
+    """
+    asyncio counterpart of DatabaseManager on top of an asyncpg connection pool, so independent lookups can run
+    concurrently (e.g. with asyncio.gather) instead of one after another. Methods have the same names, arguments and
+    return shapes (dicts, lists of dicts, str transaction_ids) as their DatabaseManager versions, the iter_* methods
+    are async generators. Bulk insert methods write all rows with one statement, so they take no page_size.
+
+    Only available on DatabaseManager: schema and bulk load operations (partitions, COPY, id sequences, EXPLAIN) and
+    the per user rollup reads (fetch_rollup_buckets, fetch_user_*_aggregates). These are run by offline scripts and
+    jobs, not on the concurrent lookup path, which uses fetch_users_rollup_aggregates.
+
+    Usage:
+        async with AsyncDatabaseManager(cached=True) as dbm:
+            history, merchant = await asyncio.gather(
+                dbm.fetch_user_transaction_history(user_id, 720), dbm.fetch_merchant_info(merchant_id)
+            )
+    """
+    def __init__(
+            self,
+            min_connections: int | None = None,
+            max_connections: int | None = None,
+            cached: bool = False,
+            instrumented: bool = False,
+    ):
+        """
+        Sets up the connection config, the pool itself is created by open(). Pool bounds fall back to
+        POSTGRES_POOL_MIN/POSTGRES_POOL_MAX and then to DB_POOL_PARAMS, caching and instrumentation work like in
+        DatabaseManager.
+
+        Args:
+            min_connections (int | None): Connections opened when the pool is created.
+            max_connections (int | None): Maximum number of simultaneously open connections, this bounds the number of
+                queries running concurrently.
+            cached (bool): Whether to cache merchant and payment method lookups. Defaults to False.
+            instrumented (bool): Whether to record per method query metrics. Defaults to False.
+        """
+        self.db_config = {
+            "host": os.getenv("POSTGRES_HOST"),
+            "port": int(os.getenv("POSTGRES_PORT", 5432)),
+            "database": os.getenv("POSTGRES_DB"),
+            "user": os.getenv("POSTGRES_USER"),
+            "password": os.getenv("POSTGRES_PASSWORD")
+        }
+        self.min_connections = min_connections if min_connections is not None \
+            else int(os.getenv("POSTGRES_POOL_MIN", DB_POOL_PARAMS["min_connections"]))
+        self.max_connections = max_connections if max_connections is not None \
+            else int(os.getenv("POSTGRES_POOL_MAX", DB_POOL_PARAMS["max_connections"]))
+
+        self.pool = None
+        self.metrics = QueryMetrics() if instrumented else None
+
+        self.caches = {}
+        if cached:
+            self.caches = {
+                name: LRUTTLCache(max_size=params["max_size"], ttl_seconds=params["ttl_seconds"])
+                for name, params in LOOKUP_CACHE_PARAMS.items()
+            }
+
+    async def open(self) -> "AsyncDatabaseManager":
+        """Creates the connection pool. Called by `async with`."""
+        if self.pool is None:
+            self.pool = await asyncpg.create_pool(
+                **self.db_config,
+                min_size=self.min_connections,
+                max_size=self.max_connections,
+            )
+        return self
+
+    async def close(self) -> None:
+        """Closes all pooled connections."""
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def pool_stats(self) -> dict | None:
+        """
+        Returns the pool size, idle connections and configured bounds.
+
+        Returns:
+            dict | None: Pool statistics or None if the pool is not open.
+        """
+        if self.pool is None:
+            return None
+        return {
+            "size": self.pool.get_size(),
+            "idle": self.pool.get_idle_size(),
+            "in_use": self.pool.get_size() - self.pool.get_idle_size(),
+            "min_connections": self.min_connections,
+            "max_connections": self.max_connections,
+        }
+
+    def cache_stats(self) -> dict:
+        """Returns hit/miss counters per lookup cache, empty if the manager is not cached."""
+        return {name: cache.stats() for name, cache in self.caches.items()}
+
+    def _cache_get(self, cache_name: str, key) -> dict | None:
+        cache = self.caches.get(cache_name)
+        if cache is None:
+            return None
+        row = cache.get(key)
+        return dict(row) if row is not None else None
+
+    def _cache_put(self, cache_name: str, key, row: dict | None) -> None:
+        if cache_name in self.caches and row is not None:
+            self.caches[cache_name].put(key, dict(row))
+
+    def _cache_invalidate(self, cache_name: str, key) -> None:
+        if cache_name in self.caches:
+            self.caches[cache_name].invalidate(key)
+
+    def metrics_summary(self) -> dict | None:
+        """Returns calls, rows and latency percentiles per method, None if the manager is not instrumented."""
+        return self.metrics.summary() if self.metrics is not None else None
+
+    async def _fetch(self, query: str, *args) -> list[dict]:
+        rows = await self.pool.fetch(query, *args)
+        return [dict(row) for row in rows]
+
+    async def _fetchrow(self, query: str, *args) -> dict | None:
+        row = await self.pool.fetchrow(query, *args)
+        return dict(row) if row is not None else None
+
+    @_instrumented_async
+    async def insert_user(self, user_data: dict) -> int:
+        try:
+            query = """
+                INSERT INTO users (name, email, country, city, latitude, longitude, created_at)
+                VALUES ($1, $2, $3, $4, $5, $6, $7)
+                RETURNING user_id
+            """
+            return await self.pool.fetchval(
+                query,
+                user_data["name"],
+                user_data["email"],
+                user_data["country"],
+                user_data["city"],
+                _to_float(user_data["latitude"]),
+                _to_float(user_data["longitude"]),
+                _to_datetime(user_data["created_at"]),
+            )
+
+        except Exception as e:
+            print(f"Error updating database: {e}")
+            raise
+
+    @_instrumented_async
+    async def insert_device(self, user_device: dict) -> int:
+        try:
+            query = """
+                INSERT INTO user_devices (user_id, device_type, first_used, last_used)
+                VALUES ($1, $2, $3, $4)
+                RETURNING device_id
+            """
+            return await self.pool.fetchval(
+                query,
+                user_device["user_id"],
+                user_device["device_type"],
+                _to_datetime(user_device["first_used"]),
+                _to_datetime(user_device["last_used"]),
+            )
+
+        except Exception as e:
+            print(f"Error updating database: {e}")
+            raise
+
+    @_instrumented_async
+    async def insert_payment_method(self, user_payment_method: dict) -> int:
+        try:
+            query = """
+                INSERT INTO payment_methods (user_id, payment_method, payment_service_provider, payment_is_active, created_at)
+                VALUES ($1, $2, $3, $4, $5)
+                RETURNING payment_method_id
+            """
+            payment_method_id = await self.pool.fetchval(query, *self._payment_method_row(user_payment_method))
+            # The new method can be the user's oldest active one now
+            self._cache_invalidate("active_payment_method", user_payment_method["user_id"])
+
+            return payment_method_id
+
+        except Exception as e:
+            print(f"Error updating database: {e}")
+            raise
+
+    @_instrumented_async
+    async def insert_payment_methods(self, payment_methods: list[dict]) -> list[int]:
+        """
+        Inserts many payment methods with a single statement (one array parameter per column).
+
+        Args:
+            payment_methods (list[dict]): Payment method dicts as produced by PaymentMethodGenerator
+        Returns:
+            list[int]: Generated payment_method_ids in input order
+        """
+        if not payment_methods:
+            return []
+
+        try:
+            query = """
+                INSERT INTO payment_methods (user_id, payment_method, payment_service_provider, payment_is_active, created_at)
+                SELECT r.user_id, r.payment_method, r.provider, r.is_active, r.created_at
+                FROM unnest($1::integer[], $2::varchar[], $3::varchar[], $4::integer[], $5::timestamp[])
+                    WITH ORDINALITY AS r(user_id, payment_method, provider, is_active, created_at, n)
+                ORDER BY r.n
+                RETURNING payment_method_id
+            """
+            columns = [list(column) for column in zip(*(self._payment_method_row(pm) for pm in payment_methods))]
+            rows = await self.pool.fetch(query, *columns)
+
+            for pm in payment_methods:
+                self._cache_invalidate("active_payment_method", pm["user_id"])
+
+            return [row["payment_method_id"] for row in rows]
+
+        except Exception as e:
+            print(f"Error inserting {len(payment_methods)} payment methods: {e}")
+            raise
+
+    @staticmethod
+    def _payment_method_row(payment_method: dict) -> tuple:
+        return (
+            payment_method["user_id"],
+            payment_method["payment_method"],
+            payment_method["service_provider"],
+            payment_method["payment_is_active"],
+            _to_datetime(payment_method["created_at"]),
+        )
+
+    @_instrumented_async
+    async def insert_merchant(self, merchant_data: dict) -> int:
+        try:
+            query = """
+                INSERT INTO merchants (merchant_name, country, rating, merchant_category)
+                VALUES ($1, $2, $3, $4)
+                RETURNING merchant_id
+            """
+            return await self.pool.fetchval(
+                query,
+                merchant_data["name"],
+                merchant_data["country"],
+                merchant_data["rating"],
+                merchant_data["category"],
+            )
+
+        except Exception as e:
+            print(f"Error updating database: {e}")
+            raise
+
+    @_instrumented_async
+    async def insert_transaction(self, transaction_data: dict) -> str:
+        try:
+            query = """
+                INSERT INTO transactions (transaction_id, transaction_amount_local, transaction_amount_usd, transaction_timestamp, transaction_status, transaction_currency, transaction_country, transaction_channel, user_id, merchant_id, payment_id, device_id, is_fraudulent, fraud_type)
+                VALUES (COALESCE($1, gen_random_uuid()), $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14)
+                RETURNING transaction_id
+            """
+            transaction_id = await self.pool.fetchval(query, *self._transaction_row(transaction_data))
+
+            return str(transaction_id)
+
+        except Exception as e:
+            print(f"Error updating database: {e}")
+            raise
+
+    @_instrumented_async
+    async def insert_transactions(self, transactions: list[dict]) -> list[str]:
+        """
+        Inserts many transactions with a single statement (one array parameter per column).
+
+        Args:
+            transactions (list[dict]): Transaction dicts as produced by TransactionGenerator
+        Returns:
+            list[str]: transaction_ids in input order
+        """
+        if not transactions:
+            return []
+
+        try:
+            query = """
+                INSERT INTO transactions (transaction_id, transaction_amount_local, transaction_amount_usd, transaction_timestamp, transaction_status, transaction_currency, transaction_country, transaction_channel, user_id, merchant_id, payment_id, device_id, is_fraudulent, fraud_type)
+                SELECT COALESCE(r.transaction_id, gen_random_uuid()), r.amount_local, r.amount_usd, r.ts, r.status, r.currency,
+                       r.country, r.channel, r.user_id, r.merchant_id, r.payment_id, r.device_id, r.is_fraudulent, r.fraud_type
+                FROM unnest($1::uuid[], $2::numeric[], $3::numeric[], $4::timestamp[], $5::varchar[], $6::varchar[],
+                            $7::varchar[], $8::varchar[], $9::integer[], $10::integer[], $11::integer[], $12::integer[],
+                            $13::integer[], $14::varchar[])
+                    WITH ORDINALITY AS r(transaction_id, amount_local, amount_usd, ts, status, currency, country, channel,
+                                         user_id, merchant_id, payment_id, device_id, is_fraudulent, fraud_type, n)
+                ORDER BY r.n
+                RETURNING transaction_id
+            """
+            columns = [list(column) for column in zip(*(self._transaction_row(t) for t in transactions))]
+            rows = await self.pool.fetch(query, *columns)
+
+            return [str(row["transaction_id"]) for row in rows]
+
+        except Exception as e:
+            print(f"Error inserting {len(transactions)} transactions: {e}")
+            raise
+
+    @staticmethod
+    def _transaction_row(transaction: dict) -> tuple:
+        """Column values of a transaction dict converted to the types asyncpg expects."""
+        return (
+            _to_uuid(transaction.get("transaction_id")),
+            _to_decimal(transaction["transaction_amount_local"]),
+            _to_decimal(transaction["transaction_amount_usd"]),
+            _to_datetime(transaction["transaction_timestamp"]),
+            transaction["transaction_status"],
+            transaction["transaction_currency"],
+            transaction["transaction_country"],
+            transaction["transaction_channel"],
+            transaction["user_id"],
+            transaction["merchant_id"],
+            transaction["payment_id"],
+            transaction["device_id"],
+            transaction["is_fraudulent"],
+            transaction["fraud_type"],
+        )
+
+    @_instrumented_async
+    async def fetch_active_payment_method(self, user_id: int) -> dict | None:
+        cached = self._cache_get("active_payment_method", user_id)
+        if cached is not None:
+            return cached
+
+        try:
+            query = """
+                SELECT *
+                FROM payment_methods
+                WHERE user_id = $1 AND payment_is_active = 1
+                ORDER BY created_at ASC
+                LIMIT 1;
+            """
+            result = await self._fetchrow(query, user_id)
+            self._cache_put("active_payment_method", user_id, result)
+
+            return result
+
+        except Exception as e:
+            print(f"Error fetching payment_id: {e}")
+            raise
+
+    @_instrumented_async
+    async def fetch_payment_info(self, payment_id: int) -> dict | None:
+        cached = self._cache_get("payment_method", payment_id)
+        if cached is not None:
+            return cached
+
+        try:
+            query = """
+                SELECT *
+                FROM payment_methods
+                WHERE payment_method_id = $1;
+            """
+            result = await self._fetchrow(query, payment_id)
+            self._cache_put("payment_method", payment_id, result)
+
+            return result
+
+        except Exception as e:
+            print(f"Error fetching payment info for payment_id {payment_id}: {e}")
+            raise
+
+    @_instrumented_async
+    async def deactivate_payment_method(self, payment_id: int) -> bool:
+        try:
+            query = """
+                UPDATE payment_methods
+                SET payment_is_active = 0
+                WHERE payment_method_id = $1
+                RETURNING user_id;
+            """
+            user_id = await self.pool.fetchval(query, payment_id)
+
+            self._cache_invalidate("payment_method", payment_id)
+            if user_id is not None:
+                self._cache_invalidate("active_payment_method", user_id)
+
+            return user_id is not None
+
+        except Exception as e:
+            print(f"Error deactivating payment method: {e}")
+            raise
+
+    @_instrumented_async
+    async def fetch_all_merchant_ids(self) -> list[int]:
+        try:
+            rows = await self.pool.fetch("SELECT merchant_id FROM merchants;")
+            return [row["merchant_id"] for row in rows]
+
+        except Exception as e:
+            print(f"Error fetching merchant ids: {e}")
+            raise
+
+    @_instrumented_async
+    async def fetch_random_user_id(self) -> int | None:
+        try:
+            return await self.pool.fetchval("SELECT user_id FROM users ORDER BY RANDOM() LIMIT 1;")
+
+        except Exception as e:
+            print(f"Error fetching user_id: {e}")
+            raise
+
+    @_instrumented_async
+    async def fetch_random_device_id(self, user_id: int) -> int | None:
+        try:
+            query = """
+                SELECT device_id
+                FROM user_devices
+                WHERE user_id = $1
+                ORDER BY RANDOM()
+                LIMIT 1;
+            """
+            return await self.pool.fetchval(query, user_id)
+
+        except Exception as e:
+            print(f"Error fetching device_id: {e}")
+            raise
+
+    @_instrumented_async
+    async def fetch_user_device_ids(self, min_device_id: int = 0) -> list[tuple[int, int]]:
+        try:
+            query = """
+                SELECT user_id, device_id
+                FROM user_devices
+                WHERE device_id > $1
+                ORDER BY device_id ASC;
+            """
+            rows = await self.pool.fetch(query, min_device_id)
+            return [(row["user_id"], row["device_id"]) for row in rows]
+
+        except Exception as e:
+            print(f"Error fetching user and device ids: {e}")
+            raise
+
+    @_instrumented_async
+    async def fetch_user_transaction_history(self, user_id: int, hours: int) -> list[dict]:
+        try:
+            return await self._fetch(USER_HISTORY_QUERY, user_id, hours)
+
+        except Exception as e:
+            print(f"Error fetching transaction history for user {user_id}: {e}")
+            raise
+
+    @_instrumented_async
+    async def fetch_device_recent_transactions(self, device_id: int, hours: int) -> list[dict]:
+        try:
+            return await self._fetch(DEVICE_RECENT_QUERY, device_id, hours)
+
+        except Exception as e:
+            print(f"Error fetching recent transactions for device {device_id}: {e}")
+            raise
+
+    async def _iter_query(self, query: str, args: tuple, itersize: int, as_dict: bool):
+        """
+        Streams the result of a query through a server-side cursor, only `itersize` rows are prefetched at a time. The
+        connection stays checked out until the generator is exhausted or closed.
+
+        Args:
+            query (str): Query to run
+            args (tuple): Query arguments
+            itersize (int): Rows fetched per network round trip
+            as_dict (bool): Whether rows are yielded as dicts or as tuples
+        Yields:
+            dict | tuple: One row at a time
+        """
+        async with self.pool.acquire() as conn:
+            # asyncpg cursors only live inside a transaction
+            async with conn.transaction():
+                async for record in conn.cursor(query, *args, prefetch=itersize):
+                    yield dict(record) if as_dict else tuple(record)
+
+    @_instrumented_async_stream
+    async def iter_user_transaction_history(self, user_id: int, hours: int, itersize: int = SERVER_CURSOR_ITERSIZE):
+        """Streaming variant of fetch_user_transaction_history, see DatabaseManager.iter_user_transaction_history."""
+        try:
+            async for row in self._iter_query(USER_HISTORY_QUERY, (user_id, hours), itersize, as_dict=True):
+                yield row
+        except Exception as e:
+            print(f"Error streaming transaction history for user {user_id}: {e}")
+            raise
+
+    @_instrumented_async_stream
+    async def iter_device_recent_transactions(self, device_id: int, hours: int, itersize: int = SERVER_CURSOR_ITERSIZE):
+        """Streaming variant of fetch_device_recent_transactions, see DatabaseManager.iter_device_recent_transactions."""
+        try:
+            async for row in self._iter_query(DEVICE_RECENT_QUERY, (device_id, hours), itersize, as_dict=True):
+                yield row
+        except Exception as e:
+            print(f"Error streaming recent transactions for device {device_id}: {e}")
+            raise
+
+    @_instrumented_async_stream
+    async def iter_transactions_for_replay(
+            self,
+            start: datetime | None = None,
+            end: datetime | None = None,
+            itersize: int = SERVER_CURSOR_ITERSIZE,
+    ):
+        """Same contract as DatabaseManager.iter_transactions_for_replay."""
+        try:
+            async for row in self._iter_query(REPLAY_QUERY, (start, end), itersize, as_dict=True):
+                yield row
+        except Exception as e:
+            print(f"Error streaming transactions for replay: {e}")
+            raise
+
+    @_instrumented_async_stream
+    async def iter_table(
+            self,
+            table_name: str,
+            columns: list[str] | None = None,
+            itersize: int = SERVER_CURSOR_ITERSIZE,
+            as_dict: bool = False,
+    ):
+        """Same contract as DatabaseManager.iter_table."""
+        query = "SELECT {} FROM {}".format(
+            ", ".join(map(_quote_identifier, columns)) if columns else "*",
+            _quote_identifier(table_name),
+        )
+        try:
+            async for row in self._iter_query(query, (), itersize, as_dict=as_dict):
+                yield row
+        except Exception as e:
+            print(f"Error streaming table {table_name}: {e}")
+            raise
+
+    @_instrumented_async
+    async def fetch_transaction_histories(
+            self,
+            user_ids: list[int],
+            hours: int,
+            device_ids: list[int] | None = None,
+    ) -> dict[str, dict[int, list[dict]]]:
+        """
+        Same contract as DatabaseManager.fetch_transaction_histories.
+
+        Args:
+            user_ids (list[int]): Users whose history is fetched
+            hours (int): Look back window in hours
+            device_ids (list[int] | None): Devices whose history is fetched as well. Defaults to None.
+        Returns:
+            dict[str, dict[int, list[dict]]]: {"user_id": {user_id: rows}, "device_id": {device_id: rows}}
+        """
+        user_ids = list(set(user_ids))
+        device_ids = list(set(device_ids or []))
+        histories = {
+            "user_id": {user_id: [] for user_id in user_ids},
+            "device_id": {device_id: [] for device_id in device_ids},
+        }
+        if not user_ids and not device_ids:
+            return histories
+
+        try:
+            for row in await self._fetch(HISTORIES_QUERY, user_ids, device_ids, hours):
+                if row["user_id"] in histories["user_id"]:
+                    histories["user_id"][row["user_id"]].append(row)
+                if row["device_id"] in histories["device_id"]:
+                    histories["device_id"][row["device_id"]].append(row)
+
+            return histories
+
+        except Exception as e:
+            print(f"Error fetching transaction histories for {len(user_ids)} users and {len(device_ids)} devices: {e}")
+            raise
+
+    @_instrumented_async
+    async def fetch_users_rollup_aggregates(self, user_ids: list[int], as_of: datetime | None = None) -> dict[int, dict]:
+        """Same contract as DatabaseManager.fetch_users_rollup_aggregates."""
+        user_ids = list(set(user_ids))
+        if not user_ids:
+            return {}
+
+        try:
+            rows = await self._fetch(USERS_ROLLUP_QUERY, user_ids, as_of)
+            return {row["user_id"]: _users_rollup_row(row) for row in rows}
+
+        except Exception as e:
+            print(f"Error fetching rollup aggregates for {len(user_ids)} users: {e}")
+            raise
+
+    async def _fetch_columns(self, query: str, args: tuple, output: str):
+        """
+        Runs a query and converts the result with src.columnar, so results have the same types as the DatabaseManager
+        versions: NUMERIC values are handed over as float (numpy) or text (arrow) like the psycopg2 casters do.
+
+        Args:
+            query (str): Query to run
+            args (tuple): Query arguments
+            output (str): 'numpy' for a dict of NumPy arrays or 'arrow' for a pyarrow Table
+        Returns:
+            dict[str, np.ndarray] | pyarrow.Table: Columnar result
+        Raises:
+            ValueError: If output is not one of COLUMNAR_OUTPUTS.
+        """
+        if output not in COLUMNAR_OUTPUTS:
+            raise ValueError(f"Unknown columnar output '{output}', expected one of {COLUMNAR_OUTPUTS}")
+
+        async with self.pool.acquire() as conn:
+            statement = await conn.prepare(query)
+            records = await statement.fetch(*args)
+            attributes = statement.get_attributes()
+
+        description = [
+            _Column(attribute.name, attribute.type.oid, *NUMERIC_PRECISION.get(attribute.name, (None, None)))
+            for attribute in attributes
+        ]
+        numeric = float if output == "numpy" else str
+        converters = [
+            numeric if column.type_code == NUMERIC_OID else str if column.type_code in STRING_OIDS else None
+            for column in description
+        ]
+        rows = [
+            tuple(convert(value) if convert is not None and value is not None else value
+                  for convert, value in zip(converters, record))
+            for record in records
+        ]
+
+        if output == "numpy":
+            return to_numpy_columns(description, rows)
+        return to_arrow_table(description, rows)
+
+    @_instrumented_async
+    async def fetch_user_transaction_history_columns(self, user_id: int, hours: int, output: str = "numpy"):
+        """Columnar variant of fetch_user_transaction_history, see DatabaseManager.fetch_user_transaction_history_columns."""
+        try:
+            return await self._fetch_columns(USER_HISTORY_QUERY, (user_id, hours), output)
+        except Exception as e:
+            print(f"Error fetching columnar transaction history for user {user_id}: {e}")
+            raise
+
+    @_instrumented_async
+    async def fetch_device_recent_transactions_columns(self, device_id: int, hours: int, output: str = "numpy"):
+        """Columnar variant of fetch_device_recent_transactions."""
+        try:
+            return await self._fetch_columns(DEVICE_RECENT_QUERY, (device_id, hours), output)
+        except Exception as e:
+            print(f"Error fetching columnar recent transactions for device {device_id}: {e}")
+            raise
+
+    @_instrumented_async
+    async def fetch_transaction_histories_columns(
+            self,
+            user_ids: list[int],
+            hours: int,
+            device_ids: list[int] | None = None,
+            output: str = "numpy",
+    ):
+        """Same contract as DatabaseManager.fetch_transaction_histories_columns."""
+        try:
+            return await self._fetch_columns(
+                HISTORIES_QUERY, (list(set(user_ids)), list(set(device_ids or [])), hours), output
+            )
+        except Exception as e:
+            print(f"Error fetching columnar transaction histories for {len(user_ids)} users: {e}")
+            raise
+
+    @_instrumented_async
+    async def fetch_merchant_info(self, merchant_id: int) -> dict | None:
+        return await self._fetch_merchant_info(merchant_id)
+
+    async def _fetch_merchant_info(self, merchant_id: int) -> dict | None:
+        cached = self._cache_get("merchant", merchant_id)
+        if cached is not None:
+            return cached
+
+        try:
+            result = await self._fetchrow("SELECT * FROM merchants WHERE merchant_id = $1;", merchant_id)
+            self._cache_put("merchant", merchant_id, result)
+
+            return result
+
+        except Exception as e:
+            print(f"Error fetching merchant info for merchant_id {merchant_id}: {e}")
+            raise
+
+    @_instrumented_async
+    async def fetch_merchant_infos(self, merchant_ids: list[int]) -> dict[int, dict]:
+        """
+        Fetches many merchants concurrently, cached ones are served without a query.
+
+        Args:
+            merchant_ids (list[int]): Merchant ids, duplicates are looked up once
+        Returns:
+            dict[int, dict]: {merchant_id: merchant row}, unknown merchants are missing
+        """
+        merchant_ids = list(set(merchant_ids))
+        # Not instrumented per merchant, the whole call is recorded once with one row per merchant
+        results = await asyncio.gather(*(self._fetch_merchant_info(merchant_id) for merchant_id in merchant_ids))
+        return {merchant_id: row for merchant_id, row in zip(merchant_ids, results) if row is not None}
+
+    @_instrumented_async
+    async def insert_fraud_alert(self, alert: dict) -> int:
+        try:
+            query = """
+                INSERT INTO fraud_alerts (transaction_id, user_id, fraud_probability, model_name, alerted_at)
+                VALUES ($1, $2, $3, $4, $5)
+                RETURNING alert_id
+            """
+            return await self.pool.fetchval(query, *self._alert_row(alert))
+
+        except Exception as e:
+            print(f"Error inserting fraud alert: {e}")
+            raise
+
+    @_instrumented_async
+    async def insert_fraud_alerts(self, alerts: list[dict]) -> list[int]:
+        """
+        Inserts many fraud alerts with a single statement.
+
+        Args:
+            alerts (list[dict]): Alert dicts with transaction_id, user_id, fraud_probability, model_name, alerted_at
+        Returns:
+            list[int]: alert_ids in input order
+        """
+        if not alerts:
+            return []
+
+        try:
+            query = """
+                INSERT INTO fraud_alerts (transaction_id, user_id, fraud_probability, model_name, alerted_at)
+                SELECT r.transaction_id, r.user_id, r.fraud_probability, r.model_name, r.alerted_at
+                FROM unnest($1::uuid[], $2::integer[], $3::float8[], $4::varchar[], $5::timestamp[])
+                    WITH ORDINALITY AS r(transaction_id, user_id, fraud_probability, model_name, alerted_at, n)
+                ORDER BY r.n
+                RETURNING alert_id
+            """
+            columns = [list(column) for column in zip(*(self._alert_row(alert) for alert in alerts))]
+            rows = await self.pool.fetch(query, *columns)
+
+            return [row["alert_id"] for row in rows]
+
+        except Exception as e:
+            print(f"Error inserting {len(alerts)} fraud alerts: {e}")
+            raise
+
+    @staticmethod
+    def _alert_row(alert: dict) -> tuple:
+        return (
+            _to_uuid(alert["transaction_id"]),
+            alert["user_id"],
+            alert["fraud_probability"],
+            alert["model_name"],
+            _to_datetime(alert["alerted_at"]),
+        )
+
+
+class BackgroundEventLoop:
+    """
+    Event loop running forever in a daemon thread, so synchronous code (e.g. Spark's foreachBatch callbacks) can run
+    coroutines on one persistent loop and AsyncDatabaseManager keeps its pool between calls.
+    """
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="BackgroundEventLoop", daemon=True)
+        self._thread.start()
+
+    def run(self, coroutine, timeout: float | None = None):
+        """
+        Runs a coroutine on the background loop and blocks until it finished.
+
+        Args:
+            coroutine: Coroutine to run
+            timeout (float | None): Seconds to wait for the result. Defaults to None (no limit).
+        Returns:
+            The coroutine's result, its exceptions are re-raised in the calling thread.
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
+    def close(self) -> None:
+        """Stops the loop and waits for the thread to exit."""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
@@ -0,0 +1,236 @@
+import queue
+import threading
+import time
+
+from src.DatabaseManager import DatabaseManager
+from src.constants import BUFFERED_WRITER_PARAMS
+
+
+class BufferFullError(Exception):
+    """Exception raised when a row could not be queued because the writer stayed at capacity for the whole timeout."""
+    pass
+
+
+class BufferedWriteError(Exception):
+    """Exception raised by flush() and close() when rows could not be written after max_retries attempts."""
+    pass
+
+
+class BufferedDatabaseWriter:
+    """
+    Write-behind sink for transactions and fraud alerts. Rows are queued by the caller and written by a background
+    thread with the bulk insert methods of DatabaseManager, either once max_batch_size rows are waiting or every
+    flush_interval_seconds. Transactions are always written before alerts of the same flush.
+
+    Guarantees:
+        - Backpressure: each queue holds at most max_queue_size rows, write_* blocks while it is full and raises
+          BufferFullError after enqueue_timeout_seconds.
+        - Flush on shutdown: close() writes every queued row before it returns.
+        - flush() blocks until every row queued before the call is written or has failed max_retries times.
+        - No silent loss: rows that failed max_retries times make the next flush() or close() raise
+          BufferedWriteError, so a caller like a Spark foreachBatch fails and its input is replayed. With
+          drop_failed=True they are only counted as dropped instead.
+    """
+    _TABLES = ("transactions", "fraud_alerts")  # Flush order, parents first
+
+    def __init__(
+            self,
+            dbm: DatabaseManager,
+            max_batch_size: int = BUFFERED_WRITER_PARAMS["max_batch_size"],
+            flush_interval_seconds: float = BUFFERED_WRITER_PARAMS["flush_interval_seconds"],
+            max_queue_size: int = BUFFERED_WRITER_PARAMS["max_queue_size"],
+            enqueue_timeout_seconds: float = BUFFERED_WRITER_PARAMS["enqueue_timeout_seconds"],
+            max_retries: int = BUFFERED_WRITER_PARAMS["max_retries"],
+            drop_failed: bool = BUFFERED_WRITER_PARAMS["drop_failed"],
+    ) -> None:
+        """
+        Starts the background flush thread.
+
+        Args:
+            dbm (DatabaseManager): DatabaseManager used for the bulk inserts, ideally pooled
+            max_batch_size (int): Queued rows per table that trigger an early flush and rows per bulk statement
+            flush_interval_seconds (float): Maximum time a row waits in the queue
+            max_queue_size (int): Capacity per table queue
+            enqueue_timeout_seconds (float): Seconds write_* blocks on a full queue before raising BufferFullError
+            max_retries (int): Attempts per bulk statement before its rows fail
+            drop_failed (bool): Drop failed rows instead of raising BufferedWriteError from the next flush() or
+            close(). Defaults to False.
+        Returns:
+            None
+        """
+        self.dbm = dbm
+        self.max_batch_size = max_batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.enqueue_timeout_seconds = enqueue_timeout_seconds
+        self.max_retries = max_retries
+        self.drop_failed = drop_failed
+
+        self._queues = {table: queue.Queue(maxsize=max_queue_size) for table in self._TABLES}
+        self._insert_functions = {
+            "transactions": self.dbm.insert_transactions,
+            "fraud_alerts": self.dbm.insert_fraud_alerts,
+        }
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._failure = None  # (failed rows, last exception) since the last flush()/close() that raised
+        self._stats = {
+            "enqueued": 0,
+            "written": 0,
+            "failed": 0,
+            "dropped": 0,
+            "flushes": 0,
+            "failed_statements": 0,
+            "backpressure_waits": 0,
+            "last_flush_seconds": 0.0,
+        }
+
+        self._thread = threading.Thread(target=self._run, name="BufferedDatabaseWriter", daemon=True)
+        self._thread.start()
+
+    def write_transaction(self, transaction: dict) -> None:
+        """Queues a transaction. Set transaction_id beforehand if other rows (e.g. alerts) have to reference it."""
+        self._put("transactions", transaction)
+
+    def write_fraud_alert(self, alert: dict) -> None:
+        """Queues a fraud alert."""
+        self._put("fraud_alerts", alert)
+
+    def _put(self, table: str, row: dict) -> None:
+        if self._stop.is_set():
+            raise RuntimeError("BufferedDatabaseWriter is closed")
+
+        table_queue = self._queues[table]
+        try:
+            table_queue.put_nowait(row)
+        except queue.Full:
+            # Backpressure: wake the flusher and wait for room instead of growing without bound
+            self._increment("backpressure_waits")
+            self._wake.set()
+            try:
+                table_queue.put(row, timeout=self.enqueue_timeout_seconds)
+            except queue.Full:
+                raise BufferFullError(f"{table} buffer stayed full for {self.enqueue_timeout_seconds}s") from None
+
+        self._increment("enqueued")
+        if table_queue.qsize() >= self.max_batch_size:
+            self._wake.set()
+
+    def _increment(self, key: str, value: int | float = 1) -> None:
+        with self._stats_lock:
+            self._stats[key] += value
+
+    def _run(self) -> None:
+        """Background loop: flushes on size trigger, on interval and a last time after close() was called."""
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval_seconds)
+            self._wake.clear()
+            self._flush_queues()
+
+        self._flush_queues()  # Final flush, close() waits for it
+
+    def _flush_queues(self) -> None:
+        start = time.perf_counter()
+        flushed = False
+
+        for table in self._TABLES:
+            table_queue = self._queues[table]
+            while True:
+                rows = []
+                while len(rows) < self.max_batch_size:
+                    try:
+                        rows.append(table_queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not rows:
+                    break
+
+                self._write(table, rows)
+                flushed = True
+                for _ in rows:
+                    table_queue.task_done()
+
+        if flushed:
+            with self._stats_lock:
+                self._stats["flushes"] += 1
+                self._stats["last_flush_seconds"] = time.perf_counter() - start
+
+    def _write(self, table: str, rows: list[dict]) -> None:
+        last_error = None
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                self._insert_functions[table](rows, page_size=self.max_batch_size)
+                self._increment("written", len(rows))
+                return
+            except Exception as e:
+                last_error = e
+                self._increment("failed_statements")
+                print(f"Buffered write of {len(rows)} {table} rows failed (attempt {attempt}/{self.max_retries}): {e}")
+                time.sleep(min(0.1 * 2 ** attempt, 5.0))
+
+        if self.drop_failed:
+            self._increment("dropped", len(rows))
+            print(f"Dropped {len(rows)} {table} rows after {self.max_retries} failed attempts")
+            return
+
+        with self._stats_lock:
+            self._stats["failed"] += len(rows)
+            failed_rows = self._failure[0] if self._failure else 0
+            self._failure = (failed_rows + len(rows), last_error)
+        print(f"Failed to write {len(rows)} {table} rows after {self.max_retries} attempts, raising on next flush")
+
+    def _raise_failure(self) -> None:
+        with self._stats_lock:
+            failure, self._failure = self._failure, None
+        if failure is not None:
+            failed_rows, error = failure
+            raise BufferedWriteError(f"{failed_rows} rows could not be written: {error}") from error
+
+    def flush(self) -> None:
+        """
+        Blocks until every row queued before this call has been written or has failed.
+
+        Raises:
+            BufferedWriteError: If rows failed max_retries times since the last flush() (unless drop_failed).
+        """
+        self._wake.set()
+        for table_queue in self._queues.values():
+            table_queue.join()
+        self._raise_failure()
+
+    def close(self, timeout: float | None = None) -> None:
+        """
+        Stops accepting rows, writes everything that is still queued and stops the background thread.
+
+        Args:
+            timeout (float | None): Seconds to wait for the final flush. Defaults to None (wait until done).
+        Returns:
+            None
+        Raises:
+            BufferedWriteError: If rows failed max_retries times since the last flush() (unless drop_failed).
+        """
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self._raise_failure()
+
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of the writer counters.
+
+        Returns:
+            dict: Queued rows per table plus enqueued, written, failed, dropped, flushes, failed statements, backpressure
+            waits and the duration of the last flush.
+        """
+        with self._stats_lock:
+            return {
+                **{f"queued_{table}": self._queues[table].qsize() for table in self._TABLES},
+                **self._stats,
+            }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
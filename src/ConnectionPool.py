@@ -0,0 +1,176 @@
+import threading
+import time
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+
+
+class PoolTimeoutError(Exception):
+    """Exception raised when no pooled connection becomes available within the wait timeout."""
+    pass
+
+
+class ConnectionPool:
+    """
+    Thread-safe, blocking pool of psycopg2 connections. Unlike psycopg2's ThreadedConnectionPool, callers wait for a
+    connection to be returned instead of failing once the pool is exhausted. Keeps counters to tune the pool size.
+    """
+    def __init__(
+            self,
+            db_config: dict,
+            min_connections: int = 1,
+            max_connections: int = 10,
+            wait_timeout: float = 30.0,
+    ) -> None:
+        """
+        Opens min_connections connections up front. Further connections are opened lazily up to max_connections.
+
+        Args:
+            db_config (dict): Keyword arguments passed to psycopg2.connect
+            min_connections (int): Number of connections opened on creation. Defaults to 1.
+            max_connections (int): Upper bound of simultaneously open connections. Defaults to 10.
+            wait_timeout (float): Seconds a caller waits for a free connection before failing. Defaults to 30.
+        Returns:
+            None
+        Raises:
+            ValueError: If the pool bounds are invalid.
+        """
+        if max_connections < 1 or not 0 <= min_connections <= max_connections:
+            raise ValueError(f"Invalid pool bounds: min={min_connections}, max={max_connections}")
+
+        self.db_config = db_config
+        self.min_connections = min_connections
+        self.max_connections = max_connections
+        self.wait_timeout = wait_timeout
+
+        self._condition = threading.Condition()
+        self._idle = []
+        self._size = 0  # Open connections, idle and checked out
+        self._closed = False
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time_seconds": 0.0,
+            "timeouts": 0,
+            "connections_created": 0,
+            "connections_discarded": 0,
+        }
+
+        for _ in range(min_connections):
+            self._size += 1
+            self._idle.append(self._connect())
+
+    def _connect(self):
+        """Opens a new connection. The caller has to reserve the slot in self._size beforehand."""
+        conn = psycopg2.connect(**self.db_config)
+        with self._condition:
+            self._stats["connections_created"] += 1
+        return conn
+
+    def getconn(self, timeout: float | None = None):
+        """
+        Checks a connection out of the pool. Reuses an idle connection if possible, opens a new one while the pool is
+        below max_connections and otherwise blocks until another thread returns a connection.
+
+        Args:
+            timeout (float | None): Seconds to wait for a free connection. Defaults to the pool's wait_timeout.
+        Returns:
+            connection: An open psycopg2 connection that has to be given back with putconn.
+        Raises:
+            PoolTimeoutError: If no connection was available within the timeout.
+            PoolError: If the pool was already closed.
+        """
+        timeout = self.wait_timeout if timeout is None else timeout
+
+        with self._condition:
+            if self._closed:
+                raise PoolError("Connection pool is closed")
+
+            if not self._idle and self._size >= self.max_connections:
+                self._stats["waits"] += 1
+                wait_start = time.monotonic()
+                deadline = wait_start + timeout
+                while not self._idle and self._size >= self.max_connections:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeoutError(f"No connection available after {timeout}s "
+                                               f"(max_connections={self.max_connections})")
+                    self._condition.wait(remaining)
+                    if self._closed:
+                        raise PoolError("Connection pool is closed")
+                self._stats["wait_time_seconds"] += time.monotonic() - wait_start
+
+            self._stats["checkouts"] += 1
+            while self._idle:
+                conn = self._idle.pop()
+                if not conn.closed:
+                    return conn
+                # Connection got closed server side while idle, we drop it and free its slot
+                self._size -= 1
+                self._stats["connections_discarded"] += 1
+
+            self._size += 1  # Reserve the slot before connecting outside the lock
+
+        try:
+            return self._connect()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+
+    def putconn(self, conn, discard: bool = False) -> None:
+        """
+        Returns a connection to the pool. Broken or discarded connections are closed and free their slot.
+
+        Args:
+            conn: Connection previously checked out with getconn.
+            discard (bool): Close the connection instead of reusing it, e.g. after a connection error. Defaults to False.
+        Returns:
+            None
+        """
+        if not discard and not conn.closed and conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            # Never hand out a connection that is still inside a transaction
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                discard = True
+
+        with self._condition:
+            if discard or conn.closed or self._closed:
+                self._size -= 1
+                self._stats["connections_discarded"] += 1
+                if not conn.closed:
+                    conn.close()
+            else:
+                self._idle.append(conn)
+            self._condition.notify()
+
+    def closeall(self) -> None:
+        """Closes all idle connections and rejects further checkouts. Checked out connections are closed on return."""
+        with self._condition:
+            self._closed = True
+            for conn in self._idle:
+                if not conn.closed:
+                    conn.close()
+            self._size -= len(self._idle)
+            self._idle = []
+            self._condition.notify_all()
+
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of the pool counters.
+
+        Returns:
+            dict: Pool size, idle and in-use connections, configured bounds plus checkout, wait and timeout counters.
+        """
+        with self._condition:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "min_connections": self.min_connections,
+                "max_connections": self.max_connections,
+                **self._stats,
+            }
@@ -1,6 +1,10 @@
 import random
 from datetime import datetime
+
+import numpy as np
 from faker import Faker
+from faker.providers.geo import Provider as GeoProvider
+
 import src.utility as util
 import src.constants as const
 
@@ -9,18 +13,26 @@ class UserGenerator:
     """
     Creates a new user.
     """
-    def __init__(self):
+    def __init__(self, seed: int | None = None, name_pool_size: int = const.FAKER_POOL_PARAMS["names"]):
         """
         Validates the weight distribution for country and email providers
+
+        Args:
+            seed (int | None): Seed for the Faker instance (names, cities) and the batch draws. Defaults to None (unseeded).
+            name_pool_size (int): Number of distinct names generate_users draws from
         """
         self.FakeData = Faker()
+        if seed is not None:
+            self.FakeData.seed_instance(seed)
+        self.rng = np.random.default_rng(seed)
+        self.name_pool_size = name_pool_size
+        self._name_pool = None  # Built on the first generate_users call
+        self._location_pools = None
 
-        # Define Country data and validate weights with unpack_weighted_data
-        self.countries, self.country_weights = util.unpack_weighted_dict(const.COUNTRY_DATA)
-
-        # Define Email data and validate weights with unpack_weighted_dict
+        # Country and email provider samplers, weights are validated once when building them
+        self.country_sampler = util.WeightedSampler.from_weighted_dict(const.COUNTRY_DATA)
         self.email_data = const.EMAIL_DATA
-        self.email_providers, self.email_provider_weights = util.unpack_weighted_dict(self.email_data)
+        self.email_provider_sampler = util.WeightedSampler.from_weighted_dict(self.email_data)
 
     def generate_user(self, generated_at: datetime) -> dict:
         """
@@ -34,8 +46,8 @@ class UserGenerator:
             dict: user information, with keys: name, email, country, city, latitude, longitude, created_at
         """
         name = self.FakeData.name()
-        country = random.choices(self.countries, weights=self.country_weights, k=1)[0]
-        email_classification = random.choices(self.email_providers, weights=self.email_provider_weights, k=1)[0]
+        country = self.country_sampler.sample()
+        email_classification = self.email_provider_sampler.sample()
         user_email = name.replace(" ", ".").lower() + self.email_data[email_classification]["provider"] # create fake email
         lat, lon, city, _, _ = self.FakeData.local_latlng(country_code=country) # get city, latitude and longitude for country
 
@@ -44,13 +56,80 @@ class UserGenerator:
             "email": user_email,
             "country" : country,
             "city" : city,
-            "latitude" : lat,
-            "longitude" : lon,
+            "latitude" : float(lat), # Faker returns coordinates as strings
+            "longitude" : float(lon),
             "created_at" : generated_at,
         }
 
         return main_user_info
 
+    def _build_pools(self) -> None:
+        """
+        Draws the name pool from Faker once and collects the city coordinates per country code (the same list
+        Faker.local_latlng draws from).
+        """
+        names = [self.FakeData.name() for _ in range(self.name_pool_size)]
+        self._name_pool = np.array(names)
+        self._email_local_pool = np.array([name.replace(" ", ".").lower() for name in names])
+        self._email_domain_sampler = util.WeightedSampler(
+            [self.email_data[key]["provider"] for key in self.email_provider_sampler.keys], self.email_provider_sampler.weights)
+
+        self._location_pools = {}
+        for country in self.country_sampler.keys:
+            coords = [coord for coord in GeoProvider.land_coords if coord[3] == country]
+            if not coords:
+                raise ValueError(f"Faker has no city coordinates for country code {country}")
+            self._location_pools[country] = (
+                np.array([float(coord[0]) for coord in coords]),
+                np.array([float(coord[1]) for coord in coords]),
+                np.array([coord[2] for coord in coords]),
+            )
+
+    def generate_users(self, n: int, generated_at) -> dict[str, np.ndarray]:
+        """
+        Generates n users in columnar form. Names are drawn from a seeded pool of Faker names and cities from the
+        coordinates of the drawn country, countries and email providers are drawn vectorized. Much faster than
+        generate_user for large populations, at the cost of repeated names once n exceeds the pool size.
+
+        Args:
+            n (int): Number of users
+            generated_at (Sequence[datetime]): Creation timestamp per user
+        Returns:
+            dict[str, np.ndarray]: One array per key of generate_user (name, email, country, city, latitude, longitude,
+            created_at), all of length n
+        Raises:
+            ValueError: If generated_at doesn't have n entries.
+        """
+        if len(generated_at) != n:
+            raise ValueError(f"Expected {n} creation timestamps, got {len(generated_at)}")
+        if self._name_pool is None:
+            self._build_pools()
+
+        name_indices = self.rng.integers(0, len(self._name_pool), size=n)
+        countries = self.country_sampler.sample_batch(n, rng=self.rng)
+        email_providers = self._email_domain_sampler.sample_batch(n, rng=self.rng)
+
+        cities = np.empty(n, dtype=object)
+        latitudes = np.empty(n, dtype="float64")
+        longitudes = np.empty(n, dtype="float64")
+        for country in np.unique(countries):
+            mask = countries == country
+            pool_latitudes, pool_longitudes, pool_cities = self._location_pools[country]
+            location_indices = self.rng.integers(0, len(pool_cities), size=int(mask.sum()))
+            latitudes[mask] = pool_latitudes[location_indices]
+            longitudes[mask] = pool_longitudes[location_indices]
+            cities[mask] = pool_cities[location_indices]
+
+        return {
+            "name": self._name_pool[name_indices],
+            "email": np.char.add(self._email_local_pool[name_indices], email_providers),
+            "country": countries,
+            "city": cities,
+            "latitude": latitudes,
+            "longitude": longitudes,
+            "created_at": np.array(generated_at, dtype=object),
+        }
+
 
 class DeviceGenerator:
     """
@@ -91,11 +170,9 @@ class PaymentMethodGenerator:
         """
         Validates the weight distribution for payment methods and payment providers.
         """
-        # Define payment data and additionally validate weights in unpack_weighted_dict
-        self.payment_methods, self.payment_method_weights = util.unpack_weighted_dict(const.PAYMENT_METHOD_DATA)
-
-        # Define payment providers and validate weights in unpack_weighted_dict
-        self.payment_providers, self.payment_providers_weights = util.unpack_weighted_dict(const.PAYMENT_PROVIDER_DATA)
+        # Payment method and payment provider samplers, weights are validated once when building them
+        self.payment_method_sampler = util.WeightedSampler.from_weighted_dict(const.PAYMENT_METHOD_DATA)
+        self.payment_provider_sampler = util.WeightedSampler.from_weighted_dict(const.PAYMENT_PROVIDER_DATA)
 
     def generate_payment_method(self, user_id: int, generated_at: datetime) -> dict:
         """
@@ -107,8 +184,8 @@ class PaymentMethodGenerator:
         Returns:
             dict: Payment method information, with keys: user_id, payment_method, service_provider
         """
-        payment_method_type = random.choices(self.payment_methods, weights=self.payment_method_weights, k=1)[0]
-        payment_method_provider = random.choices(self.payment_providers, weights=self.payment_providers_weights, k=1)[0]
+        payment_method_type = self.payment_method_sampler.sample()
+        payment_method_provider = self.payment_provider_sampler.sample()
 
         payment_method_info = {
             "user_id" : user_id,
@@ -125,17 +202,25 @@ class MerchantGenerator:
     """
     Creates data for a new merchant.
     """
-    def __init__(self):
+    def __init__(self, seed: int | None = None, company_pool_size: int = const.FAKER_POOL_PARAMS["companies"]):
         """
         Validates the weight distribution for merchant type ratings.
+
+        Args:
+            seed (int | None): Seed for the Faker instance (company names) and the batch draws. Defaults to None (unseeded).
+            company_pool_size (int): Number of distinct company names generate_merchants draws from
         """
         self.FakeData = Faker()
+        if seed is not None:
+            self.FakeData.seed_instance(seed)
+        self.rng = np.random.default_rng(seed)
+        self.company_pool_size = company_pool_size
+        self._company_pool = None  # Built on the first generate_merchants call
         self.country_list = list(const.COUNTRY_DATA.keys())
 
-        # Define merchant data and validate weights in unpack_weighted_dict
-        self.merchant_rating, self.merchant_rating_weights = util.unpack_weighted_dict(const.MERCHANT_DATA)
-        self.merchant_categories, self.merchant_category_weights = util.unpack_weighted_dict(
-            const.MERCHANT_CATEGORY_DATA)
+        # Merchant rating and category samplers, weights are validated once when building them
+        self.merchant_rating_sampler = util.WeightedSampler.from_weighted_dict(const.MERCHANT_DATA)
+        self.merchant_category_sampler = util.WeightedSampler.from_weighted_dict(const.MERCHANT_CATEGORY_DATA)
 
     def generate_merchant(self) -> dict:
         """
@@ -144,9 +229,9 @@ class MerchantGenerator:
         Returns:
             dict: Merchant information, with keys: name, rating and country
         """
-        merchant_rating = random.choices(self.merchant_rating, weights=self.merchant_rating_weights, k=1)[0]
+        merchant_rating = self.merchant_rating_sampler.sample()
         country = random.choice(self.country_list) # No need for weighted choice here, international company distribution
-        merchant_category = random.choices(self.merchant_categories, weights=self.merchant_category_weights, k=1)[0]
+        merchant_category = self.merchant_category_sampler.sample()
 
         merchant_info = {
             "name": self.FakeData.company(),
@@ -157,6 +242,26 @@ class MerchantGenerator:
 
         return merchant_info
 
+    def generate_merchants(self, n: int) -> dict[str, np.ndarray]:
+        """
+        Generates n merchants in columnar form. Names are drawn from a seeded pool of Faker company names, everything
+        else is drawn vectorized.
+
+        Args:
+            n (int): Number of merchants
+        Returns:
+            dict[str, np.ndarray]: One array per key of generate_merchant (name, rating, country, category), all of length n
+        """
+        if self._company_pool is None:
+            self._company_pool = np.array([self.FakeData.company() for _ in range(self.company_pool_size)])
+
+        return {
+            "name": self._company_pool[self.rng.integers(0, len(self._company_pool), size=n)],
+            "rating": self.merchant_rating_sampler.sample_batch(n, rng=self.rng),
+            "country": np.array(self.country_list)[self.rng.integers(0, len(self.country_list), size=n)],
+            "category": self.merchant_category_sampler.sample_batch(n, rng=self.rng),
+        }
+
 
 if __name__ == "__main__":
     user_generator = UserGenerator()
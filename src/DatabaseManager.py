@@ -1,18 +1,275 @@
+import io
 import os
+import math
+import csv
+import time
+import uuid
+import functools
+import numpy as np
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2 import sql
+from psycopg2.extras import RealDictCursor, execute_values
 from dotenv import load_dotenv
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 
+from src.ConnectionPool import ConnectionPool
+from src.LookupCache import LRUTTLCache
+from src.QueryMetrics import QueryMetrics
+from src.columnar import register_columnar_casters, to_numpy_columns, to_arrow_table
+import src.utility as util
+from src.constants import (
+    DB_POOL_PARAMS, BULK_INSERT_PAGE_SIZE, SERVER_CURSOR_ITERSIZE, TRANSACTION_PARTITION_PARAMS, LOOKUP_CACHE_PARAMS
+)
+
 
 env_path = Path(__file__).resolve().parent.parent / "credentials.env"
 load_dotenv(dotenv_path=env_path)
 
+# Shared by the fetch_user_transaction_history, iter_ and _columns variants
+USER_HISTORY_QUERY = """
+    SELECT t.user_id, t.device_id, t.transaction_amount_usd, t.transaction_status, t.payment_id,
+           t.transaction_timestamp, t.transaction_country, t.merchant_id, t.transaction_channel,
+           m.merchant_category
+    FROM transactions t
+    JOIN merchants m ON t.merchant_id = m.merchant_id
+    WHERE t.user_id = %s
+    AND t.transaction_timestamp >= NOW() - INTERVAL '%s hours'
+    ORDER BY t.transaction_timestamp ASC;
+"""
+
+# Shared by fetch_transaction_histories and fetch_transaction_histories_columns
+HISTORIES_QUERY = """
+    SELECT t.user_id, t.device_id, t.transaction_amount_usd, t.transaction_status, t.payment_id,
+           t.transaction_timestamp, t.transaction_country, t.merchant_id, t.transaction_channel,
+           m.merchant_category
+    FROM transactions t
+    JOIN merchants m ON t.merchant_id = m.merchant_id
+    WHERE (t.user_id = ANY(%s) OR t.device_id = ANY(%s))
+    AND t.transaction_timestamp >= NOW() - INTERVAL '%s hours'
+    ORDER BY t.transaction_timestamp ASC;
+"""
+
+# Shared by the fetch_device_recent_transactions, iter_ and _columns variants
+DEVICE_RECENT_QUERY = """
+    SELECT device_id, transaction_timestamp
+    FROM transactions
+    WHERE device_id = %s
+    AND transaction_timestamp >= NOW() - INTERVAL '%s hours'
+    ORDER BY transaction_timestamp ASC;
+"""
+
+# Transactions in timestamp order with the payment method columns of a Kafka transaction message, for replays. NULL
+# bounds are open.
+REPLAY_QUERY = """
+    SELECT t.*, p.created_at AS payment_created_at, p.payment_method, p.payment_service_provider
+    FROM transactions t
+    LEFT JOIN payment_methods p ON p.payment_method_id = t.payment_id
+    WHERE t.transaction_timestamp >= COALESCE(%s, '-infinity'::timestamp)
+    AND t.transaction_timestamp < COALESCE(%s, 'infinity'::timestamp)
+    ORDER BY t.transaction_timestamp, t.transaction_id;
+"""
+
+
+# Rollup tables of db/migrations/003_transaction_rollups.sql by (entity, grain)
+ROLLUP_TABLES = {
+    ("user", "hourly"): "user_transaction_rollups_hourly",
+    ("user", "daily"): "user_transaction_rollups_daily",
+    ("device", "hourly"): "device_transaction_rollups_hourly",
+    ("device", "daily"): "device_transaction_rollups_daily",
+}
+
+# Rollup backed inputs of the streaming features with windows longer than the raw history the streaming job reads: the
+# 7 day amount sum/count (hourly buckets), the merchant categories of the last 30 days (daily buckets) and the user's
+# last transaction. One row per requested user.
+USERS_ROLLUP_QUERY = """
+    WITH bounds AS (SELECT COALESCE(%(as_of)s::timestamp, LOCALTIMESTAMP) AS as_of),
+    users AS (SELECT DISTINCT unnest(%(user_ids)s::integer[]) AS user_id),
+    amounts AS (
+        SELECT r.user_id, SUM(r.transaction_count) AS transaction_count_7d, SUM(r.amount_sum) AS amount_sum_7d
+        FROM bounds b
+        JOIN user_transaction_rollups_hourly r
+            ON r.user_id = ANY(%(user_ids)s::integer[])
+            AND r.bucket_start >= date_trunc('hour', b.as_of - INTERVAL '7 days')
+            AND r.bucket_start <= b.as_of
+        GROUP BY r.user_id
+    ),
+    categories AS (
+        SELECT r.user_id, bit_or(r.category_bits) AS bits
+        FROM bounds b
+        JOIN user_transaction_rollups_daily r
+            ON r.user_id = ANY(%(user_ids)s::integer[])
+            AND r.bucket_start >= date_trunc('day', b.as_of - INTERVAL '30 days')
+            AND r.bucket_start <= b.as_of
+        GROUP BY r.user_id
+    )
+    SELECT u.user_id,
+           COALESCE(a.transaction_count_7d, 0) AS transaction_count_7d,
+           COALESCE(a.amount_sum_7d, 0) AS amount_sum_7d,
+           ARRAY(SELECT m.merchant_category FROM merchant_category_bits m
+                 WHERE COALESCE(c.bits, 0) & (1::bigint << m.bit) <> 0) AS merchant_categories_30d,
+           (SELECT MAX(t.transaction_timestamp) FROM transactions t, bounds b
+            WHERE t.user_id = u.user_id AND t.transaction_timestamp <= b.as_of) AS last_transaction_timestamp
+    FROM users u
+    LEFT JOIN amounts a ON a.user_id = u.user_id
+    LEFT JOIN categories c ON c.user_id = u.user_id;
+"""
+
+
+def _users_rollup_row(row: dict) -> dict:
+    """Turns a USERS_ROLLUP_QUERY row into the value of fetch_users_rollup_aggregates."""
+    return {
+        "transaction_count_7d": int(row["transaction_count_7d"]),
+        "amount_sum_7d": row["amount_sum_7d"],
+        "merchant_categories_30d": set(row["merchant_categories_30d"]),
+        "last_transaction_timestamp": row["last_transaction_timestamp"],
+    }
+
+
+def _window_stats(count, amount_sum, amount_sumsq, decline_count) -> dict:
+    """
+    Turns summed rollup buckets into the statistics compute_amount_features computes over raw rows. stddev is the sample
+    standard deviation like Spark's stddev, None for fewer than two transactions.
+    """
+    count = int(count or 0)
+    amount_sum = float(amount_sum or 0)
+    amount_sumsq = float(amount_sumsq or 0)
+
+    stddev = None
+    if count > 1:
+        # max() guards against tiny negative values from floating point cancellation
+        stddev = math.sqrt(max(amount_sumsq - amount_sum ** 2 / count, 0.0) / (count - 1))
+
+    return {
+        "transaction_count": count,
+        "amount_sum": amount_sum,
+        "avg_amount": amount_sum / count if count else None,
+        "stddev_amount": stddev,
+        "decline_count": int(decline_count or 0),
+    }
+
+
+def _count_rows(result) -> int:
+    """Number of rows a DatabaseManager method returned, used for the instrumentation."""
+    if result is None:
+        return 0
+    if isinstance(result, bool):
+        return int(result)
+    if isinstance(result, (list, tuple)):
+        return len(result)
+    if hasattr(result, "num_rows"):
+        return result.num_rows  # pyarrow Table
+    if isinstance(result, dict) and result and all(isinstance(v, np.ndarray) for v in result.values()):
+        return len(next(iter(result.values())))  # NumPy columns
+    if isinstance(result, dict) and not result:
+        return 0
+    if isinstance(result, dict) and all(isinstance(v, dict) for v in result.values()):
+        if all(isinstance(rows, (list, tuple)) for group in result.values() for rows in group.values()):
+            # Grouped results, e.g. fetch_transaction_histories
+            return sum(len(rows) for group in result.values() for rows in group.values())
+        return len(result)  # Keyed rows or stats, e.g. fetch_merchant_infos or fetch_user_amount_aggregates
+    return 1
+
+
+def _instrumented(method):
+    """
+    Records latency, rows returned and errors of a DatabaseManager method in self.metrics. No-op for managers created
+    without instrumentation.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.metrics is None:
+            return method(self, *args, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            result = method(self, *args, **kwargs)
+        except Exception:
+            self.metrics.record(method.__name__, time.perf_counter() - start, error=True)
+            raise
+        self.metrics.record(method.__name__, time.perf_counter() - start, rows=_count_rows(result))
+
+        return result
+
+    return wrapper
+
+
+def _instrumented_stream(method):
+    """
+    Counterpart of _instrumented for generator methods. Latency is measured from the first row request until the
+    generator is exhausted or closed, rows are counted as they are yielded.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.metrics is None:
+            yield from method(self, *args, **kwargs)
+            return
+
+        start = time.perf_counter()
+        rows = 0
+        error = False
+        try:
+            for row in method(self, *args, **kwargs):
+                rows += 1
+                yield row
+        except GeneratorExit:
+            raise  # Caller stopped early, not an error
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.metrics.record(method.__name__, time.perf_counter() - start, rows=rows, error=error)
+
+    return wrapper
+
+
+def create_database_manager(**kwargs):
+    """
+    Creates the DatabaseManager of the backend selected by the DATABASE_BACKEND env var: 'postgres' (default) or
+    'memory' for the in-process InMemoryDatabaseManager used in benchmarks.
+
+    Args:
+        **kwargs: Passed to the manager, e.g. pooled, cached, instrumented
+    Returns:
+        DatabaseManager | InMemoryDatabaseManager: Manager of the selected backend
+    Raises:
+        ValueError: If DATABASE_BACKEND is set to an unknown backend.
+    """
+    backend = os.getenv("DATABASE_BACKEND", "postgres").lower()
+    if backend == "postgres":
+        return DatabaseManager(**kwargs)
+    if backend == "memory":
+        from src.InMemoryDatabaseManager import InMemoryDatabaseManager  # Imported here, it imports this module
+        return InMemoryDatabaseManager(**kwargs)
+
+    raise ValueError(f"Unknown DATABASE_BACKEND '{backend}', expected 'postgres' or 'memory'")
+
 
 class DatabaseManager:
     # TODO: validate data before db
-    def __init__(self):
+    def __init__(
+            self,
+            pooled: bool = False,
+            min_connections: int | None = None,
+            max_connections: int | None = None,
+            cached: bool = False,
+            instrumented: bool = False,
+    ):
+        """
+        Sets up the connection config. In pooled mode all methods share a thread-safe connection pool instead of
+        opening a new connection per statement. Pool bounds fall back to POSTGRES_POOL_MIN/POSTGRES_POOL_MAX and then
+        to DB_POOL_PARAMS. In cached mode merchant and payment method lookups are served from in-process LRU/TTL
+        caches sized by LOOKUP_CACHE_PARAMS. Instrumented managers record calls, rows and latency of every query
+        method in self.metrics.
+
+        Args:
+            pooled (bool): Whether to reuse connections from a pool. Defaults to False.
+            min_connections (int | None): Connections opened when the pool is created.
+            max_connections (int | None): Maximum number of simultaneously open connections.
+            cached (bool): Whether to cache merchant and payment method lookups. Defaults to False.
+            instrumented (bool): Whether to record per method query metrics. Defaults to False.
+        """
         self.db_config ={
             "host": os.getenv("POSTGRES_HOST"),
             "port": os.getenv("POSTGRES_PORT"),
@@ -21,13 +278,145 @@ class DatabaseManager:
             "password": os.getenv("POSTGRES_PASSWORD")
         }
 
+        self.pool = None
+        if pooled:
+            self.pool = ConnectionPool(
+                db_config=self.db_config,
+                min_connections=min_connections if min_connections is not None
+                else int(os.getenv("POSTGRES_POOL_MIN", DB_POOL_PARAMS["min_connections"])),
+                max_connections=max_connections if max_connections is not None
+                else int(os.getenv("POSTGRES_POOL_MAX", DB_POOL_PARAMS["max_connections"])),
+                wait_timeout=DB_POOL_PARAMS["wait_timeout_seconds"],
+            )
+
+        self.metrics = QueryMetrics() if instrumented else None
+
+        # Read-through caches, keyed by merchant_id, payment_method_id and user_id (-> oldest active payment method)
+        self.caches = {}
+        if cached:
+            self.caches = {
+                name: LRUTTLCache(max_size=params["max_size"], ttl_seconds=params["ttl_seconds"])
+                for name, params in LOOKUP_CACHE_PARAMS.items()
+            }
+
     def establish_connection(self):
         """Create new database connection based on config"""
         return psycopg2.connect(**self.db_config)
 
+    @contextmanager
+    def get_connection(self):
+        """
+        Yields a connection wrapped in a transaction block (commit on success, rollback on error). Pooled managers check
+        the connection out of the pool and return it afterwards, otherwise a new connection is opened and closed.
+
+        Yields:
+            connection: Open psycopg2 connection
+        """
+        if self.pool is None:
+            conn = self.establish_connection()
+            try:
+                with conn:
+                    yield conn
+            finally:
+                conn.close()
+            return
+
+        conn = self.pool.getconn()
+        discard = False
+        try:
+            with conn:
+                yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard = True  # Connection is likely broken, don't hand it out again
+            raise
+        finally:
+            self.pool.putconn(conn, discard=discard)
+
+    def pool_stats(self) -> dict | None:
+        """
+        Returns the connection pool counters (size, idle, in_use, checkouts, waits, wait time, timeouts).
+
+        Returns:
+            dict | None: Pool statistics or None if the manager is not pooled.
+        """
+        return self.pool.stats() if self.pool is not None else None
+
+    def cache_stats(self) -> dict:
+        """
+        Returns hit/miss counters per lookup cache.
+
+        Returns:
+            dict: {cache_name: stats}, empty if the manager is not cached.
+        """
+        return {name: cache.stats() for name, cache in self.caches.items()}
+
+    def _cache_get(self, cache_name: str, key) -> dict | None:
+        """Returns a copy of a cached row, so callers can't modify the cached version. None on a miss."""
+        cache = self.caches.get(cache_name)
+        if cache is None:
+            return None
+        row = cache.get(key)
+        return dict(row) if row is not None else None
+
+    def _cache_put(self, cache_name: str, key, row: dict | None) -> None:
+        # Missing rows are not cached, they might be inserted later
+        if cache_name in self.caches and row is not None:
+            self.caches[cache_name].put(key, dict(row))
+
+    def _cache_invalidate(self, cache_name: str, key) -> None:
+        if cache_name in self.caches:
+            self.caches[cache_name].invalidate(key)
+
+    def metrics_summary(self) -> dict | None:
+        """
+        Returns calls, rows and latency percentiles (p50/p95/p99) per method. Use self.metrics.to_json() or
+        self.metrics.to_prometheus() to export them.
+
+        Returns:
+            dict | None: Metrics per method or None if the manager is not instrumented.
+        """
+        return self.metrics.summary() if self.metrics is not None else None
+
+    def close(self) -> None:
+        """Closes all pooled connections. No-op for non-pooled managers."""
+        if self.pool is not None:
+            self.pool.closeall()
+
+    def _bulk_insert(self, query: str, rows: list[tuple], template: str, page_size: int) -> list:
+        """
+        Inserts many rows with multi-row VALUES statements inside a single transaction and returns the first column of
+        the RETURNING clause for every row.
+
+        Args:
+            query (str): INSERT statement with a single VALUES %s placeholder and a RETURNING clause
+            rows (list[tuple]): Row values in the order of the template placeholders
+            template (str): Row template passed to execute_values
+            page_size (int): Number of rows per statement
+        Returns:
+            list: Returned ids in the same order as rows
+        """
+        if not rows:
+            return []
+
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                try:
+                    # fetch=True collects the RETURNING rows of every page. Postgres returns them in VALUES order, so
+                    # the ids line up with the input rows.
+                    results = execute_values(cursor, query, rows, template=template, page_size=page_size, fetch=True)
+                    conn.commit()
+
+                    return [row[0] for row in results]
+
+                except Exception as e:
+                    conn.rollback()
+                    print(f"Error bulk inserting into database: {e}")
+                    raise
+
+    @_instrumented
     def insert_user(self, user_data):
         # TODO: validate if email is already in use, if so fail user generation.
-        with self.establish_connection() as conn:
+        with self.get_connection() as conn:
             with conn.cursor() as cursor:
                 try:
                     query = """
@@ -55,8 +444,9 @@ class DatabaseManager:
                     print(f"Error updating database: {e}")
                     raise
 
+    @_instrumented
     def insert_device(self, user_device):
-        with self.establish_connection() as conn:
+        with self.get_connection() as conn:
             with conn.cursor() as cursor:
                 try:
                     query = """
@@ -83,8 +473,9 @@ class DatabaseManager:
                     raise
 
 
+    @_instrumented
     def insert_payment_method(self, user_payment_method):
-        with self.establish_connection() as conn:
+        with self.get_connection() as conn:
             with conn.cursor() as cursor:
                 try:
                     query = """
@@ -103,6 +494,8 @@ class DatabaseManager:
                     payment_method_id = cursor.fetchone()[0]
 
                     conn.commit()
+                    # The new method can be the user's oldest active one now
+                    self._cache_invalidate("active_payment_method", user_payment_method["user_id"])
 
                     return payment_method_id
 
@@ -111,8 +504,39 @@ class DatabaseManager:
                     print(f"Error updating database: {e}")
                     raise
 
+    @_instrumented
+    def insert_payment_methods(self, payment_methods: list[dict], page_size: int = BULK_INSERT_PAGE_SIZE) -> list[int]:
+        """
+        Inserts many payment methods in one transaction.
+
+        Args:
+            payment_methods (list[dict]): Payment method dicts as produced by PaymentMethodGenerator
+            page_size (int): Number of rows per INSERT statement. Defaults to BULK_INSERT_PAGE_SIZE.
+        Returns:
+            list[int]: Generated payment_method_ids in input order
+        """
+        query = """
+            INSERT INTO payment_methods (user_id, payment_method, payment_service_provider, payment_is_active, created_at)
+            VALUES %s
+            RETURNING payment_method_id
+        """
+        rows = [(
+            pm["user_id"],
+            pm["payment_method"],
+            pm["service_provider"],
+            pm["payment_is_active"],
+            pm["created_at"],
+        ) for pm in payment_methods]
+
+        payment_method_ids = self._bulk_insert(query, rows, template="(%s, %s, %s, %s, %s)", page_size=page_size)
+        for pm in payment_methods:
+            self._cache_invalidate("active_payment_method", pm["user_id"])
+
+        return payment_method_ids
+
+    @_instrumented
     def insert_merchant(self, merchant_data):
-        with self.establish_connection() as conn:
+        with self.get_connection() as conn:
             with conn.cursor() as cursor:
                 try:
                     query = """
@@ -137,8 +561,9 @@ class DatabaseManager:
                     print(f"Error updating database: {e}")
                     raise
 
+    @_instrumented
     def insert_transaction(self, transaction_data):
-        with self.establish_connection() as conn:
+        with self.get_connection() as conn:
             with conn.cursor() as cursor:
                 try:
                     query = """
@@ -172,8 +597,50 @@ class DatabaseManager:
                     print(f"Error updating database: {e}")
                     raise
 
+    @_instrumented
+    def insert_transactions(self, transactions: list[dict], page_size: int = BULK_INSERT_PAGE_SIZE) -> list[str]:
+        """
+        Inserts many transactions in one transaction. A transaction_id already present on a dict is kept, otherwise
+        Postgres generates one.
+
+        Args:
+            transactions (list[dict]): Transaction dicts as produced by TransactionGenerator
+            page_size (int): Number of rows per INSERT statement. Defaults to BULK_INSERT_PAGE_SIZE.
+        Returns:
+            list[str]: transaction_ids in input order
+        """
+        query = """
+            INSERT INTO transactions (transaction_id, transaction_amount_local, transaction_amount_usd, transaction_timestamp, transaction_status, transaction_currency, transaction_country, transaction_channel, user_id, merchant_id, payment_id, device_id, is_fraudulent, fraud_type)
+            VALUES %s
+            RETURNING transaction_id
+        """
+        rows = [(
+            transaction.get("transaction_id"),
+            transaction["transaction_amount_local"],
+            transaction["transaction_amount_usd"],
+            transaction["transaction_timestamp"],
+            transaction["transaction_status"],
+            transaction["transaction_currency"],
+            transaction["transaction_country"],
+            transaction["transaction_channel"],
+            transaction["user_id"],
+            transaction["merchant_id"],
+            transaction["payment_id"],
+            transaction["device_id"],
+            transaction["is_fraudulent"],
+            transaction["fraud_type"],
+        ) for transaction in transactions]
+        template = "(COALESCE(%s::uuid, gen_random_uuid()), %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+
+        return self._bulk_insert(query, rows, template=template, page_size=page_size)
+
+    @_instrumented
     def fetch_active_payment_method(self, user_id):
-        with self.establish_connection() as conn:
+        cached = self._cache_get("active_payment_method", user_id)
+        if cached is not None:
+            return cached
+
+        with self.get_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cursor:
                 try:
                     query = """
@@ -185,6 +652,7 @@ class DatabaseManager:
                     """
                     cursor.execute(query, (user_id,))
                     result = cursor.fetchone()
+                    self._cache_put("active_payment_method", user_id, result)
 
                     return result  # Returns dict
 
@@ -192,8 +660,13 @@ class DatabaseManager:
                     print(f"Error fetching payment_id: {e}")
                     raise
 
+    @_instrumented
     def fetch_payment_info(self, payment_id: int) -> dict:
-        with self.establish_connection() as conn:
+        cached = self._cache_get("payment_method", payment_id)
+        if cached is not None:
+            return cached
+
+        with self.get_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cursor:
                 try:
                     query = """
@@ -203,6 +676,7 @@ class DatabaseManager:
                     """
                     cursor.execute(query, (payment_id,))
                     result = cursor.fetchone()
+                    self._cache_put("payment_method", payment_id, result)
 
                     return result if result else None
 
@@ -210,27 +684,36 @@ class DatabaseManager:
                     print(f"Error fetching payment info for payment_id {payment_id}: {e}")
                     raise
 
+    @_instrumented
     def deactivate_payment_method(self, payment_id):
-        with self.establish_connection() as conn:
+        with self.get_connection() as conn:
             with conn.cursor() as cursor:
                 try:
                     query = """
                         UPDATE payment_methods
                         SET payment_is_active = 0
-                        WHERE payment_method_id = %s;
+                        WHERE payment_method_id = %s
+                        RETURNING user_id;
                     """
                     cursor.execute(query, (payment_id,))
+                    result = cursor.fetchone()
                     conn.commit()
 
-                    return cursor.rowcount > 0  # Returns True if a row was updated
+                    # The cached row is stale now and the user's active payment method might change
+                    self._cache_invalidate("payment_method", payment_id)
+                    if result is not None:
+                        self._cache_invalidate("active_payment_method", result[0])
+
+                    return result is not None  # Returns True if a row was updated
 
                 except Exception as e:
                     conn.rollback()
                     print(f"Error deactivating payment method: {e}")
                     raise
 
+    @_instrumented
     def fetch_all_merchant_ids(self):
-        with self.establish_connection() as conn:
+        with self.get_connection() as conn:
             with conn.cursor() as cursor:
                 try:
                     query = """
@@ -247,8 +730,9 @@ class DatabaseManager:
 
                     raise
 
+    @_instrumented
     def fetch_random_user_id(self) -> int:
-        with self.establish_connection() as conn:
+        with self.get_connection() as conn:
             with conn.cursor() as cursor:
                 try:
                     query = """
@@ -266,8 +750,9 @@ class DatabaseManager:
                     print(f"Error fetching user_id: {e}")
                     raise
 
+    @_instrumented
     def fetch_random_device_id(self, user_id: int) -> int:
-        with self.establish_connection() as conn:
+        with self.get_connection() as conn:
             with conn.cursor() as cursor:
                 try:
                     query = """
@@ -285,21 +770,40 @@ class DatabaseManager:
                     print(f"Error fetching device_id: {e}")
                     raise
 
-    def fetch_user_transaction_history(self, user_id: int, hours: int) -> list[dict]:
-        with self.establish_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+    @_instrumented
+    def fetch_user_device_ids(self, min_device_id: int = 0) -> list[tuple[int, int]]:
+        """
+        Fetches (user_id, device_id) pairs of all devices with a device_id above min_device_id. Used by EntitySampler to
+        load all pairs once and afterwards only the newly inserted devices.
+
+        Args:
+            min_device_id (int): Only devices with a higher id are returned. Defaults to 0 (all devices).
+        Returns:
+            list[tuple[int, int]]: (user_id, device_id) pairs ordered by device_id
+        """
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
                 try:
                     query = """
-                        SELECT t.user_id, t.device_id, t.transaction_amount_usd, t.transaction_status, t.payment_id,
-                               t.transaction_timestamp, t.transaction_country, t.merchant_id, t.transaction_channel,
-                               m.merchant_category
-                        FROM transactions t
-                        JOIN merchants m ON t.merchant_id = m.merchant_id
-                        WHERE t.user_id = %s
-                        AND t.transaction_timestamp >= NOW() - INTERVAL '%s hours'
-                        ORDER BY t.transaction_timestamp ASC;
+                        SELECT user_id, device_id
+                        FROM user_devices
+                        WHERE device_id > %s
+                        ORDER BY device_id ASC;
                     """
-                    cursor.execute(query, (user_id, hours))
+                    cursor.execute(query, (min_device_id,))
+
+                    return cursor.fetchall()
+
+                except Exception as e:
+                    print(f"Error fetching user and device ids: {e}")
+                    raise
+
+    @_instrumented
+    def fetch_user_transaction_history(self, user_id: int, hours: int) -> list[dict]:
+        with self.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                try:
+                    cursor.execute(USER_HISTORY_QUERY, (user_id, hours))
 
                     return cursor.fetchall()
 
@@ -307,18 +811,12 @@ class DatabaseManager:
                     print(f"Error fetching transaction history for user {user_id}: {e}")
                     raise
 
+    @_instrumented
     def fetch_device_recent_transactions(self, device_id: int, hours: int) -> list[dict]:
-        with self.establish_connection() as conn:
+        with self.get_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cursor:
                 try:
-                    query = """
-                        SELECT device_id, transaction_timestamp
-                        FROM transactions
-                        WHERE device_id = %s
-                        AND transaction_timestamp >= NOW() - INTERVAL '%s hours'
-                        ORDER BY transaction_timestamp ASC;
-                    """
-                    cursor.execute(query, (device_id, hours))
+                    cursor.execute(DEVICE_RECENT_QUERY, (device_id, hours))
 
                     return cursor.fetchall()
 
@@ -326,8 +824,251 @@ class DatabaseManager:
                     print(f"Error fetching recent transactions for device {device_id}: {e}")
                     raise
 
+    def _iter_query(self, query, params: tuple | None, itersize: int, as_dict: bool):
+        """
+        Streams the result of a query through a named (server-side) cursor. Only `itersize` rows are held in memory
+        at a time, the connection stays checked out until the generator is exhausted or closed.
+
+        Args:
+            query (str | sql.Composable): Query to run
+            params (tuple | None): Query parameters
+            itersize (int): Rows fetched per network round trip
+            as_dict (bool): Whether rows are yielded as dicts or as tuples
+        Yields:
+            dict | tuple: One row at a time
+        """
+        with self.get_connection() as conn:
+            # Named cursors only live inside a transaction, which get_connection opens
+            cursor_name = f"dbm_stream_{uuid.uuid4().hex}"
+            with conn.cursor(name=cursor_name, cursor_factory=RealDictCursor if as_dict else None) as cursor:
+                cursor.itersize = itersize
+                cursor.execute(query, params)
+                yield from cursor
+
+    @_instrumented_stream
+    def iter_user_transaction_history(self, user_id: int, hours: int, itersize: int = SERVER_CURSOR_ITERSIZE):
+        """
+        Streaming variant of fetch_user_transaction_history for users with very long histories.
+
+        Args:
+            user_id (int): User whose history is read
+            hours (int): Look back window in hours
+            itersize (int): Rows fetched per round trip. Defaults to SERVER_CURSOR_ITERSIZE.
+        Yields:
+            dict: Transaction rows ordered by timestamp
+        """
+        try:
+            yield from self._iter_query(USER_HISTORY_QUERY, (user_id, hours), itersize, as_dict=True)
+        except Exception as e:
+            print(f"Error streaming transaction history for user {user_id}: {e}")
+            raise
+
+    @_instrumented_stream
+    def iter_device_recent_transactions(self, device_id: int, hours: int, itersize: int = SERVER_CURSOR_ITERSIZE):
+        """
+        Streaming variant of fetch_device_recent_transactions for devices shared by many users.
+
+        Args:
+            device_id (int): Device whose transactions are read
+            hours (int): Look back window in hours
+            itersize (int): Rows fetched per round trip. Defaults to SERVER_CURSOR_ITERSIZE.
+        Yields:
+            dict: Rows with device_id and transaction_timestamp ordered by timestamp
+        """
+        try:
+            yield from self._iter_query(DEVICE_RECENT_QUERY, (device_id, hours), itersize, as_dict=True)
+        except Exception as e:
+            print(f"Error streaming recent transactions for device {device_id}: {e}")
+            raise
+
+    @_instrumented_stream
+    def iter_transactions_for_replay(
+            self,
+            start: datetime | None = None,
+            end: datetime | None = None,
+            itersize: int = SERVER_CURSOR_ITERSIZE,
+    ):
+        """
+        Streams transactions in timestamp order together with created_at (as payment_created_at), payment_method and
+        payment_service_provider of their payment method, i.e. everything a Kafka transaction message carries.
+
+        Args:
+            start (datetime | None): First transaction timestamp (inclusive). Defaults to None (no lower bound).
+            end (datetime | None): Last transaction timestamp (exclusive). Defaults to None (no upper bound).
+            itersize (int): Rows fetched per round trip. Defaults to SERVER_CURSOR_ITERSIZE.
+        Yields:
+            dict: Transaction rows ordered by timestamp
+        """
+        try:
+            yield from self._iter_query(REPLAY_QUERY, (start, end), itersize, as_dict=True)
+        except Exception as e:
+            print(f"Error streaming transactions for replay: {e}")
+            raise
+
+    @_instrumented_stream
+    def iter_table(
+            self,
+            table_name: str,
+            columns: list[str] | None = None,
+            itersize: int = SERVER_CURSOR_ITERSIZE,
+            as_dict: bool = False,
+    ):
+        """
+        Streams a full table in bounded memory, the non Spark counterpart of spark.utils.db_utils.read_table for
+        exports and offline jobs. Rows come in physical order.
+
+        Args:
+            table_name (str): Table to read
+            columns (list[str] | None): Columns to read. Defaults to None (all columns).
+            itersize (int): Rows fetched per round trip. Defaults to SERVER_CURSOR_ITERSIZE.
+            as_dict (bool): Whether rows are yielded as dicts instead of tuples. Defaults to False.
+        Yields:
+            tuple | dict: One row at a time
+        """
+        query = sql.SQL("SELECT {} FROM {}").format(
+            sql.SQL(", ").join(map(sql.Identifier, columns)) if columns else sql.SQL("*"),
+            sql.Identifier(table_name),
+        )
+        try:
+            yield from self._iter_query(query, None, itersize, as_dict=as_dict)
+        except Exception as e:
+            print(f"Error streaming table {table_name}: {e}")
+            raise
+
+    @_instrumented
+    def fetch_transaction_histories(
+            self,
+            user_ids: list[int],
+            hours: int,
+            device_ids: list[int] | None = None,
+    ) -> dict[str, dict[int, list[dict]]]:
+        """
+        Fetches the recent transaction history of many users (and optionally devices) with a single query and groups
+        the rows by key. Rows have the same columns as fetch_user_transaction_history and are ordered by timestamp.
+
+        Args:
+            user_ids (list[int]): Users whose history is fetched
+            hours (int): Look back window in hours
+            device_ids (list[int] | None): Devices whose history is fetched as well. Defaults to None.
+        Returns:
+            dict[str, dict[int, list[dict]]]: {"user_id": {user_id: rows}, "device_id": {device_id: rows}}. Every
+            requested id has an entry, ids without transactions map to an empty list.
+        """
+        user_ids = list(set(user_ids))
+        device_ids = list(set(device_ids or []))
+        histories = {
+            "user_id": {user_id: [] for user_id in user_ids},
+            "device_id": {device_id: [] for device_id in device_ids},
+        }
+        if not user_ids and not device_ids:
+            return histories
+
+        with self.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                try:
+                    cursor.execute(HISTORIES_QUERY, (user_ids, device_ids, hours))
+
+                    # A row can belong to a requested user and a requested device, so it is added to both groups
+                    for row in cursor.fetchall():
+                        if row["user_id"] in histories["user_id"]:
+                            histories["user_id"][row["user_id"]].append(row)
+                        if row["device_id"] in histories["device_id"]:
+                            histories["device_id"][row["device_id"]].append(row)
+
+                    return histories
+
+                except Exception as e:
+                    print(f"Error fetching transaction histories for {len(user_ids)} users and {len(device_ids)} devices: {e}")
+                    raise
+
+    def _fetch_columns(self, query: str, params: tuple, output: str):
+        """
+        Runs a query on a plain cursor and converts the result to columns, without building one dict per row.
+
+        Args:
+            query (str): Query to run
+            params (tuple): Query parameters
+            output (str): 'numpy' for a dict of NumPy arrays or 'arrow' for a pyarrow Table
+        Returns:
+            dict[str, np.ndarray] | pyarrow.Table: Columnar result
+        """
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                register_columnar_casters(cursor, output)
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
+
+                if output == "numpy":
+                    return to_numpy_columns(cursor.description, rows)
+                return to_arrow_table(cursor.description, rows)
+
+    @_instrumented
+    def fetch_user_transaction_history_columns(self, user_id: int, hours: int, output: str = "numpy"):
+        """
+        Columnar variant of fetch_user_transaction_history. With output='numpy' amounts are float64 and timestamps
+        datetime64[us], with output='arrow' amounts keep their NUMERIC(15,2) precision as decimal128(15, 2).
+
+        Args:
+            user_id (int): User whose history is read
+            hours (int): Look back window in hours
+            output (str): 'numpy' or 'arrow'. Defaults to 'numpy'.
+        Returns:
+            dict[str, np.ndarray] | pyarrow.Table: History columns ordered by timestamp
+        """
+        try:
+            return self._fetch_columns(USER_HISTORY_QUERY, (user_id, hours), output)
+        except Exception as e:
+            print(f"Error fetching columnar transaction history for user {user_id}: {e}")
+            raise
+
+    @_instrumented
+    def fetch_device_recent_transactions_columns(self, device_id: int, hours: int, output: str = "numpy"):
+        """
+        Columnar variant of fetch_device_recent_transactions.
+
+        Args:
+            device_id (int): Device whose transactions are read
+            hours (int): Look back window in hours
+            output (str): 'numpy' or 'arrow'. Defaults to 'numpy'.
+        Returns:
+            dict[str, np.ndarray] | pyarrow.Table: device_id and transaction_timestamp columns ordered by timestamp
+        """
+        try:
+            return self._fetch_columns(DEVICE_RECENT_QUERY, (device_id, hours), output)
+        except Exception as e:
+            print(f"Error fetching columnar recent transactions for device {device_id}: {e}")
+            raise
+
+    @_instrumented
+    def fetch_transaction_histories_columns(
+            self,
+            user_ids: list[int],
+            hours: int,
+            device_ids: list[int] | None = None,
+            output: str = "numpy",
+    ):
+        """
+        Columnar variant of fetch_transaction_histories. The rows of all requested users and devices come back as one
+        ungrouped result ordered by timestamp, callers select a user with a mask on the user_id column (or
+        Table.filter for arrow) instead of per row grouping.
+
+        Args:
+            user_ids (list[int]): Users whose history is fetched
+            hours (int): Look back window in hours
+            device_ids (list[int] | None): Devices whose history is fetched as well. Defaults to None.
+            output (str): 'numpy' or 'arrow'. Defaults to 'numpy'.
+        Returns:
+            dict[str, np.ndarray] | pyarrow.Table: History columns of all requested users and devices
+        """
+        try:
+            return self._fetch_columns(HISTORIES_QUERY, (list(set(user_ids)), list(set(device_ids or [])), hours), output)
+        except Exception as e:
+            print(f"Error fetching columnar transaction histories for {len(user_ids)} users: {e}")
+            raise
+
+    @_instrumented
     def insert_fraud_alert(self, alert: dict) -> int:
-        with self.establish_connection() as conn:
+        with self.get_connection() as conn:
             with conn.cursor() as cursor:
                 try:
                     query = """
@@ -352,8 +1093,39 @@ class DatabaseManager:
                     print(f"Error inserting fraud alert: {e}")
                     raise
 
+    @_instrumented
+    def insert_fraud_alerts(self, alerts: list[dict], page_size: int = BULK_INSERT_PAGE_SIZE) -> list[int]:
+        """
+        Inserts many fraud alerts in one transaction.
+
+        Args:
+            alerts (list[dict]): Alert dicts with transaction_id, user_id, fraud_probability, model_name, alerted_at
+            page_size (int): Number of rows per INSERT statement. Defaults to BULK_INSERT_PAGE_SIZE.
+        Returns:
+            list[int]: Generated alert_ids in input order
+        """
+        query = """
+            INSERT INTO fraud_alerts (transaction_id, user_id, fraud_probability, model_name, alerted_at)
+            VALUES %s
+            RETURNING alert_id
+        """
+        rows = [(
+            alert["transaction_id"],
+            alert["user_id"],
+            alert["fraud_probability"],
+            alert["model_name"],
+            alert["alerted_at"],
+        ) for alert in alerts]
+
+        return self._bulk_insert(query, rows, template="(%s, %s, %s, %s, %s)", page_size=page_size)
+
+    @_instrumented
     def fetch_merchant_info(self, merchant_id: int) -> dict:
-        with self.establish_connection() as conn:
+        cached = self._cache_get("merchant", merchant_id)
+        if cached is not None:
+            return cached
+
+        with self.get_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cursor:
                 try:
                     query = """
@@ -361,10 +1133,466 @@ class DatabaseManager:
                         WHERE merchant_id = %s;
                     """
                     cursor.execute(query, (merchant_id,))
+                    result = cursor.fetchone()
+                    self._cache_put("merchant", merchant_id, result)
 
-                    return cursor.fetchone()
+                    return result
 
                 except Exception as e:
                     conn.rollback()
                     print(f"Error inserting fraud alert: {e}")
-                    raise
\ No newline at end of file
+                    raise
+
+    @_instrumented
+    def copy_rows(self, table_name: str, columns: list[str], rows: list[tuple]) -> int:
+        """
+        Streams rows into a table with COPY ... FROM STDIN in CSV format and commits once. None values are written as
+        NULL.
+
+        Args:
+            table_name (str): Target table
+            columns (list[str]): Target columns, in the order of the row tuples
+            rows (list[tuple]): Row values
+        Returns:
+            int: Number of copied rows
+        """
+        if not rows:
+            return 0
+
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+
+        query = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(
+            sql.Identifier(table_name), sql.SQL(", ").join(map(sql.Identifier, columns))
+        )
+
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                try:
+                    cursor.copy_expert(query.as_string(conn), buffer)
+                    conn.commit()
+
+                    return cursor.rowcount
+
+                except Exception as e:
+                    conn.rollback()
+                    print(f"Error copying rows into {table_name}: {e}")
+                    raise
+
+    @_instrumented
+    def fetch_max_id(self, table_name: str, id_column: str) -> int:
+        """
+        Returns the highest id of a table, 0 for empty tables.
+
+        Args:
+            table_name (str): Table to check
+            id_column (str): Id column of the table
+        Returns:
+            int: Highest id in the table
+        """
+        query = sql.SQL("SELECT COALESCE(MAX({}), 0) FROM {}").format(sql.Identifier(id_column), sql.Identifier(table_name))
+
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                try:
+                    cursor.execute(query)
+                    return cursor.fetchone()[0]
+
+                except Exception as e:
+                    print(f"Error fetching max id of {table_name}: {e}")
+                    raise
+
+    @_instrumented
+    def sync_serial_sequence(self, table_name: str, id_column: str) -> None:
+        """
+        Moves the SERIAL sequence of a table past its highest id. Needed after rows were copied with client side ids,
+        otherwise the next regular INSERT would reuse an id.
+
+        Args:
+            table_name (str): Table whose sequence is updated
+            id_column (str): SERIAL id column of the table
+        Returns:
+            None
+        """
+        query = sql.SQL("""
+            SELECT setval(pg_get_serial_sequence(%s, %s), GREATEST(COALESCE(MAX({}), 0), 1), MAX({}) IS NOT NULL)
+            FROM {}
+        """).format(sql.Identifier(id_column), sql.Identifier(id_column), sql.Identifier(table_name))
+
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                try:
+                    cursor.execute(query, (table_name, id_column))
+                    conn.commit()
+
+                except Exception as e:
+                    conn.rollback()
+                    print(f"Error syncing sequence of {table_name}: {e}")
+                    raise
+
+    @_instrumented
+    def fetch_rollup_buckets(self, entity: str, entity_id: int, hours: int, grain: str = "hourly") -> list[dict]:
+        """
+        Fetches the rollup buckets of a user or device that start within the look back window.
+
+        Args:
+            entity (str): 'user' or 'device'
+            entity_id (int): user_id or device_id
+            hours (int): Look back window in hours, aligned down to the bucket boundary
+            grain (str): 'hourly' or 'daily'. Defaults to 'hourly'.
+        Returns:
+            list[dict]: Buckets with bucket_start, transaction_count, amount_sum, amount_sumsq, decline_count and
+            category_bits ordered by bucket_start
+        Raises:
+            ValueError: If entity or grain is unknown.
+        """
+        table_name = ROLLUP_TABLES.get((entity, grain))
+        if table_name is None:
+            raise ValueError(f"Unknown rollup '{entity}'/'{grain}', expected one of {list(ROLLUP_TABLES)}")
+
+        query = sql.SQL("""
+            SELECT bucket_start, transaction_count, amount_sum, amount_sumsq, decline_count, category_bits
+            FROM {table}
+            WHERE {id_column} = %s
+            AND bucket_start >= date_trunc({unit}, LOCALTIMESTAMP - make_interval(hours => %s))
+            ORDER BY bucket_start ASC;
+        """).format(
+            table=sql.Identifier(table_name),
+            id_column=sql.Identifier(f"{entity}_id"),
+            unit=sql.Literal("hour" if grain == "hourly" else "day"),
+        )
+
+        with self.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                try:
+                    cursor.execute(query, (entity_id, hours))
+
+                    return cursor.fetchall()
+
+                except Exception as e:
+                    print(f"Error fetching {grain} rollups for {entity} {entity_id}: {e}")
+                    raise
+
+    @_instrumented
+    def fetch_user_amount_aggregates(self, user_id: int, as_of: datetime | None = None) -> dict:
+        """
+        Reconstructs the inputs of compute_amount_features from at most 169 hourly rollup buckets instead of the raw
+        transactions. Windows are aligned to full hours, so they cover up to one hour more than the Spark windows.
+        Only stored transactions are counted, the transaction being scored has to be added by the caller if it is not
+        written yet.
+
+        Args:
+            user_id (int): User whose aggregates are computed
+            as_of (datetime | None): End of the windows. Defaults to None (now).
+        Returns:
+            dict: {"24h": stats, "7d": stats} with transaction_count, amount_sum, avg_amount, stddev_amount and
+            decline_count per window
+        """
+        with self.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                try:
+                    query = """
+                        WITH bounds AS (SELECT COALESCE(%(as_of)s::timestamp, LOCALTIMESTAMP) AS as_of),
+                        buckets AS (
+                            SELECT r.*, r.bucket_start >= date_trunc('hour', b.as_of - INTERVAL '24 hours') AS in_24h
+                            FROM bounds b
+                            JOIN user_transaction_rollups_hourly r
+                                ON r.user_id = %(user_id)s
+                                AND r.bucket_start >= date_trunc('hour', b.as_of - INTERVAL '7 days')
+                                AND r.bucket_start <= b.as_of
+                        )
+                        SELECT
+                            SUM(transaction_count) FILTER (WHERE in_24h) AS count_24h,
+                            SUM(amount_sum) FILTER (WHERE in_24h) AS sum_24h,
+                            SUM(amount_sumsq) FILTER (WHERE in_24h) AS sumsq_24h,
+                            SUM(decline_count) FILTER (WHERE in_24h) AS declines_24h,
+                            SUM(transaction_count) AS count_7d,
+                            SUM(amount_sum) AS sum_7d,
+                            SUM(amount_sumsq) AS sumsq_7d,
+                            SUM(decline_count) AS declines_7d
+                        FROM buckets;
+                    """
+                    cursor.execute(query, {"user_id": user_id, "as_of": as_of})
+                    row = cursor.fetchone()
+
+                    return {
+                        window: _window_stats(row[f"count_{window}"], row[f"sum_{window}"], row[f"sumsq_{window}"],
+                                              row[f"declines_{window}"])
+                        for window in ("24h", "7d")
+                    }
+
+                except Exception as e:
+                    print(f"Error fetching amount aggregates for user {user_id}: {e}")
+                    raise
+
+    @_instrumented
+    def fetch_user_behavioral_aggregates(self, user_id: int, as_of: datetime | None = None) -> dict:
+        """
+        Reconstructs the rollup backed inputs of compute_behavioral_features: the merchant categories of the last 24h
+        (hourly buckets) and 30 days (daily buckets), plus the timestamp of the user's last transaction for
+        seconds_since_last_transaction. Distinct merchant and country counts are not part of the rollups and still
+        need the raw 24h history.
+
+        Args:
+            user_id (int): User whose aggregates are computed
+            as_of (datetime | None): End of the windows. Defaults to None (now).
+        Returns:
+            dict: merchant_categories_24h, merchant_categories_30d (sets of category names), transaction_count_24h,
+            transaction_count_30d and last_transaction_timestamp (None if the user has no transactions)
+        """
+        with self.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                try:
+                    query = """
+                        WITH bounds AS (SELECT COALESCE(%(as_of)s::timestamp, LOCALTIMESTAMP) AS as_of),
+                        hourly AS (
+                            SELECT COALESCE(bit_or(r.category_bits), 0) AS bits,
+                                   COALESCE(SUM(r.transaction_count), 0) AS cnt
+                            FROM bounds b
+                            JOIN user_transaction_rollups_hourly r
+                                ON r.user_id = %(user_id)s
+                                AND r.bucket_start >= date_trunc('hour', b.as_of - INTERVAL '24 hours')
+                                AND r.bucket_start <= b.as_of
+                        ),
+                        daily AS (
+                            SELECT COALESCE(bit_or(r.category_bits), 0) AS bits,
+                                   COALESCE(SUM(r.transaction_count), 0) AS cnt
+                            FROM bounds b
+                            JOIN user_transaction_rollups_daily r
+                                ON r.user_id = %(user_id)s
+                                AND r.bucket_start >= date_trunc('day', b.as_of - INTERVAL '30 days')
+                                AND r.bucket_start <= b.as_of
+                        )
+                        SELECT
+                            ARRAY(SELECT c.merchant_category FROM merchant_category_bits c
+                                  WHERE h.bits & (1::bigint << c.bit) <> 0) AS merchant_categories_24h,
+                            ARRAY(SELECT c.merchant_category FROM merchant_category_bits c
+                                  WHERE d.bits & (1::bigint << c.bit) <> 0) AS merchant_categories_30d,
+                            h.cnt AS transaction_count_24h,
+                            d.cnt AS transaction_count_30d,
+                            (SELECT MAX(t.transaction_timestamp) FROM transactions t, bounds b
+                             WHERE t.user_id = %(user_id)s AND t.transaction_timestamp <= b.as_of)
+                                AS last_transaction_timestamp
+                        FROM hourly h, daily d;
+                    """
+                    cursor.execute(query, {"user_id": user_id, "as_of": as_of})
+                    row = cursor.fetchone()
+
+                    return {
+                        "merchant_categories_24h": set(row["merchant_categories_24h"]),
+                        "merchant_categories_30d": set(row["merchant_categories_30d"]),
+                        "transaction_count_24h": int(row["transaction_count_24h"]),
+                        "transaction_count_30d": int(row["transaction_count_30d"]),
+                        "last_transaction_timestamp": row["last_transaction_timestamp"],
+                    }
+
+                except Exception as e:
+                    print(f"Error fetching behavioral aggregates for user {user_id}: {e}")
+                    raise
+
+    @_instrumented
+    def fetch_users_rollup_aggregates(self, user_ids: list[int], as_of: datetime | None = None) -> dict[int, dict]:
+        """
+        Reads the rollup backed inputs of the streaming features for all users of a micro-batch with one query: the
+        7 day amount count and sum, the merchant categories of the last 30 days and the user's last transaction. With
+        these the streaming job only needs 24 hours of raw rows per user. Like fetch_user_amount_aggregates, windows are
+        aligned to bucket boundaries and only stored transactions are counted.
+
+        Args:
+            user_ids (list[int]): Users whose aggregates are read, duplicates are read once
+            as_of (datetime | None): End of the windows. Defaults to None (now).
+        Returns:
+            dict[int, dict]: {user_id: {"transaction_count_7d", "amount_sum_7d", "merchant_categories_30d" (set),
+            "last_transaction_timestamp" (None if the user has no transactions)}}, one entry per requested user
+        """
+        user_ids = list(set(user_ids))
+        if not user_ids:
+            return {}
+
+        with self.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                try:
+                    cursor.execute(USERS_ROLLUP_QUERY, {"user_ids": user_ids, "as_of": as_of})
+
+                    return {row["user_id"]: _users_rollup_row(row) for row in cursor.fetchall()}
+
+                except Exception as e:
+                    print(f"Error fetching rollup aggregates for {len(user_ids)} users: {e}")
+                    raise
+
+    def explain_analyze(self, query: str, params: tuple | None = None) -> dict:
+        """
+        Runs EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) for a query. The statement is executed inside a transaction that
+        is always rolled back, so data modifying statements can be measured without side effects.
+
+        Args:
+            query (str): Query to analyze
+            params (tuple | None): Query parameters. Defaults to None.
+        Returns:
+            dict: The JSON plan of the query, including "Planning Time" and "Execution Time" in ms.
+        """
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                try:
+                    cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query, params)
+                    return cursor.fetchone()[0][0]
+
+                except Exception as e:
+                    print(f"Error explaining query: {e}")
+                    raise
+
+                finally:
+                    conn.rollback()
+
+    @staticmethod
+    def transaction_partition_name(month: datetime) -> str:
+        """Name of the monthly transactions partition that contains the given timestamp, e.g. transactions_p2025_01."""
+        return f"transactions_p{month.year:04d}_{month.month:02d}"
+
+    @_instrumented
+    def list_transaction_partitions(self) -> list[dict]:
+        """
+        Lists the monthly partitions attached to the transactions table. The default partition is not included.
+
+        Returns:
+            list[dict]: Partitions with keys name, month_start, month_end, sorted by month. Empty if transactions is
+            not partitioned.
+        """
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                try:
+                    query = """
+                        SELECT child.relname
+                        FROM pg_inherits i
+                        JOIN pg_class parent ON parent.oid = i.inhparent
+                        JOIN pg_class child ON child.oid = i.inhrelid
+                        WHERE parent.relname = 'transactions'
+                        AND child.relname LIKE 'transactions\\_p%';
+                    """
+                    cursor.execute(query)
+                    partitions = []
+                    for (name,) in cursor.fetchall():
+                        month = datetime.strptime(name.removeprefix("transactions_p"), "%Y_%m")
+                        partitions.append({"name": name, "month_start": month, "month_end": util.add_months(month, 1)})
+
+                    return sorted(partitions, key=lambda p: p["month_start"])
+
+                except Exception as e:
+                    print(f"Error listing transaction partitions: {e}")
+                    raise
+
+    @_instrumented
+    def create_transaction_partitions(
+            self,
+            months_ahead: int = TRANSACTION_PARTITION_PARAMS["months_ahead"],
+            start: datetime | None = None,
+    ) -> list[str]:
+        """
+        Creates the missing monthly partitions from the month of `start` up to `months_ahead` months after the current
+        month. Run it ahead of time (e.g. on startup of the streaming job) so inserts never land in the default
+        partition. No-op if transactions is not partitioned.
+
+        Args:
+            months_ahead (int): Number of future months to create. Defaults to TRANSACTION_PARTITION_PARAMS.
+            start (datetime | None): First month to create, e.g. for back filled data. Defaults to the current month.
+        Returns:
+            list[str]: Names of the created partitions
+        """
+        if not self._is_transactions_partitioned():
+            return []
+
+        existing = {p["name"] for p in self.list_transaction_partitions()}
+        month = util.month_start(start or datetime.now())
+        last_month = util.add_months(datetime.now(), months_ahead)
+        created = []
+
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                try:
+                    while month <= last_month:
+                        name = self.transaction_partition_name(month)
+                        if name not in existing:
+                            query = sql.SQL("CREATE TABLE IF NOT EXISTS {} PARTITION OF transactions FOR VALUES FROM (%s) TO (%s)")
+                            cursor.execute(query.format(sql.Identifier(name)), (month, util.add_months(month, 1)))
+                            created.append(name)
+                        month = util.add_months(month, 1)
+                    conn.commit()
+
+                    return created
+
+                except Exception as e:
+                    conn.rollback()
+                    print(f"Error creating transaction partitions: {e}")
+                    raise
+
+    @_instrumented
+    def detach_transaction_partitions(
+            self,
+            retention_months: int = TRANSACTION_PARTITION_PARAMS["retention_months"],
+            drop: bool = False,
+    ) -> list[str]:
+        """
+        Detaches all monthly partitions that end before the retention window. Detached partitions stay as standalone
+        tables that can be archived, with drop=True they are removed instead.
+
+        Args:
+            retention_months (int): Number of months (including the current one) that stay attached.
+            drop (bool): Drop the detached tables. Defaults to False.
+        Returns:
+            list[str]: Names of the detached partitions
+        """
+        cutoff = util.add_months(datetime.now(), -(retention_months - 1))
+        old_partitions = [p["name"] for p in self.list_transaction_partitions() if p["month_end"] <= cutoff]
+
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                try:
+                    for name in old_partitions:
+                        cursor.execute(sql.SQL("ALTER TABLE transactions DETACH PARTITION {}").format(sql.Identifier(name)))
+                        if drop:
+                            cursor.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+                    conn.commit()
+
+                    return old_partitions
+
+                except Exception as e:
+                    conn.rollback()
+                    print(f"Error detaching transaction partitions: {e}")
+                    raise
+
+    @_instrumented
+    def detach_transaction_partition(self, name: str, drop: bool = False) -> None:
+        """
+        Detaches a single monthly partition, e.g. after it was archived.
+
+        Args:
+            name (str): Partition name as returned by list_transaction_partitions
+            drop (bool): Drop the detached table. Defaults to False.
+        Returns:
+            None
+        """
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                try:
+                    cursor.execute(sql.SQL("ALTER TABLE transactions DETACH PARTITION {}").format(sql.Identifier(name)))
+                    if drop:
+                        cursor.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+                    conn.commit()
+
+                except Exception as e:
+                    conn.rollback()
+                    print(f"Error detaching transaction partition {name}: {e}")
+                    raise
+
+    def _is_transactions_partitioned(self) -> bool:
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT EXISTS (
+                        SELECT 1 FROM pg_partitioned_table pt
+                        JOIN pg_class c ON c.oid = pt.partrelid
+                        WHERE c.relname = 'transactions'
+                    );
+                """)
+                return cursor.fetchone()[0]
@@ -0,0 +1,417 @@
+import json
+import random
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+import src.DataGenerator as DG
+import src.TransactionGenerator as TG
+import src.utility as util
+from src.CurrencyConvertor import CurrencyConvertor
+from src.EntityStateStore import EntityStateStore, TABLE_COLUMNS, TABLE_LOAD_ORDER, ID_COLUMNS, write_parquet_batches
+from src.constants import INIT_DATA_PARAMS, SHARDED_INIT_PARAMS
+
+
+MANIFEST_FILE = "manifest.json"
+MERCHANTS_DIR = "merchants"
+
+# Id columns per table and the table whose ids they hold. Every shard assigns local ids starting at 1, merging shifts
+# them by the ids of all previous shards.
+ID_REFERENCES = {
+    "merchants": {"merchant_id": "merchants"},
+    "users": {"user_id": "users"},
+    "user_devices": {"device_id": "user_devices", "user_id": "users"},
+    "payment_methods": {"payment_method_id": "payment_methods", "user_id": "users"},
+    "transactions": {"user_id": "users", "merchant_id": "merchants", "payment_id": "payment_methods",
+                     "device_id": "user_devices"},
+}
+
+
+def generate_user_patterns(
+        store: EntityStateStore,
+        TransactionGen,
+        generators: dict,
+        merchant_ids: list[int],
+        n_users: int,
+        now: datetime,
+) -> None:
+    """
+    Generates n_users users with their device, payment method and transaction patterns into an EntityStateStore.
+    Users are generated in one batch (UserGenerator.generate_users), creation timestamps are drawn from the user
+    generator's numpy Generator over the same range as util.generate_random_past_timestamp.
+
+    Args:
+        store (EntityStateStore): Store the rows are added to, also used by TransactionGen for payment methods
+        TransactionGen (TransactionGenerator): Offline TransactionGenerator writing to the same store
+        generators (dict): {"user": UserGenerator, "device": DeviceGenerator, "payment_method": PaymentMethodGenerator}
+        merchant_ids (list[int]): Merchants the transactions are drawn from
+        n_users (int): Number of users to generate
+        now (datetime): Upper bound of the user and pattern timestamps
+    Returns:
+        None
+    """
+    UserGen = generators["user"]
+    created_at = util.generate_random_timestamps_in_range(now - timedelta(days=12 * 30), now, n_users, rng=UserGen.rng)
+    user_ids = store.add_users(UserGen.generate_users(n_users, created_at))
+
+    for user_id, generated_timestamp in zip(user_ids, created_at):
+        device_id = store.add_device(generators["device"].generate_device(user_id, generated_timestamp))
+        store.insert_payment_method(generators["payment_method"].generate_payment_method(user_id, generated_timestamp))
+
+        pattern_timestamp = generated_timestamp
+        for _ in range(random.randint(INIT_DATA_PARAMS["min_patterns"], INIT_DATA_PARAMS["max_patterns"])):
+            merchant_id = random.choice(merchant_ids)
+            # Chronological pattern timestamps, a pattern must not start before the previous one (payment methods
+            # deactivated in the previous pattern would otherwise be replaced in the past)
+            pattern_timestamp = util.generate_random_timestamp_in_range(pattern_timestamp, now)
+            data = TransactionGen.generate_transaction_pattern(user_id, device_id, merchant_id, pattern_start_time=pattern_timestamp)
+            store.add_transactions(data)
+
+
+def derive_seeds(seed: int, key: tuple[int, ...], n: int = 3) -> list[int]:
+    """
+    Derives independent 32 bit seeds for one unit of work (e.g. a shard) from the dataset seed via numpy SeedSequence.
+    The same seed and key always give the same seeds, different keys give uncorrelated streams.
+
+    Args:
+        seed (int): Dataset seed
+        key (tuple[int, ...]): Spawn key of the unit of work
+        n (int): Number of seeds
+    Returns:
+        list[int]: Derived seeds
+    """
+    return [int(value) for value in np.random.SeedSequence(entropy=seed, spawn_key=key).generate_state(n)]
+
+
+def _build_shard(task: dict) -> dict:
+    """
+    Generates the users of one shard into <shard_dir>/<table>/part-<chunk>.parquet. Runs in a worker process, the
+    random module, Faker and the TransactionGenerator are seeded from the shard seeds. Files are written to a temporary
+    directory first and only renamed to shard_dir once the shard is complete.
+
+    Args:
+        task (dict): seed, shard, n_users, n_merchants, users_per_chunk, as_of (ISO string), conversion_rates, shard_dir
+    Returns:
+        dict: shard, rows per table and last_ids of the shard's EntityStateStore
+    """
+    python_seed, faker_seed, numpy_seed = derive_seeds(task["seed"], (0, task["shard"]))
+    random.seed(python_seed)
+
+    generators = {
+        "user": DG.UserGenerator(seed=faker_seed),
+        "device": DG.DeviceGenerator(),
+        "payment_method": DG.PaymentMethodGenerator(),
+    }
+    TransactionGen = TG.TransactionGenerator(conversion_rates=task["conversion_rates"], offline=True, seed=numpy_seed)
+    store = TransactionGen.DBM
+
+    # Merchant ids are local as well, they are shifted together with the merchants file
+    merchant_ids = list(range(1, task["n_merchants"] + 1))
+    now = datetime.fromisoformat(task["as_of"])
+
+    shard_dir = Path(task["shard_dir"])
+    tmp_dir = shard_dir.with_name(shard_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    rows = {table: 0 for table in TABLE_LOAD_ORDER}
+    users_per_chunk = task["users_per_chunk"]
+    for part, chunk_start in enumerate(range(0, task["n_users"], users_per_chunk)):
+        chunk_users = min(users_per_chunk, task["n_users"] - chunk_start)
+        generate_user_patterns(store, TransactionGen, generators, merchant_ids, chunk_users, now)
+        for table, count in write_parquet_batches(store.drain(), tmp_dir, part).items():
+            rows[table] += count
+
+    shutil.rmtree(shard_dir, ignore_errors=True)
+    tmp_dir.rename(shard_dir)
+
+    return {"shard": task["shard"], "rows": rows, "last_ids": store.last_ids()}
+
+
+class ShardedDatasetBuilder:
+    """
+    Builds a reproducible dataset in parallel. The user range is split into shards, every shard is generated by a
+    worker process with seeds derived from the dataset seed and written to its own parquet directory with local ids.
+    A manifest in output_dir keeps the configuration, the fixed as-of timestamp, the conversion rates and the completed
+    shards, so an interrupted build resumes with the missing shards and the same inputs. Merging shifts the local ids
+    shard by shard in index order, which makes the result independent of worker scheduling.
+
+    Layout of output_dir:
+        manifest.json
+        merchants/merchants/part-00000.parquet
+        shard-00000/<table>/part-<chunk>.parquet
+        ...
+    """
+    def __init__(
+            self,
+            output_dir: str | Path,
+            n_users: int,
+            n_merchants: int,
+            n_shards: int = SHARDED_INIT_PARAMS["shards"],
+            seed: int = SHARDED_INIT_PARAMS["seed"],
+            users_per_chunk: int = SHARDED_INIT_PARAMS["users_per_chunk"],
+            as_of: datetime | None = None,
+            conversion_rates: dict | None = None,
+    ):
+        """
+        Args:
+            output_dir (str | Path): Directory of the manifest and the shard files
+            n_users (int): Number of users of the whole dataset
+            n_merchants (int): Number of merchants, must be > 0
+            n_shards (int): Number of shards the users are split into
+            seed (int): Dataset seed, the same seed and configuration reproduce the same dataset
+            users_per_chunk (int): Users per parquet part file within a shard
+            as_of (datetime | None): Upper bound of all generated timestamps. Defaults to None (the value stored in an
+            existing manifest, otherwise the current time).
+            conversion_rates (dict | None): Fixed conversion rates for a new manifest. Defaults to None (fetched once
+            from CurrencyConvertor when building).
+        Raises:
+            ValueError: If the configuration is invalid or differs from an existing manifest in output_dir.
+        """
+        if n_merchants <= 0 or n_shards <= 0 or users_per_chunk <= 0:
+            raise ValueError("n_merchants, n_shards and users_per_chunk must be positive")
+
+        self.output_dir = Path(output_dir)
+        self.config = {
+            "seed": seed,
+            "n_users": n_users,
+            "n_merchants": n_merchants,
+            "n_shards": n_shards,
+            "users_per_chunk": users_per_chunk,
+        }
+        self.manifest = self._load_manifest(as_of)
+        if self.manifest["conversion_rates"] is None:
+            self.manifest["conversion_rates"] = conversion_rates
+
+    @property
+    def as_of(self) -> datetime:
+        return datetime.fromisoformat(self.manifest["as_of"])
+
+    def _load_manifest(self, as_of: datetime | None) -> dict:
+        path = self.output_dir / MANIFEST_FILE
+        if not path.exists():
+            return {
+                "config": self.config,
+                "as_of": (as_of or datetime.now()).replace(microsecond=0).isoformat(),
+                "conversion_rates": None,
+                "merchants": None,
+                "shards": {},
+            }
+
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        if manifest["config"] != self.config:
+            raise ValueError(f"{path} was built with {manifest['config']}, not {self.config}. "
+                             "Use another output directory or delete it.")
+        if as_of is not None and as_of.replace(microsecond=0).isoformat() != manifest["as_of"]:
+            raise ValueError(f"{path} was built as of {manifest['as_of']}, not {as_of}")
+
+        return manifest
+
+    def _save_manifest(self) -> None:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.output_dir / (MANIFEST_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+        tmp_path.replace(self.output_dir / MANIFEST_FILE)
+
+    def shard_dir(self, shard: int) -> Path:
+        return self.output_dir / f"shard-{shard:05d}"
+
+    def shard_user_counts(self) -> list[int]:
+        """
+        Returns:
+            list[int]: Number of users per shard, the sizes differ by at most one
+        """
+        n_users, n_shards = self.config["n_users"], self.config["n_shards"]
+        return [(shard + 1) * n_users // n_shards - shard * n_users // n_shards for shard in range(n_shards)]
+
+    def pending_shards(self) -> list[int]:
+        """
+        Returns:
+            list[int]: Shards that are not recorded as complete in the manifest or whose directory is missing
+        """
+        return [
+            shard for shard in range(self.config["n_shards"])
+            if str(shard) not in self.manifest["shards"] or not self.shard_dir(shard).is_dir()
+        ]
+
+    def _build_merchants(self) -> dict:
+        python_seed, faker_seed, _ = derive_seeds(self.config["seed"], (1,))
+        random.seed(python_seed)
+        MerchantGen = DG.MerchantGenerator(seed=faker_seed)
+
+        store = EntityStateStore()
+        store.add_merchants(MerchantGen.generate_merchants(self.config["n_merchants"]))
+
+        merchants_dir = self.output_dir / MERCHANTS_DIR
+        shutil.rmtree(merchants_dir, ignore_errors=True)
+        return write_parquet_batches(store.drain(), merchants_dir, 0)
+
+    def build(self, workers: int | None = None) -> dict:
+        """
+        Generates the merchants and all pending shards. Conversion rates are fetched once and kept in the manifest.
+
+        Args:
+            workers (int | None): Size of the process pool. Defaults to None (number of CPUs).
+        Returns:
+            dict: Rows per table of the complete dataset
+        """
+        if self.manifest["conversion_rates"] is None:
+            self.manifest["conversion_rates"] = CurrencyConvertor().fetch_conversion_rates()
+            self._save_manifest()
+
+        if self.manifest["merchants"] is None or not (self.output_dir / MERCHANTS_DIR).is_dir():
+            self.manifest["merchants"] = self._build_merchants()
+            self._save_manifest()
+
+        pending = self.pending_shards()
+        print(f"{len(pending)} of {self.config['n_shards']} shards pending in {self.output_dir}")
+
+        user_counts = self.shard_user_counts()
+        tasks = [{
+            "seed": self.config["seed"],
+            "shard": shard,
+            "n_users": user_counts[shard],
+            "n_merchants": self.config["n_merchants"],
+            "users_per_chunk": self.config["users_per_chunk"],
+            "as_of": self.manifest["as_of"],
+            "conversion_rates": self.manifest["conversion_rates"],
+            "shard_dir": str(self.shard_dir(shard)),
+        } for shard in pending]
+
+        if tasks:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_build_shard, task) for task in tasks]
+                for future in as_completed(futures):
+                    result = future.result()
+                    self.manifest["shards"][str(result["shard"])] = {
+                        "rows": result["rows"], "last_ids": result["last_ids"]
+                    }
+                    self._save_manifest()  # Completed shards survive a crash of the remaining ones
+                    print(f"Shard {result['shard']} done: {sum(result['rows'].values())} rows")
+
+        return self.row_counts()
+
+    def row_counts(self) -> dict:
+        """
+        Returns:
+            dict: Rows per table over the merchants and all completed shards
+        """
+        counts = {table: 0 for table in TABLE_LOAD_ORDER}
+        counts["merchants"] = (self.manifest["merchants"] or {}).get("merchants", 0)
+        for shard in self.manifest["shards"].values():
+            for table, rows in shard["rows"].items():
+                if table != "merchants":
+                    counts[table] += rows
+        return counts
+
+    def shard_id_offsets(self, base_offsets: dict | None = None) -> list[dict]:
+        """
+        Computes the id shift per shard and table: the base offset plus the last ids of all previous shards.
+
+        Args:
+            base_offsets (dict | None): Last used id per table before the dataset, e.g. MAX(id) in Postgres.
+            Defaults to None (0, merged ids start at 1).
+        Returns:
+            list[dict]: {table: offset} per shard
+        Raises:
+            RuntimeError: If shards are still pending.
+        """
+        pending = self.pending_shards()
+        if pending:
+            raise RuntimeError(f"Shards {pending} are not built yet, run build() first")
+
+        running = {table: (base_offsets or {}).get(table, 0) for table in ID_COLUMNS}
+        offsets = []
+        for shard in range(self.config["n_shards"]):
+            offsets.append(dict(running))
+            for table, last_id in self.manifest["shards"][str(shard)]["last_ids"].items():
+                if table != "merchants":
+                    running[table] += last_id
+        return offsets
+
+    def iter_merged(self, base_offsets: dict | None = None):
+        """
+        Yields the dataset with globally unique ids, table by table in TABLE_LOAD_ORDER and within a table shard by
+        shard and part by part. Only one part file is in memory at a time.
+
+        Args:
+            base_offsets (dict | None): See shard_id_offsets
+        Yields:
+            tuple[str, pyarrow.Table]: Table name and one part with shifted ids
+        Raises:
+            RuntimeError: If shards are still pending.
+        """
+        import pyarrow as pa  # Only needed for parquet datasets
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        shard_offsets = self.shard_id_offsets(base_offsets)
+        merchant_offsets = {"merchants": (base_offsets or {}).get("merchants", 0)}
+
+        for table in TABLE_LOAD_ORDER:
+            if table == "merchants":
+                sources = [(self.output_dir / MERCHANTS_DIR, merchant_offsets)]
+            else:
+                sources = [(self.shard_dir(shard), offsets) for shard, offsets in enumerate(shard_offsets)]
+
+            for directory, offsets in sources:
+                for part_file in sorted((directory / table).glob("part-*.parquet")):
+                    arrow_table = pq.read_table(part_file)
+                    for column, id_table in ID_REFERENCES[table].items():
+                        offset = offsets.get(id_table, 0)
+                        if offset:
+                            shifted = pc.add(arrow_table[column], pa.scalar(offset, type=pa.int32()))
+                            arrow_table = arrow_table.set_column(
+                                arrow_table.schema.get_field_index(column), column, shifted)
+                    yield table, arrow_table
+
+    def write_merged(self, target_dir: str | Path) -> dict:
+        """
+        Writes the merged dataset to <target_dir>/<table>/part-<n>.parquet, ids start at 1.
+
+        Args:
+            target_dir (str | Path): Output directory, existing part files are overwritten
+        Returns:
+            dict: Written rows per table
+        """
+        import pyarrow.parquet as pq
+
+        written = {table: 0 for table in TABLE_LOAD_ORDER}
+        parts = {table: 0 for table in TABLE_LOAD_ORDER}
+        for table, arrow_table in self.iter_merged():
+            table_dir = Path(target_dir) / table
+            table_dir.mkdir(parents=True, exist_ok=True)
+            pq.write_table(arrow_table, table_dir / f"part-{parts[table]:05d}.parquet")
+            parts[table] += 1
+            written[table] += arrow_table.num_rows
+
+        return written
+
+    def load_into(self, dbm) -> dict:
+        """
+        Copies the merged dataset into the database with ids continuing after the current MAX(id) of every table and
+        syncs the serial sequences afterward. Assumes no other process writes to these tables meanwhile.
+
+        Args:
+            dbm (DatabaseManager): DatabaseManager with copy_rows, fetch_max_id and sync_serial_sequence
+        Returns:
+            dict: Copied rows per table
+        """
+        base_offsets = {table: dbm.fetch_max_id(table, id_column) for table, id_column in ID_COLUMNS.items()}
+
+        copied = {table: 0 for table in TABLE_LOAD_ORDER}
+        for table, arrow_table in self.iter_merged(base_offsets):
+            columns = TABLE_COLUMNS[table]
+            rows = list(zip(*(arrow_table.column(column).to_pylist() for column in columns)))
+            copied[table] += dbm.copy_rows(table, columns, rows)
+
+        for table, id_column in ID_COLUMNS.items():
+            dbm.sync_serial_sequence(table, id_column)
+
+        return copied
@@ -0,0 +1,110 @@
+import random
+import threading
+import time
+
+from src.DatabaseManager import DatabaseManager
+from src.constants import ENTITY_SAMPLER_PARAMS
+
+
+class EntitySampler:
+    """
+    In-memory replacement for fetch_random_user_id / fetch_random_device_id. Loads all (user_id, device_id) pairs once
+    and afterwards only fetches devices with a higher device_id than the last one seen, so refreshes stay cheap on
+    large tables. Sampling is O(1). Users without a device are never sampled, the producer needs both ids anyway.
+    Deleted users or devices are not removed before the next full reload.
+    """
+    def __init__(
+            self,
+            dbm: DatabaseManager,
+            refresh_interval_seconds: float = ENTITY_SAMPLER_PARAMS["refresh_interval_seconds"],
+            seed: int | None = None,
+    ) -> None:
+        """
+        Loads the initial user -> device mapping.
+
+        Args:
+            dbm (DatabaseManager): DatabaseManager used to load user and device ids
+            refresh_interval_seconds (float): Minimum time between two incremental refreshes in maybe_refresh
+            seed (int | None): Seed for the sampler's own random generator. Defaults to None.
+        Returns:
+            None
+        """
+        self.dbm = dbm
+        self.refresh_interval_seconds = refresh_interval_seconds
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self._user_ids = []
+        self._user_devices = {}  # user_id -> [device_id, ...]
+        self._last_device_id = 0
+        self._last_refresh = 0.0
+
+        self.refresh()
+
+    def _add(self, user_id: int, device_id: int) -> None:
+        devices = self._user_devices.get(user_id)
+        if devices is None:
+            self._user_ids.append(user_id)
+            self._user_devices[user_id] = [device_id]
+        elif device_id not in devices:
+            devices.append(device_id)
+        self._last_device_id = max(self._last_device_id, device_id)
+
+    def refresh(self) -> int:
+        """
+        Fetches all devices added since the last refresh, including the ones of new users.
+
+        Returns:
+            int: Number of new devices
+        """
+        pairs = self.dbm.fetch_user_device_ids(min_device_id=self._last_device_id)
+        with self._lock:
+            for user_id, device_id in pairs:
+                self._add(user_id, device_id)
+            self._last_refresh = time.monotonic()
+
+        return len(pairs)
+
+    def maybe_refresh(self) -> int:
+        """
+        Refreshes if refresh_interval_seconds passed since the last refresh.
+
+        Returns:
+            int: Number of new devices, 0 if no refresh was due
+        """
+        if time.monotonic() - self._last_refresh < self.refresh_interval_seconds:
+            return 0
+        return self.refresh()
+
+    def register(self, user_id: int, device_id: int) -> None:
+        """Adds a user/device inserted by this process, so it can be sampled without waiting for the next refresh."""
+        with self._lock:
+            self._add(user_id, device_id)
+
+    def sample_user_id(self) -> int | None:
+        """Returns a uniformly sampled user_id, None if no user is known."""
+        with self._lock:
+            return self._random.choice(self._user_ids) if self._user_ids else None
+
+    def sample_device_id(self, user_id: int) -> int | None:
+        """Returns a uniformly sampled device of the user, None for unknown users."""
+        with self._lock:
+            devices = self._user_devices.get(user_id)
+            return self._random.choice(devices) if devices else None
+
+    def sample_user_and_device(self) -> tuple[int, int] | tuple[None, None]:
+        """Returns a random user and one of its devices in a single O(1) draw."""
+        with self._lock:
+            if not self._user_ids:
+                return None, None
+            user_id = self._random.choice(self._user_ids)
+            return user_id, self._random.choice(self._user_devices[user_id])
+
+    def stats(self) -> dict:
+        """Returns the number of known users and devices and the last seen device_id."""
+        with self._lock:
+            return {
+                "users": len(self._user_ids),
+                "devices": sum(len(devices) for devices in self._user_devices.values()),
+                "last_device_id": self._last_device_id,
+            }
@@ -0,0 +1,295 @@
+import csv
+import random
+import uuid
+from pathlib import Path
+
+
+# Column order per table, used for COPY batches. Matches db/init.sql
+TABLE_COLUMNS = {
+    "merchants": ["merchant_id", "merchant_name", "country", "rating", "merchant_category"],
+    "users": ["user_id", "name", "email", "country", "city", "latitude", "longitude", "created_at"],
+    "user_devices": ["device_id", "user_id", "device_type", "first_used", "last_used"],
+    "payment_methods": ["payment_method_id", "user_id", "payment_method", "payment_service_provider",
+                        "payment_is_active", "created_at"],
+    "transactions": ["transaction_id", "transaction_amount_local", "transaction_amount_usd", "transaction_timestamp",
+                     "transaction_status", "transaction_currency", "transaction_country", "transaction_channel",
+                     "user_id", "merchant_id", "payment_id", "device_id", "is_fraudulent", "fraud_type"],
+}
+
+# Primary key column per table with a SERIAL id
+ID_COLUMNS = {
+    "merchants": "merchant_id",
+    "users": "user_id",
+    "user_devices": "device_id",
+    "payment_methods": "payment_method_id",
+}
+
+# Tables in foreign key order, parents first
+TABLE_LOAD_ORDER = ["merchants", "users", "user_devices", "payment_methods", "transactions"]
+
+# Parquet column types for the exports, matching db/init.sql. Columns with the same name have the same type everywhere.
+# NUMERIC amounts are exported as float64, they are generated as floats rounded to two decimals.
+COLUMN_ARROW_TYPES = {
+    "merchant_id": "int32", "user_id": "int32", "device_id": "int32", "payment_method_id": "int32",
+    "payment_id": "int32", "payment_is_active": "int32", "is_fraudulent": "int32",
+    "latitude": "float64", "longitude": "float64",
+    "transaction_amount_local": "float64", "transaction_amount_usd": "float64",
+    "created_at": "timestamp", "first_used": "timestamp", "last_used": "timestamp", "transaction_timestamp": "timestamp",
+}  # Everything else is a string
+
+
+def _arrow_schema(table: str):
+    import pyarrow as pa  # Only needed for parquet exports
+
+    types = {"int32": pa.int32(), "float64": pa.float64(), "timestamp": pa.timestamp("us")}
+    return pa.schema([(column, types.get(COLUMN_ARROW_TYPES.get(column), pa.string())) for column in TABLE_COLUMNS[table]])
+
+
+def write_parquet_batches(batches: dict[str, list[tuple]], output_dir: str | Path, part: int) -> dict[str, int]:
+    """
+    Writes drained rows to <output_dir>/<table>/part-<part>.parquet with a fixed schema per table, so the parts of all
+    chunks can be read as one dataset (e.g. spark.read.parquet(<output_dir>/transactions)).
+
+    Args:
+        batches (dict[str, list[tuple]]): Output of EntityStateStore.drain()
+        output_dir (str | Path): Root directory of the export
+        part (int): Number of the part file, e.g. the chunk index
+    Returns:
+        dict[str, int]: Written rows per table, tables without rows are skipped
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    written = {}
+    for table, rows in batches.items():
+        if not rows:
+            continue
+        schema = _arrow_schema(table)
+        columns = list(zip(*rows))
+        arrow_table = pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+        )
+
+        table_dir = Path(output_dir) / table
+        table_dir.mkdir(parents=True, exist_ok=True)
+        pq.write_table(arrow_table, table_dir / f"part-{part:05d}.parquet")
+        written[table] = len(rows)
+
+    return written
+
+
+def write_copy_batches(batches: dict[str, list[tuple]], output_dir: str | Path, part: int) -> dict[str, int]:
+    """
+    Writes drained rows to <output_dir>/<table>/part-<part>.csv in the format DatabaseManager.copy_rows sends, so they
+    can be loaded later with COPY <table> (<TABLE_COLUMNS>) FROM '<file>' WITH (FORMAT csv) in TABLE_LOAD_ORDER.
+
+    Args:
+        batches (dict[str, list[tuple]]): Output of EntityStateStore.drain()
+        output_dir (str | Path): Root directory of the export
+        part (int): Number of the part file, e.g. the chunk index
+    Returns:
+        dict[str, int]: Written rows per table, tables without rows are skipped
+    """
+    written = {}
+    for table, rows in batches.items():
+        if not rows:
+            continue
+        table_dir = Path(output_dir) / table
+        table_dir.mkdir(parents=True, exist_ok=True)
+        with open(table_dir / f"part-{part:05d}.csv", "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows(rows)
+        written[table] = len(rows)
+
+    return written
+
+
+def _to_list(values) -> list:
+    """Turns numpy arrays into lists of plain Python values, so rows don't carry numpy scalars."""
+    return values.tolist() if hasattr(values, "tolist") else list(values)
+
+
+class EntityStateStore:
+    """
+    Keeps generated entities in memory and assigns their ids on the client side. Implements the payment method methods
+    of DatabaseManager, so it can be handed to TransactionGenerator as db_manager to generate patterns without a
+    database round trip per transaction.
+    """
+    def __init__(self, id_offsets: dict | None = None, seed: int | None = None):
+        """
+        Args:
+            id_offsets (dict | None): Last used id per table, e.g. the current MAX(id) in Postgres. Locally assigned
+            ids continue after it. Defaults to 0 for every table.
+            seed (int | None): Seed for the transaction UUIDs, makes them reproducible. Defaults to None (uuid4).
+        """
+        self._uuid_random = random.Random(seed) if seed is not None else None
+        id_offsets = id_offsets or {}
+        self._last_ids = {table: id_offsets.get(table, 0) for table in ID_COLUMNS}
+        self._rows = {table: [] for table in TABLE_COLUMNS}
+
+        self._payment_methods = {}  # payment_method_id -> row, references the rows in self._rows
+        self._user_payment_ids = {}  # user_id -> [payment_method_id, ...]
+
+    def _next_id(self, table: str) -> int:
+        self._last_ids[table] += 1
+        return self._last_ids[table]
+
+    def add_merchant(self, merchant_data: dict) -> int:
+        """
+        Stores a merchant from MerchantGenerator.
+
+        Args:
+            merchant_data (dict): Merchant dict with keys name, country, rating, category
+        Returns:
+            int: Assigned merchant_id
+        """
+        merchant_id = self._next_id("merchants")
+        self._rows["merchants"].append({
+            "merchant_id": merchant_id,
+            "merchant_name": merchant_data["name"],
+            "country": merchant_data["country"],
+            "rating": merchant_data["rating"],
+            "merchant_category": merchant_data["category"],
+        })
+        return merchant_id
+
+    def add_merchants(self, merchant_columns: dict) -> list[int]:
+        """
+        Stores the columnar output of MerchantGenerator.generate_merchants.
+
+        Args:
+            merchant_columns (dict): Equal length arrays or lists for name, country, rating, category
+        Returns:
+            list[int]: Assigned merchant_ids in input order
+        """
+        columns = {key: _to_list(values) for key, values in merchant_columns.items()}
+        return [
+            self.add_merchant({"name": name, "country": country, "rating": rating, "category": category})
+            for name, country, rating, category in zip(
+                columns["name"], columns["country"], columns["rating"], columns["category"])
+        ]
+
+    def add_users(self, user_columns: dict) -> list[int]:
+        """
+        Stores the columnar output of UserGenerator.generate_users.
+
+        Args:
+            user_columns (dict): Equal length arrays or lists for name, email, country, city, latitude, longitude,
+            created_at
+        Returns:
+            list[int]: Assigned user_ids in input order
+        """
+        keys = list(user_columns)
+        columns = [_to_list(user_columns[key]) for key in keys]
+        return [self.add_user(dict(zip(keys, values))) for values in zip(*columns)]
+
+    def add_user(self, user_data: dict) -> int:
+        """
+        Stores a user from UserGenerator.
+
+        Args:
+            user_data (dict): User dict with keys name, email, country, city, latitude, longitude, created_at
+        Returns:
+            int: Assigned user_id
+        """
+        user_id = self._next_id("users")
+        self._rows["users"].append({"user_id": user_id, **user_data})
+        return user_id
+
+    def add_device(self, user_device: dict) -> int:
+        """
+        Stores a device from DeviceGenerator.
+
+        Args:
+            user_device (dict): Device dict with keys user_id, device_type, first_used, last_used
+        Returns:
+            int: Assigned device_id
+        """
+        device_id = self._next_id("user_devices")
+        self._rows["user_devices"].append({"device_id": device_id, **user_device})
+        return device_id
+
+    def _new_uuid(self) -> uuid.UUID:
+        if self._uuid_random is None:
+            return uuid.uuid4()
+        return uuid.UUID(int=self._uuid_random.getrandbits(128), version=4)
+
+    def add_transactions(self, transactions: list[dict]) -> list[str]:
+        """
+        Stores generated transactions and assigns a client side UUID to every transaction without a transaction_id.
+
+        Args:
+            transactions (list[dict]): Transaction dicts from TransactionGenerator
+        Returns:
+            list[str]: transaction_ids in input order
+        """
+        transaction_ids = []
+        for transaction in transactions:
+            if transaction.get("transaction_id") is None:
+                transaction["transaction_id"] = str(self._new_uuid())
+            self._rows["transactions"].append(transaction)
+            transaction_ids.append(transaction["transaction_id"])
+
+        return transaction_ids
+
+    # DatabaseManager compatible payment method interface, used by TransactionGenerator
+
+    def insert_payment_method(self, user_payment_method: dict) -> int:
+        payment_method_id = self._next_id("payment_methods")
+        row = {
+            "payment_method_id": payment_method_id,
+            "user_id": user_payment_method["user_id"],
+            "payment_method": user_payment_method["payment_method"],
+            "payment_service_provider": user_payment_method["service_provider"],
+            "payment_is_active": user_payment_method["payment_is_active"],
+            "created_at": user_payment_method["created_at"],
+        }
+        self._rows["payment_methods"].append(row)
+        self._payment_methods[payment_method_id] = row
+        self._user_payment_ids.setdefault(row["user_id"], []).append(payment_method_id)
+
+        return payment_method_id
+
+    def fetch_active_payment_method(self, user_id: int) -> dict | None:
+        # Same semantics as the SQL version: oldest active payment method of the user
+        active = [
+            self._payment_methods[pid] for pid in self._user_payment_ids.get(user_id, [])
+            if self._payment_methods[pid]["payment_is_active"] == 1
+        ]
+        if not active:
+            return None
+
+        return dict(min(active, key=lambda row: row["created_at"]))
+
+    def fetch_payment_info(self, payment_id: int) -> dict | None:
+        row = self._payment_methods.get(payment_id)
+        return dict(row) if row is not None else None
+
+    def deactivate_payment_method(self, payment_id: int) -> bool:
+        row = self._payment_methods.get(payment_id)
+        if row is None:
+            return False
+        row["payment_is_active"] = 0
+        return True
+
+    def last_ids(self) -> dict:
+        """Returns the last assigned id per table."""
+        return dict(self._last_ids)
+
+    def drain(self) -> dict[str, list[tuple]]:
+        """
+        Returns all stored rows as tuples in TABLE_COLUMNS order and clears the store. Id counters are kept, so the
+        store can be reused for the next chunk of users. Payment method state is cleared as well, callers have to
+        finish all patterns for the drained users first.
+
+        Returns:
+            dict[str, list[tuple]]: Rows per table, in TABLE_LOAD_ORDER
+        """
+        batches = {
+            table: [tuple(row[column] for column in TABLE_COLUMNS[table]) for row in self._rows[table]]
+            for table in TABLE_LOAD_ORDER
+        }
+        self._rows = {table: [] for table in TABLE_COLUMNS}
+        self._payment_methods = {}
+        self._user_payment_ids = {}
+
+        return batches
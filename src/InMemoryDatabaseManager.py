@@ -0,0 +1,653 @@
+import random
+import threading
+import uuid
+from collections import namedtuple
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from src.DatabaseManager import DatabaseManager, ROLLUP_TABLES, _instrumented, _instrumented_stream, _window_stats
+from src.EntityStateStore import TABLE_COLUMNS, ID_COLUMNS
+from src.columnar import COLUMNAR_OUTPUTS, NUMERIC_OID, TIMESTAMP_OID, to_numpy_columns, to_arrow_table
+from src.QueryMetrics import QueryMetrics
+from src.constants import BULK_INSERT_PAGE_SIZE, SERVER_CURSOR_ITERSIZE, TRANSACTION_PARTITION_PARAMS
+
+
+# Columns of the history queries, merchant_category is joined from merchants
+HISTORY_COLUMNS = ["user_id", "device_id", "transaction_amount_usd", "transaction_status", "payment_id",
+                   "transaction_timestamp", "transaction_country", "merchant_id", "transaction_channel"]
+
+FRAUD_ALERT_COLUMNS = ["alert_id", "transaction_id", "user_id", "fraud_probability", "model_name", "alerted_at"]
+
+# The part of cursor.description the src.columnar converters read
+_Column = namedtuple("_Column", ["name", "type_code", "precision", "scale"])
+
+# (type OID, precision, scale) of the history columns, see db/init.sql
+HISTORY_COLUMN_TYPES = {
+    "user_id": (23, None, None),
+    "device_id": (23, None, None),
+    "transaction_amount_usd": (NUMERIC_OID, 15, 2),
+    "transaction_status": (1043, None, None),
+    "payment_id": (23, None, None),
+    "transaction_timestamp": (TIMESTAMP_OID, None, None),
+    "transaction_country": (1043, None, None),
+    "merchant_id": (23, None, None),
+    "transaction_channel": (1043, None, None),
+    "merchant_category": (1043, None, None),
+}
+
+# Mirrors the merchant_category_bits table of db/migrations/003_transaction_rollups.sql
+MERCHANT_CATEGORY_BITS = {
+    "Groceries": 0,
+    "Electronics": 1,
+    "Restaurants": 2,
+    "Travel": 3,
+    "Clothing": 4,
+    "Gift Cards": 5,
+    "Healthcare": 6,
+    "Other": 7,
+}
+
+_CENTS = Decimal("0.01")
+
+
+def _to_timestamp(value) -> datetime | None:
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+
+def _bucket_start(ts: datetime, grain: str) -> datetime:
+    # date_trunc('hour' | 'day', ts)
+    ts = ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0) if grain == "daily" else ts
+
+
+def _categories(bits: int) -> set[str]:
+    """Merchant categories set in a category_bits value."""
+    return {category for category, bit in MERCHANT_CATEGORY_BITS.items() if bits & (1 << bit)}
+
+
+def _to_numeric(value) -> Decimal | None:
+    # Same representation psycopg2 returns for NUMERIC(15,2)
+    return Decimal(str(value)).quantize(_CENTS) if value is not None else None
+
+
+class InMemoryTables:
+    """Table storage of InMemoryDatabaseManager. Managers sharing one instance see the same data."""
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Removes all rows and resets the id counters."""
+        with self.lock:
+            self.rows = {table: {} for table in [*TABLE_COLUMNS, "fraud_alerts"]}  # table -> {primary key: row}
+            self.last_ids = {table: 0 for table in [*ID_COLUMNS, "fraud_alerts"]}
+            self.transactions_by_user = {}  # user_id -> [row, ...]
+            self.transactions_by_device = {}  # device_id -> [row, ...]
+            self.devices_by_user = {}  # user_id -> [device_id, ...]
+            self.payment_methods_by_user = {}  # user_id -> [row, ...]
+
+
+# Default storage, so every manager created by create_database_manager() in a process works on the same tables
+SHARED_TABLES = InMemoryTables()
+
+
+class InMemoryDatabaseManager:
+    """
+    Drop-in replacement for DatabaseManager that keeps all tables in process memory. Meant for throughput benchmarks of
+    the generator, producer and streaming code without Postgres and network round trips. Methods have the same
+    arguments and return shapes as DatabaseManager (NUMERIC as Decimal, timestamps as datetime, transaction_ids as str).
+    Rollups are aggregated from the stored transactions on read and columnar fetches are converted from the history
+    rows, both with the types Postgres would return. The transactions table behaves like an unpartitioned table and
+    there are no connections (get_connection and establish_connection raise NotImplementedError).
+
+    Select it with DATABASE_BACKEND=memory and create_database_manager().
+    """
+    def __init__(
+            self,
+            pooled: bool = False,
+            min_connections: int | None = None,
+            max_connections: int | None = None,
+            cached: bool = False,
+            instrumented: bool = False,
+            tables: InMemoryTables | None = None,
+            seed: int | None = None,
+    ):
+        """
+        Args:
+            pooled (bool): Ignored, accepted for DatabaseManager compatibility.
+            min_connections (int | None): Ignored.
+            max_connections (int | None): Ignored.
+            cached (bool): Ignored, lookups are dict lookups already.
+            instrumented (bool): Whether to record per method metrics in self.metrics. Defaults to False.
+            tables (InMemoryTables | None): Storage to use. Defaults to None (the process wide SHARED_TABLES).
+            seed (int | None): Seed for fetch_random_user_id / fetch_random_device_id. Defaults to None.
+        """
+        self.tables = tables if tables is not None else SHARED_TABLES
+        self.pool = None
+        self.caches = {}
+        self.metrics = QueryMetrics() if instrumented else None
+        self._random = random.Random(seed)
+
+    def _next_id(self, table: str) -> int:
+        self.tables.last_ids[table] += 1
+        return self.tables.last_ids[table]
+
+    def _insert_row(self, table: str, row: dict) -> dict:
+        """Stores a row, assigning the serial id if it is missing. Caller holds the lock."""
+        rows = self.tables.rows[table]
+        if table == "transactions":
+            row["transaction_id"] = str(row.get("transaction_id") or uuid.uuid4())
+            key = row["transaction_id"]
+        else:
+            id_column = ID_COLUMNS.get(table, "alert_id")
+            if row.get(id_column) is None:
+                row[id_column] = self._next_id(table)
+            key = row[id_column]
+
+        if key in rows:
+            raise ValueError(f"Duplicate key {key} in {table}")
+        rows[key] = row
+
+        if table == "transactions":
+            self.tables.transactions_by_user.setdefault(row["user_id"], []).append(row)
+            self.tables.transactions_by_device.setdefault(row["device_id"], []).append(row)
+        elif table == "user_devices":
+            self.tables.devices_by_user.setdefault(row["user_id"], []).append(row["device_id"])
+        elif table == "payment_methods":
+            self.tables.payment_methods_by_user.setdefault(row["user_id"], []).append(row)
+
+        return row
+
+    def establish_connection(self):
+        raise NotImplementedError("InMemoryDatabaseManager has no database connections")
+
+    def get_connection(self):
+        raise NotImplementedError("InMemoryDatabaseManager has no database connections")
+
+    def pool_stats(self) -> dict | None:
+        return None
+
+    def cache_stats(self) -> dict:
+        return {}
+
+    def metrics_summary(self) -> dict | None:
+        return self.metrics.summary() if self.metrics is not None else None
+
+    def close(self) -> None:
+        pass
+
+    @_instrumented
+    def insert_user(self, user_data):
+        with self.tables.lock:
+            row = {column: user_data.get(column) for column in TABLE_COLUMNS["users"]}
+            row["user_id"] = None
+            row["created_at"] = _to_timestamp(row["created_at"])
+            return self._insert_row("users", row)["user_id"]
+
+    @_instrumented
+    def insert_device(self, user_device):
+        with self.tables.lock:
+            row = {
+                "device_id": None,
+                "user_id": user_device["user_id"],
+                "device_type": user_device["device_type"],
+                "first_used": _to_timestamp(user_device["first_used"]),
+                "last_used": _to_timestamp(user_device["last_used"]),
+            }
+            return self._insert_row("user_devices", row)["device_id"]
+
+    @staticmethod
+    def _payment_method_row(user_payment_method: dict) -> dict:
+        return {
+            "payment_method_id": None,
+            "user_id": user_payment_method["user_id"],
+            "payment_method": user_payment_method["payment_method"],
+            "payment_service_provider": user_payment_method["service_provider"],
+            "payment_is_active": user_payment_method["payment_is_active"],
+            "created_at": _to_timestamp(user_payment_method["created_at"]),
+        }
+
+    @_instrumented
+    def insert_payment_method(self, user_payment_method):
+        with self.tables.lock:
+            return self._insert_row("payment_methods", self._payment_method_row(user_payment_method))["payment_method_id"]
+
+    @_instrumented
+    def insert_payment_methods(self, payment_methods: list[dict], page_size: int = BULK_INSERT_PAGE_SIZE) -> list[int]:
+        with self.tables.lock:
+            return [self._insert_row("payment_methods", self._payment_method_row(pm))["payment_method_id"]
+                    for pm in payment_methods]
+
+    @_instrumented
+    def insert_merchant(self, merchant_data):
+        with self.tables.lock:
+            row = {
+                "merchant_id": None,
+                "merchant_name": merchant_data["name"],
+                "country": merchant_data["country"],
+                "rating": merchant_data["rating"],
+                "merchant_category": merchant_data["category"],
+            }
+            return self._insert_row("merchants", row)["merchant_id"]
+
+    @staticmethod
+    def _transaction_row(transaction: dict) -> dict:
+        row = {column: transaction.get(column) for column in TABLE_COLUMNS["transactions"]}
+        row["transaction_amount_local"] = _to_numeric(row["transaction_amount_local"])
+        row["transaction_amount_usd"] = _to_numeric(row["transaction_amount_usd"])
+        row["transaction_timestamp"] = _to_timestamp(row["transaction_timestamp"])
+        return row
+
+    @_instrumented
+    def insert_transaction(self, transaction_data):
+        with self.tables.lock:
+            row = self._transaction_row(transaction_data)
+            row["transaction_id"] = None  # Like the SQL version, the id is always generated
+            return self._insert_row("transactions", row)["transaction_id"]
+
+    @_instrumented
+    def insert_transactions(self, transactions: list[dict], page_size: int = BULK_INSERT_PAGE_SIZE) -> list[str]:
+        with self.tables.lock:
+            return [self._insert_row("transactions", self._transaction_row(t))["transaction_id"] for t in transactions]
+
+    def _insert_fraud_alert(self, alert: dict) -> int:
+        """Stores one alert. Caller holds the lock."""
+        row = {column: alert.get(column) for column in FRAUD_ALERT_COLUMNS}
+        row["alert_id"] = None
+        row["alerted_at"] = _to_timestamp(row["alerted_at"])
+        return self._insert_row("fraud_alerts", row)["alert_id"]
+
+    @_instrumented
+    def insert_fraud_alert(self, alert: dict) -> int:
+        with self.tables.lock:
+            return self._insert_fraud_alert(alert)
+
+    @_instrumented
+    def insert_fraud_alerts(self, alerts: list[dict], page_size: int = BULK_INSERT_PAGE_SIZE) -> list[int]:
+        with self.tables.lock:
+            return [self._insert_fraud_alert(alert) for alert in alerts]
+
+    @_instrumented
+    def fetch_active_payment_method(self, user_id):
+        with self.tables.lock:
+            active = [row for row in self.tables.payment_methods_by_user.get(user_id, []) if row["payment_is_active"] == 1]
+            return dict(min(active, key=lambda row: row["created_at"])) if active else None
+
+    @_instrumented
+    def fetch_payment_info(self, payment_id: int) -> dict:
+        with self.tables.lock:
+            row = self.tables.rows["payment_methods"].get(payment_id)
+            return dict(row) if row is not None else None
+
+    @_instrumented
+    def deactivate_payment_method(self, payment_id):
+        with self.tables.lock:
+            row = self.tables.rows["payment_methods"].get(payment_id)
+            if row is None:
+                return False
+            row["payment_is_active"] = 0
+            return True
+
+    @_instrumented
+    def fetch_all_merchant_ids(self):
+        with self.tables.lock:
+            return list(self.tables.rows["merchants"])
+
+    @_instrumented
+    def fetch_random_user_id(self) -> int:
+        with self.tables.lock:
+            user_ids = list(self.tables.rows["users"])
+            return self._random.choice(user_ids) if user_ids else None
+
+    @_instrumented
+    def fetch_random_device_id(self, user_id: int) -> int:
+        with self.tables.lock:
+            device_ids = self.tables.devices_by_user.get(user_id)
+            return self._random.choice(device_ids) if device_ids else None
+
+    @_instrumented
+    def fetch_user_device_ids(self, min_device_id: int = 0) -> list[tuple[int, int]]:
+        with self.tables.lock:
+            return sorted(
+                (row["user_id"], row["device_id"]) for row in self.tables.rows["user_devices"].values()
+                if row["device_id"] > min_device_id
+            )
+
+    def _history_rows(self, rows: list[dict], hours: int, columns: list[str], join_merchant: bool) -> list[dict]:
+        """Rows of the look back window, ordered by timestamp. Caller holds the lock."""
+        since = datetime.now() - timedelta(hours=hours)
+        merchants = self.tables.rows["merchants"]
+        history = []
+        for row in sorted(rows, key=lambda r: r["transaction_timestamp"]):
+            if row["transaction_timestamp"] < since:
+                continue
+            result = {column: row[column] for column in columns}
+            if join_merchant:
+                merchant = merchants.get(row["merchant_id"])
+                if merchant is None:
+                    continue  # Inner join semantics
+                result["merchant_category"] = merchant["merchant_category"]
+            history.append(result)
+
+        return history
+
+    def _user_history(self, user_id: int, hours: int) -> list[dict]:
+        with self.tables.lock:
+            rows = self.tables.transactions_by_user.get(user_id, [])
+            return self._history_rows(rows, hours, HISTORY_COLUMNS, join_merchant=True)
+
+    def _device_recent(self, device_id: int, hours: int) -> list[dict]:
+        with self.tables.lock:
+            rows = self.tables.transactions_by_device.get(device_id, [])
+            return self._history_rows(rows, hours, ["device_id", "transaction_timestamp"], join_merchant=False)
+
+    @_instrumented
+    def fetch_user_transaction_history(self, user_id: int, hours: int) -> list[dict]:
+        return self._user_history(user_id, hours)
+
+    @_instrumented
+    def fetch_device_recent_transactions(self, device_id: int, hours: int) -> list[dict]:
+        return self._device_recent(device_id, hours)
+
+    @_instrumented
+    def fetch_transaction_histories(
+            self,
+            user_ids: list[int],
+            hours: int,
+            device_ids: list[int] | None = None,
+    ) -> dict[str, dict[int, list[dict]]]:
+        with self.tables.lock:
+            return {
+                "user_id": {
+                    user_id: self._history_rows(self.tables.transactions_by_user.get(user_id, []), hours,
+                                                HISTORY_COLUMNS, join_merchant=True)
+                    for user_id in set(user_ids)
+                },
+                "device_id": {
+                    device_id: self._history_rows(self.tables.transactions_by_device.get(device_id, []), hours,
+                                                  HISTORY_COLUMNS, join_merchant=True)
+                    for device_id in set(device_ids or [])
+                },
+            }
+
+    @staticmethod
+    def _to_columns(rows: list[dict], columns: list[str], output: str):
+        """
+        Converts history rows with the description and NUMERIC handling of DatabaseManager._fetch_columns: floats for
+        'numpy', text for 'arrow' (cast to decimal128 by to_arrow_table).
+        """
+        if output not in COLUMNAR_OUTPUTS:
+            raise ValueError(f"Unknown columnar output '{output}', expected one of {COLUMNAR_OUTPUTS}")
+
+        description = [_Column(column, *HISTORY_COLUMN_TYPES[column]) for column in columns]
+        numeric = float if output == "numpy" else str
+        tuples = [
+            tuple(numeric(row[c.name]) if c.type_code == NUMERIC_OID and row[c.name] is not None else row[c.name]
+                  for c in description)
+            for row in rows
+        ]
+
+        if output == "numpy":
+            return to_numpy_columns(description, tuples)
+        return to_arrow_table(description, tuples)
+
+    @_instrumented
+    def fetch_user_transaction_history_columns(self, user_id: int, hours: int, output: str = "numpy"):
+        return self._to_columns(self._user_history(user_id, hours), [*HISTORY_COLUMNS, "merchant_category"], output)
+
+    @_instrumented
+    def fetch_device_recent_transactions_columns(self, device_id: int, hours: int, output: str = "numpy"):
+        return self._to_columns(self._device_recent(device_id, hours), ["device_id", "transaction_timestamp"], output)
+
+    @_instrumented
+    def fetch_transaction_histories_columns(
+            self,
+            user_ids: list[int],
+            hours: int,
+            device_ids: list[int] | None = None,
+            output: str = "numpy",
+    ):
+        with self.tables.lock:
+            # Rows of a requested user and a requested device are returned once, like the OR of HISTORIES_QUERY
+            rows = {}
+            for user_id in set(user_ids):
+                rows.update((row["transaction_id"], row) for row in self.tables.transactions_by_user.get(user_id, []))
+            for device_id in set(device_ids or []):
+                rows.update((row["transaction_id"], row) for row in self.tables.transactions_by_device.get(device_id, []))
+            history = self._history_rows(list(rows.values()), hours, HISTORY_COLUMNS, join_merchant=True)
+
+        return self._to_columns(history, [*HISTORY_COLUMNS, "merchant_category"], output)
+
+    @_instrumented
+    def fetch_merchant_info(self, merchant_id: int) -> dict:
+        with self.tables.lock:
+            row = self.tables.rows["merchants"].get(merchant_id)
+            return dict(row) if row is not None else None
+
+    @_instrumented_stream
+    def iter_user_transaction_history(self, user_id: int, hours: int, itersize: int = SERVER_CURSOR_ITERSIZE):
+        yield from self._user_history(user_id, hours)
+
+    @_instrumented_stream
+    def iter_device_recent_transactions(self, device_id: int, hours: int, itersize: int = SERVER_CURSOR_ITERSIZE):
+        yield from self._device_recent(device_id, hours)
+
+    @_instrumented_stream
+    def iter_transactions_for_replay(
+            self,
+            start: datetime | None = None,
+            end: datetime | None = None,
+            itersize: int = SERVER_CURSOR_ITERSIZE,
+    ):
+        with self.tables.lock:
+            payment_methods = dict(self.tables.rows["payment_methods"])
+            rows = sorted(
+                (row for row in self.tables.rows["transactions"].values()
+                 if (start is None or row["transaction_timestamp"] >= start)
+                 and (end is None or row["transaction_timestamp"] < end)),
+                key=lambda row: (row["transaction_timestamp"], str(row["transaction_id"])),
+            )
+
+        for row in rows:
+            payment = payment_methods.get(row["payment_id"], {})
+            yield {
+                **row,
+                "payment_created_at": payment.get("created_at"),
+                "payment_method": payment.get("payment_method"),
+                "payment_service_provider": payment.get("payment_service_provider"),
+            }
+
+    @_instrumented_stream
+    def iter_table(
+            self,
+            table_name: str,
+            columns: list[str] | None = None,
+            itersize: int = SERVER_CURSOR_ITERSIZE,
+            as_dict: bool = False,
+    ):
+        with self.tables.lock:
+            columns = columns or (TABLE_COLUMNS.get(table_name) or FRAUD_ALERT_COLUMNS)
+            rows = list(self.tables.rows[table_name].values())
+
+        for row in rows:
+            yield {column: row[column] for column in columns} if as_dict else tuple(row[column] for column in columns)
+
+    @_instrumented
+    def copy_rows(self, table_name: str, columns: list[str], rows: list[tuple]) -> int:
+        """Stores rows with explicit ids like COPY. Like in Postgres, id counters only move on sync_serial_sequence."""
+        with self.tables.lock:
+            for values in rows:
+                row = {column: None for column in TABLE_COLUMNS.get(table_name, FRAUD_ALERT_COLUMNS)}
+                row.update(zip(columns, values))
+                if table_name == "transactions":
+                    row = self._transaction_row(row)
+                self._insert_row(table_name, row)
+
+            return len(rows)
+
+    def _max_id(self, table_name: str, id_column: str) -> int:
+        with self.tables.lock:
+            return max((row[id_column] for row in self.tables.rows[table_name].values()), default=0)
+
+    @_instrumented
+    def fetch_max_id(self, table_name: str, id_column: str) -> int:
+        return self._max_id(table_name, id_column)
+
+    @_instrumented
+    def sync_serial_sequence(self, table_name: str, id_column: str) -> None:
+        with self.tables.lock:
+            self.tables.last_ids[table_name] = max(self.tables.last_ids[table_name], self._max_id(table_name, id_column))
+
+    def list_transaction_partitions(self) -> list[dict]:
+        return []
+
+    transaction_partition_name = staticmethod(DatabaseManager.transaction_partition_name)
+
+    def create_transaction_partitions(
+            self,
+            months_ahead: int = TRANSACTION_PARTITION_PARAMS["months_ahead"],
+            start: datetime | None = None,
+    ) -> list[str]:
+        return []
+
+    def detach_transaction_partitions(
+            self,
+            retention_months: int = TRANSACTION_PARTITION_PARAMS["retention_months"],
+            drop: bool = False,
+    ) -> list[str]:
+        return []
+
+    def detach_transaction_partition(self, name: str, drop: bool = False) -> None:
+        pass  # There are no partitions, archived months stay in the table
+
+    def _rollup_buckets(
+            self,
+            rows: list[dict],
+            grain: str,
+            since: datetime,
+            until: datetime | None = None,
+    ) -> dict[datetime, dict]:
+        """
+        Aggregates transactions into the buckets of the rollup tables of migration 003 that start between since and
+        until (open if None). Like the trigger, only transactions with a known merchant are counted and categories
+        without a bit in MERCHANT_CATEGORY_BITS don't set any bit. Caller holds the lock.
+        """
+        merchants = self.tables.rows["merchants"]
+        buckets = {}
+        for row in rows:
+            merchant = merchants.get(row["merchant_id"])
+            if merchant is None or row["transaction_timestamp"] is None:
+                continue
+            bucket_start = _bucket_start(row["transaction_timestamp"], grain)
+            if bucket_start < since or (until is not None and bucket_start > until):
+                continue
+
+            amount = row["transaction_amount_usd"] or Decimal(0)
+            bit = MERCHANT_CATEGORY_BITS.get(merchant["merchant_category"])
+            bucket = buckets.setdefault(bucket_start, {
+                "bucket_start": bucket_start, "transaction_count": 0, "amount_sum": Decimal(0),
+                "amount_sumsq": Decimal(0), "decline_count": 0, "category_bits": 0,
+            })
+            bucket["transaction_count"] += 1
+            bucket["amount_sum"] += amount
+            bucket["amount_sumsq"] += amount * amount
+            bucket["decline_count"] += int(row["transaction_status"] == "Declined")
+            bucket["category_bits"] |= (1 << bit) if bit is not None else 0
+
+        return buckets
+
+    def _last_transaction_timestamp(self, user_id: int, as_of: datetime) -> datetime | None:
+        """Caller holds the lock."""
+        return max(
+            (row["transaction_timestamp"] for row in self.tables.transactions_by_user.get(user_id, [])
+             if row["transaction_timestamp"] is not None and row["transaction_timestamp"] <= as_of),
+            default=None,
+        )
+
+    @_instrumented
+    def fetch_rollup_buckets(self, entity: str, entity_id: int, hours: int, grain: str = "hourly") -> list[dict]:
+        if (entity, grain) not in ROLLUP_TABLES:
+            raise ValueError(f"Unknown rollup '{entity}'/'{grain}', expected one of {list(ROLLUP_TABLES)}")
+
+        with self.tables.lock:
+            index = self.tables.transactions_by_user if entity == "user" else self.tables.transactions_by_device
+            since = _bucket_start(datetime.now() - timedelta(hours=hours), grain)
+            buckets = self._rollup_buckets(index.get(entity_id, []), grain, since)
+            return [buckets[bucket_start] for bucket_start in sorted(buckets)]
+
+    @_instrumented
+    def fetch_user_amount_aggregates(self, user_id: int, as_of: datetime | None = None) -> dict:
+        as_of = as_of or datetime.now()
+        with self.tables.lock:
+            rows = self.tables.transactions_by_user.get(user_id, [])
+            buckets = self._rollup_buckets(rows, "hourly", _bucket_start(as_of - timedelta(days=7), "hourly"), as_of)
+
+        aggregates = {}
+        for window, since in (("24h", _bucket_start(as_of - timedelta(hours=24), "hourly")), ("7d", None)):
+            window_buckets = [b for b in buckets.values() if since is None or b["bucket_start"] >= since]
+            aggregates[window] = _window_stats(*(
+                sum(b[column] for b in window_buckets)
+                for column in ("transaction_count", "amount_sum", "amount_sumsq", "decline_count")
+            ))
+
+        return aggregates
+
+    @_instrumented
+    def fetch_user_behavioral_aggregates(self, user_id: int, as_of: datetime | None = None) -> dict:
+        as_of = as_of or datetime.now()
+        with self.tables.lock:
+            rows = self.tables.transactions_by_user.get(user_id, [])
+            hourly = self._rollup_buckets(rows, "hourly", _bucket_start(as_of - timedelta(hours=24), "hourly"), as_of)
+            daily = self._rollup_buckets(rows, "daily", _bucket_start(as_of - timedelta(days=30), "daily"), as_of)
+            last_transaction_timestamp = self._last_transaction_timestamp(user_id, as_of)
+
+        hourly_bits, daily_bits = 0, 0
+        for bucket in hourly.values():
+            hourly_bits |= bucket["category_bits"]
+        for bucket in daily.values():
+            daily_bits |= bucket["category_bits"]
+
+        return {
+            "merchant_categories_24h": _categories(hourly_bits),
+            "merchant_categories_30d": _categories(daily_bits),
+            "transaction_count_24h": sum(bucket["transaction_count"] for bucket in hourly.values()),
+            "transaction_count_30d": sum(bucket["transaction_count"] for bucket in daily.values()),
+            "last_transaction_timestamp": last_transaction_timestamp,
+        }
+
+    @_instrumented
+    def fetch_users_rollup_aggregates(self, user_ids: list[int], as_of: datetime | None = None) -> dict[int, dict]:
+        as_of = as_of or datetime.now()
+        aggregates = {}
+        with self.tables.lock:
+            for user_id in set(user_ids):
+                rows = self.tables.transactions_by_user.get(user_id, [])
+                hourly = self._rollup_buckets(rows, "hourly", _bucket_start(as_of - timedelta(days=7), "hourly"),
+                                              as_of).values()
+                daily = self._rollup_buckets(rows, "daily", _bucket_start(as_of - timedelta(days=30), "daily"),
+                                             as_of).values()
+                daily_bits = 0
+                for bucket in daily:
+                    daily_bits |= bucket["category_bits"]
+
+                aggregates[user_id] = {
+                    "transaction_count_7d": sum(bucket["transaction_count"] for bucket in hourly),
+                    "amount_sum_7d": sum((bucket["amount_sum"] for bucket in hourly), Decimal(0)),
+                    "merchant_categories_30d": _categories(daily_bits),
+                    "last_transaction_timestamp": self._last_transaction_timestamp(user_id, as_of),
+                }
+
+        return aggregates
+
+    def explain_analyze(self, query: str, params: tuple | None = None) -> dict:
+        """
+        Returns a plan shaped like the EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) output of DatabaseManager, so EXPLAIN
+        reports run against this backend. There is no SQL engine, the query is not run and all timings are zero.
+        """
+        return {
+            "Plan": {"Node Type": "In-Memory Lookup", "Shared Hit Blocks": 0, "Shared Read Blocks": 0, "Plans": []},
+            "Planning Time": 0.0,
+            "Execution Time": 0.0,
+        }
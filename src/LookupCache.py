@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUTTLCache:
+    """
+    Thread-safe, size bounded cache with least recently used eviction and a time to live per entry. Used as read-through
+    cache for almost static reference rows (merchants, payment methods) in DatabaseManager.
+    """
+    _MISSING = object()
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 300.0):
+        """
+        Args:
+            max_size (int): Maximum number of entries before the least recently used one is evicted. Defaults to 10000.
+            ttl_seconds (float): Seconds after which an entry expires. Defaults to 300.
+        Raises:
+            ValueError: If max_size is smaller than 1 or ttl_seconds is not positive.
+        """
+        if max_size < 1 or ttl_seconds <= 0:
+            raise ValueError(f"Invalid cache config: max_size={max_size}, ttl_seconds={ttl_seconds}")
+
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value), most recently used last
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value for a key and marks it as recently used.
+
+        Args:
+            key: Cache key
+            default: Value returned on a miss. Defaults to None.
+        Returns:
+            The cached value or default if the key is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key, self._MISSING)
+            if entry is self._MISSING:
+                self._stats["misses"] += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def put(self, key, value) -> None:
+        """
+        Stores a value, evicting the least recently used entry if the cache is full.
+
+        Args:
+            key: Cache key
+            value: Value to cache
+        Returns:
+            None
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, key) -> None:
+        """Removes a key from the cache, if present."""
+        with self._lock:
+            if self._entries.pop(key, self._MISSING) is not self._MISSING:
+                self._stats["invalidations"] += 1
+
+    def clear(self) -> None:
+        """Removes all entries. Counters are kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of the cache counters.
+
+        Returns:
+            dict: size, max_size, hits, misses, hit_rate, evictions, expirations and invalidations
+        """
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                **self._stats,
+                "hit_rate": self._stats["hits"] / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,143 @@
+import hashlib
+from pathlib import Path
+
+from src.DatabaseManager import DatabaseManager
+
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "db" / "migrations"
+
+# Arbitrary key for pg_advisory_xact_lock, so two runners never apply the same migration concurrently
+MIGRATION_LOCK_KEY = 7314002
+
+
+class MigrationError(Exception):
+    """Exception raised when a migration file is invalid or an applied migration was modified afterwards."""
+    pass
+
+
+class MigrationRunner:
+    """
+    Applies versioned SQL migrations from db/migrations in order. Files are named '<version>_<name>.sql', e.g.
+    '001_hot_path_indexes.sql'. Applied versions are recorded in the schema_migrations table together with a checksum
+    of the file, every migration runs in its own transaction.
+    """
+    def __init__(self, dbm: DatabaseManager, migrations_dir: str | Path = MIGRATIONS_DIR):
+        self.dbm = dbm
+        self.migrations_dir = Path(migrations_dir)
+
+    def _discover(self) -> list[dict]:
+        """
+        Reads all migration files sorted by version.
+
+        Returns:
+            list[dict]: Migrations with keys version, name, path, sql, checksum
+        Raises:
+            MigrationError: If a file name has no numeric version or a version is used twice.
+        """
+        migrations = []
+        for path in sorted(self.migrations_dir.glob("*.sql")):
+            version, _, name = path.stem.partition("_")
+            if not version.isdigit():
+                raise MigrationError(f"Migration {path.name} has to start with a numeric version")
+            sql_text = path.read_text(encoding="utf-8")
+            migrations.append({
+                "version": int(version),
+                "name": name,
+                "path": path,
+                "sql": sql_text,
+                "checksum": hashlib.sha256(sql_text.encode("utf-8")).hexdigest(),
+            })
+
+        versions = [m["version"] for m in migrations]
+        if len(versions) != len(set(versions)):
+            raise MigrationError(f"Duplicate migration versions in {self.migrations_dir}")
+
+        return sorted(migrations, key=lambda m: m["version"])
+
+    def _ensure_table(self) -> None:
+        with self.dbm.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS schema_migrations (
+                        version integer PRIMARY KEY,
+                        name varchar(255),
+                        checksum varchar(64),
+                        applied_at timestamp DEFAULT NOW()
+                    );
+                """)
+                conn.commit()
+
+    def applied(self) -> dict[int, dict]:
+        """
+        Returns the migrations recorded in schema_migrations.
+
+        Returns:
+            dict[int, dict]: {version: {"name", "checksum", "applied_at"}}
+        """
+        self._ensure_table()
+        with self.dbm.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT version, name, checksum, applied_at FROM schema_migrations ORDER BY version;")
+                return {
+                    version: {"name": name, "checksum": checksum, "applied_at": applied_at}
+                    for version, name, checksum, applied_at in cursor.fetchall()
+                }
+
+    def status(self) -> list[dict]:
+        """
+        Lists every migration file and whether it is applied.
+
+        Returns:
+            list[dict]: Entries with keys version, name, applied, modified
+        """
+        applied = self.applied()
+        return [{
+            "version": m["version"],
+            "name": m["name"],
+            "applied": m["version"] in applied,
+            "modified": m["version"] in applied and applied[m["version"]]["checksum"] != m["checksum"],
+        } for m in self._discover()]
+
+    def apply(self) -> list[int]:
+        """
+        Applies all pending migrations in version order.
+
+        Returns:
+            list[int]: Versions that were applied in this run
+        Raises:
+            MigrationError: If an already applied migration file was modified.
+        """
+        applied = self.applied()
+        newly_applied = []
+
+        for migration in self._discover():
+            recorded = applied.get(migration["version"])
+            if recorded is not None:
+                if recorded["checksum"] != migration["checksum"]:
+                    raise MigrationError(f"Migration {migration['path'].name} was modified after it was applied. "
+                                         f"Add a new migration instead.")
+                continue
+
+            with self.dbm.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    try:
+                        cursor.execute("SELECT pg_advisory_xact_lock(%s);", (MIGRATION_LOCK_KEY,))
+                        # Another runner might have applied it while we waited for the lock
+                        cursor.execute("SELECT 1 FROM schema_migrations WHERE version = %s;", (migration["version"],))
+                        if cursor.fetchone() is None:
+                            cursor.execute(migration["sql"])
+                            cursor.execute(
+                                "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s);",
+                                (migration["version"], migration["name"], migration["checksum"])
+                            )
+                            newly_applied.append(migration["version"])
+                        conn.commit()
+
+                    except Exception as e:
+                        conn.rollback()
+                        print(f"Error applying migration {migration['path'].name}: {e}")
+                        raise
+
+            print(f"Applied migration {migration['path'].name}")
+
+        return newly_applied
@@ -0,0 +1,142 @@
+import json
+import threading
+
+
+# Upper bounds of the latency histogram buckets in seconds, the last bucket is +Inf
+LATENCY_BUCKETS_SECONDS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class QueryMetrics:
+    """
+    Thread-safe per method counters (calls, errors, rows returned) and latency histograms. Percentiles are estimated
+    from the fixed histogram buckets by linear interpolation, the same way Prometheus' histogram_quantile does it, so
+    memory stays constant no matter how many calls are recorded.
+    """
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS_SECONDS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._methods = {}
+
+    def record(self, method: str, seconds: float, rows: int = 0, error: bool = False) -> None:
+        """
+        Records one call.
+
+        Args:
+            method (str): Name of the called method
+            seconds (float): Call latency in seconds
+            rows (int): Rows returned by the call. Defaults to 0.
+            error (bool): Whether the call raised. Defaults to False.
+        Returns:
+            None
+        """
+        with self._lock:
+            entry = self._methods.get(method)
+            if entry is None:
+                entry = {
+                    "calls": 0,
+                    "errors": 0,
+                    "rows": 0,
+                    "total_seconds": 0.0,
+                    "max_seconds": 0.0,
+                    "bucket_counts": [0] * (len(self.buckets) + 1),
+                }
+                self._methods[method] = entry
+
+            entry["calls"] += 1
+            entry["errors"] += int(error)
+            entry["rows"] += rows
+            entry["total_seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            entry["bucket_counts"][self._bucket_index(seconds)] += 1
+
+    def _bucket_index(self, seconds: float) -> int:
+        for i, upper in enumerate(self.buckets):
+            if seconds <= upper:
+                return i
+        return len(self.buckets)
+
+    def _percentile(self, entry: dict, quantile: float) -> float:
+        """Estimates a latency percentile in seconds from the histogram buckets of one method."""
+        rank = quantile * entry["calls"]
+        cumulative = 0
+        for i, count in enumerate(entry["bucket_counts"]):
+            if count and cumulative + count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                # The +Inf bucket has no upper bound, the observed maximum is the best estimate
+                upper = self.buckets[i] if i < len(self.buckets) else entry["max_seconds"]
+                return min(lower + (upper - lower) * (rank - cumulative) / count, entry["max_seconds"])
+            cumulative += count
+        return entry["max_seconds"]
+
+    def summary(self) -> dict:
+        """
+        Returns the aggregated metrics per method.
+
+        Returns:
+            dict: {method: {"calls", "errors", "rows", "total_ms", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"}}
+        """
+        with self._lock:
+            return {
+                method: {
+                    "calls": entry["calls"],
+                    "errors": entry["errors"],
+                    "rows": entry["rows"],
+                    "total_ms": round(entry["total_seconds"] * 1000, 3),
+                    "mean_ms": round(entry["total_seconds"] / entry["calls"] * 1000, 3),
+                    "p50_ms": round(self._percentile(entry, 0.50) * 1000, 3),
+                    "p95_ms": round(self._percentile(entry, 0.95) * 1000, 3),
+                    "p99_ms": round(self._percentile(entry, 0.99) * 1000, 3),
+                    "max_ms": round(entry["max_seconds"] * 1000, 3),
+                }
+                for method, entry in sorted(self._methods.items())
+            }
+
+    def to_json(self, indent: int | None = 2) -> str:
+        """Returns summary() as JSON string."""
+        return json.dumps(self.summary(), indent=indent)
+
+    def to_prometheus(self, prefix: str = "fraud_db") -> str:
+        """
+        Returns the metrics in the Prometheus text exposition format: call, error and row counters plus a latency
+        histogram per method.
+
+        Args:
+            prefix (str): Metric name prefix. Defaults to 'fraud_db'.
+        Returns:
+            str: Prometheus text format
+        """
+        lines = []
+        with self._lock:
+            methods = sorted(self._methods.items())
+
+            # Samples of one metric family have to be grouped below its TYPE line
+            for name, key in (("calls_total", "calls"), ("errors_total", "errors"), ("rows_total", "rows")):
+                lines.append(f"# TYPE {prefix}_{name} counter")
+                for method, entry in methods:
+                    lines.append(f'{prefix}_{name}{{method="{method}"}} {entry[key]}')
+
+            lines.append(f"# TYPE {prefix}_latency_seconds histogram")
+            for method, entry in methods:
+                label = f'method="{method}"'
+                cumulative = 0
+                for upper, count in zip(self.buckets, entry["bucket_counts"]):
+                    cumulative += count
+                    lines.append(f'{prefix}_latency_seconds_bucket{{{label},le="{upper}"}} {cumulative}')
+                lines.append(f'{prefix}_latency_seconds_bucket{{{label},le="+Inf"}} {entry["calls"]}')
+                lines.append(f"{prefix}_latency_seconds_sum{{{label}}} {entry['total_seconds']}")
+                lines.append(f"{prefix}_latency_seconds_count{{{label}}} {entry['calls']}")
+
+        return "\n".join(lines) + "\n"
+
+    def format_summary(self) -> str:
+        """Returns summary() as a fixed width table for periodic console output."""
+        lines = [f"{'method':<36}{'calls':>9}{'rows':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'total ms':>12}"]
+        for method, entry in self.summary().items():
+            lines.append(f"{method:<36}{entry['calls']:>9}{entry['rows']:>10}{entry['p50_ms']:>10.2f}"
+                         f"{entry['p95_ms']:>10.2f}{entry['p99_ms']:>10.2f}{entry['total_ms']:>12.1f}")
+        return "\n".join(lines)
+
+    def reset(self) -> None:
+        """Clears all recorded metrics."""
+        with self._lock:
+            self._methods = {}
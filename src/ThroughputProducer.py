@@ -0,0 +1,106 @@
+import time
+
+from kafka import KafkaProducer
+
+from src.QueryMetrics import QueryMetrics
+from src.TokenBucket import TokenBucket
+from src.constants import KAFKA_PRODUCER_PARAMS, PRODUCER_RATE_PARAMS
+
+
+class ThroughputProducer:
+    """
+    Wraps one batched, compressed KafkaProducer for high volume publishing. send_batch never flushes: records are sent
+    asynchronously and their acknowledgements are recorded by callbacks, so the send latency (send() until broker ack)
+    and the failures end up in a QueryMetrics instance without blocking the caller. An optional TokenBucket holds a
+    target rate.
+    """
+    def __init__(
+            self,
+            topic: str,
+            events_per_second: float | None = None,
+            poisson: bool = False,
+            burst_seconds: float = PRODUCER_RATE_PARAMS["burst_seconds"],
+            seed: int | None = None,
+            **producer_overrides,
+    ):
+        """
+        Args:
+            topic (str): Topic every record is sent to
+            events_per_second (float | None): Target rate. Defaults to None (as fast as possible).
+            poisson (bool): Poisson arrivals instead of evenly spaced sends, see TokenBucket. Defaults to False.
+            burst_seconds (float): Burst allowance of the TokenBucket
+            seed (int | None): Seed for the Poisson gaps. Defaults to None.
+            **producer_overrides: KafkaProducer arguments that replace the KAFKA_PRODUCER_PARAMS defaults
+        """
+        self.topic = topic
+        self.bucket = TokenBucket(events_per_second, burst_seconds, poisson, seed) if events_per_second else None
+        self.metrics = QueryMetrics()
+        self._producer = KafkaProducer(**{**KAFKA_PRODUCER_PARAMS, **producer_overrides})
+
+        self._started = time.monotonic()
+        self._last_report = (self._started, 0)  # (time, sent) of the previous report
+        self.sent = 0
+
+    def _on_ack(self, sent_at: float, record_metadata) -> None:
+        self.metrics.record("kafka_send", time.perf_counter() - sent_at, rows=1)
+
+    def _on_error(self, sent_at: float, exception) -> None:
+        self.metrics.record("kafka_send", time.perf_counter() - sent_at, error=True)
+
+    def send_batch(self, messages: list[bytes], keys: list[bytes] | None = None) -> None:
+        """
+        Waits for the rate limiter (if any) and hands the messages to the producer's buffer.
+
+        Args:
+            messages (list[bytes]): Serialized record values
+            keys (list[bytes] | None): Record keys, e.g. the user id to keep a user's records in one partition.
+            Defaults to None (round robin).
+        Returns:
+            None
+        """
+        if self.bucket is not None:
+            self.bucket.acquire(len(messages))
+
+        keys = keys if keys is not None else [None] * len(messages)
+        for key, message in zip(keys, messages):
+            sent_at = time.perf_counter()
+            future = self._producer.send(self.topic, value=message, key=key)
+            future.add_callback(self._on_ack, sent_at)
+            future.add_errback(self._on_error, sent_at)
+        self.sent += len(messages)
+
+    def report(self) -> dict:
+        """
+        Returns the achieved send rate since the previous report and over the whole run plus the send latencies.
+
+        Returns:
+            dict: sent, acked, errors, interval_rate, total_rate and p50/p95/p99/max send latency in ms
+        """
+        now = time.monotonic()
+        last_time, last_sent = self._last_report
+        self._last_report = (now, self.sent)
+
+        send = self.metrics.summary().get("kafka_send", {})
+        return {
+            "sent": self.sent,
+            "acked": send.get("rows", 0),
+            "errors": send.get("errors", 0),
+            "interval_rate": round((self.sent - last_sent) / max(now - last_time, 1e-9), 1),
+            "total_rate": round(self.sent / max(now - self._started, 1e-9), 1),
+            "p50_ms": send.get("p50_ms", 0.0),
+            "p95_ms": send.get("p95_ms", 0.0),
+            "p99_ms": send.get("p99_ms", 0.0),
+            "max_ms": send.get("max_ms", 0.0),
+        }
+
+    def format_report(self) -> str:
+        """Returns report() as one line for periodic console output."""
+        stats = self.report()
+        return (f"sent {stats['sent']} (acked {stats['acked']}, errors {stats['errors']}) | "
+                f"{stats['interval_rate']:.1f} msg/s now, {stats['total_rate']:.1f} msg/s avg | "
+                f"send latency p50 {stats['p50_ms']:.1f} ms, p95 {stats['p95_ms']:.1f} ms, p99 {stats['p99_ms']:.1f} ms")
+
+    def close(self) -> None:
+        """Flushes all buffered records (their callbacks are recorded) and closes the producer."""
+        self._producer.flush()
+        self._producer.close()
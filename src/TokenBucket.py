@@ -0,0 +1,61 @@
+import time
+
+import numpy as np
+
+
+class TokenBucket:
+    """
+    Paces events to a target rate. Implemented as virtual scheduling (GCRA), which is equivalent to a token bucket with
+    a capacity of rate * burst_seconds tokens: every acquire books the next slot after the previously booked one and
+    waits until its slot has started. Slots are kept on an absolute schedule, so time spent between acquires (e.g.
+    generating the events) doesn't reduce the achieved rate the way a fixed sleep per event does.
+
+    With poisson=True the gaps between events are exponentially distributed (Poisson arrivals) with the same mean rate
+    instead of constant.
+    """
+    def __init__(self, rate: float, burst_seconds: float = 0.1, poisson: bool = False, seed: int | None = None):
+        """
+        Args:
+            rate (float): Target events per second
+            burst_seconds (float): How far the schedule may lag behind the clock after an idle period, i.e. how many
+            seconds of events can be sent at once. Defaults to 0.1.
+            poisson (bool): Exponentially distributed gaps instead of constant ones. Defaults to False.
+            seed (int | None): Seed for the Poisson gaps. Defaults to None.
+        Raises:
+            ValueError: If rate is not positive or burst_seconds is negative.
+        """
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive, got {rate}")
+        if burst_seconds < 0:
+            raise ValueError(f"burst_seconds must not be negative, got {burst_seconds}")
+
+        self.rate = rate
+        self.burst_seconds = burst_seconds
+        self.poisson = poisson
+        self._rng = np.random.default_rng(seed)
+        self._next_slot = time.monotonic()
+
+    def acquire(self, tokens: int = 1) -> float:
+        """
+        Blocks until tokens events may be sent.
+
+        Args:
+            tokens (int): Number of events. Defaults to 1.
+        Returns:
+            float: Seconds waited
+        """
+        if tokens <= 0:
+            return 0.0
+
+        # Sum of `tokens` exponential gaps is gamma distributed, one draw for the whole batch
+        gap = self._rng.gamma(tokens, 1.0 / self.rate) if self.poisson else tokens / self.rate
+
+        now = time.monotonic()
+        slot = max(self._next_slot, now - self.burst_seconds)
+        self._next_slot = slot + gap
+
+        wait = slot - now
+        if wait > 0:
+            time.sleep(wait)
+            return wait
+        return 0.0
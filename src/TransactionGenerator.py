@@ -1,5 +1,3 @@
-import random
-import math
 from datetime import datetime
 from datetime import timedelta
 from dataclasses import dataclass, asdict
@@ -10,7 +8,17 @@ import src.utility as util
 import src.constants as const
 
 from src.DataGenerator import PaymentMethodGenerator
-from src.DatabaseManager import DatabaseManager
+from src.DatabaseManager import DatabaseManager, create_database_manager
+from src.EntityStateStore import EntityStateStore
+
+
+# Trapezoidal distribution for mid level spending: the floor value is 1/TRAPEZOID_FLOOR_RATIO (5x) times more likely
+# than the ceil
+TRAPEZOID_FLOOR_RATIO = 0.2
+
+# 1% probability at 5 mil for high level spending --> calculate scale: P(x) = exp[-(x-min)/scale]
+# scale = -(x-min) / ln(P(x)) =(approx) 1,083,564
+EXP_SPENDING_SCALE = 1083564
 
 
 @dataclass
@@ -27,12 +35,40 @@ class TransactionContext:
         transaction_channel: str | None = None
         transaction_cluster: str | None = None
         payment_id: int | None = None
+        # Metadata of the payment method, emitted with every transaction so consumers don't have to look it up
+        payment_method: str | None = None
+        payment_service_provider: str | None = None
+        payment_created_at: datetime | None = None
         transaction_status: str | None = None
         transaction_timestamp: datetime | None = None
 
 
 class TransactionGenerator:
-    def __init__(self, conversion_rates, fraud_rate=0.01):
+    def __init__(
+            self,
+            conversion_rates,
+            fraud_rate=0.01,
+            db_manager: DatabaseManager | EntityStateStore | None = None,
+            offline: bool = False,
+            id_offsets: dict | None = None,
+            seed: int | None = None,
+    ):
+        """
+        Args:
+            conversion_rates (dict): Conversion rates from CurrencyConvertor
+            fraud_rate (float): Share of fraudulent patterns. Defaults to 0.01.
+            db_manager (DatabaseManager | EntityStateStore | None): Manager for payment method lookups and writes.
+                Defaults to None (a new manager of the configured backend).
+            offline (bool): Keep payment methods in a new EntityStateStore (self.DBM) with locally assigned ids
+                instead of the database. Generated entities and transactions can be added to that store and exported
+                with drain(). Defaults to False.
+            id_offsets (dict | None): Last used id per table for the offline store, e.g. the current MAX(id) in
+                Postgres if the export will be loaded into an existing database. Defaults to None (ids start at 1).
+            seed (int | None): Seed of the numpy Generator behind all weighted draws, amounts and inter-arrival
+                times (and of the transaction UUIDs in offline mode). Defaults to None (fresh entropy).
+        Raises:
+            ValueError: If offline is combined with a db_manager.
+        """
         # Set conversion rates
         self.conversion_rates = conversion_rates
 
@@ -41,11 +77,54 @@ class TransactionGenerator:
 
         # Transaction cluster amount definitions and weighting --> Values inside each cluster will have unique weighting
         self.transaction_cluster_data = const.TRANSACTION_CLUSTER_DATA
-        self.transaction_clusters, self.transaction_cluster_weights = util.unpack_weighted_dict(self.transaction_cluster_data)
         self.cluster_probability_distributions = [value["distribution_function"] for value in self.transaction_cluster_data.values()]
 
+        # Weighted samplers are built once, all of them draw from the same seeded generator
+        self.rng = np.random.default_rng(seed)
+        self.cluster_sampler = util.WeightedSampler.from_weighted_dict(self.transaction_cluster_data, rng=self.rng)
+        self.country_sampler = util.WeightedSampler.from_weighted_dict(const.COUNTRY_DATA, rng=self.rng)
+        self.currency_sampler = util.WeightedSampler(
+            [value["currency"] for value in const.COUNTRY_DATA.values()], self.country_sampler.weights, rng=self.rng)
+        self.fraud_type_sampler = util.WeightedSampler.from_weighted_dict(const.FRAUD_TYPE_DATA, rng=self.rng)
+        self.transaction_type_sampler = util.WeightedSampler(
+            ["fraudulent", "normal"], [self.fraud_rate, 1 - self.fraud_rate], rng=self.rng)
+        self.channel_sampler = util.WeightedSampler(
+            [const.ONLINE_TX_CHANNEL, const.LOCAL_TX_CHANNEL], [0.7, 0.3], rng=self.rng)
+        self.normal_status_sampler = util.WeightedSampler([const.DECLINED, const.APPROVED], [0.02, 0.98], rng=self.rng)
+        # Invalid approved rates are rejected in _determine_transaction_status
+        self.fraud_status_samplers = {
+            fraud_type: util.WeightedSampler(
+                [const.DECLINED, const.APPROVED], [1 - data["transaction_approved_rate"], data["transaction_approved_rate"]],
+                rng=self.rng)
+            for fraud_type, data in const.FRAUD_TYPE_DATA.items() if 0 <= data["transaction_approved_rate"] <= 1
+        }
+
         self.PMG = PaymentMethodGenerator()
-        self.DBM = DatabaseManager()
+        if offline and db_manager is not None:
+            raise ValueError("Offline TransactionGenerator creates its own EntityStateStore, don't pass a db_manager")
+
+        # Allow sharing a (pooled) DatabaseManager with the caller instead of opening separate connections
+        if offline:
+            self.DBM = EntityStateStore(id_offsets=id_offsets, seed=seed)
+        else:
+            self.DBM = db_manager if db_manager is not None else create_database_manager()
+
+    @staticmethod
+    def _assign_payment_method(transaction_context: TransactionContext, payment_method: dict) -> None:
+        """
+        Sets the payment id and the payment method metadata of a transaction context.
+
+        Args:
+            transaction_context (TransactionContext): Context of the transaction that uses the payment method
+            payment_method (dict): payment_methods row with payment_method_id, payment_method, payment_service_provider
+            and created_at (as returned by fetch_active_payment_method)
+        Returns:
+            None
+        """
+        transaction_context.payment_id = payment_method["payment_method_id"]
+        transaction_context.payment_method = payment_method["payment_method"]
+        transaction_context.payment_service_provider = payment_method["payment_service_provider"]
+        transaction_context.payment_created_at = payment_method["created_at"]
 
     def _get_active_payment_method(self, user_id: int, payment_creation: datetime) -> dict:
         """
@@ -67,8 +146,109 @@ class TransactionGenerator:
 
         return active_payment_method
 
-    @staticmethod
+    # Vectorized sampling, the per-transaction methods below draw through these as well
+
+    def sample_transaction_clusters(self, n: int) -> np.ndarray:
+        """
+        Draws n transaction clusters weighted by TRANSACTION_CLUSTER_DATA.
+
+        Args:
+            n (int): Number of clusters to draw
+        Returns:
+            np.ndarray: Cluster names (keys of TRANSACTION_CLUSTER_DATA)
+        """
+        return self.cluster_sampler.sample_batch(n)
+
+    def sample_transaction_amounts_dollar(self, clusters) -> np.ndarray:
+        """
+        Draws one dollar amount per cluster from the distribution function of that cluster, one vectorized draw per
+        distinct cluster.
+
+        Args:
+            clusters (array-like): Cluster name per amount, e.g. from sample_transaction_clusters
+        Returns:
+            np.ndarray: float64 amounts in dollars, rounded to two decimal places
+        Raises:
+            ValueError: If the cluster distribution_function set in const.TRANSACTION_CLUSTER_DATA is not in {'random', 'trapezoidal', 'exp'}
+        """
+        clusters = np.asarray(clusters)
+        amounts = np.empty(clusters.shape, dtype="float64")
+
+        for cluster in np.unique(clusters):
+            mask = clusters == cluster
+            n = int(mask.sum())
+            cluster_min = self.transaction_cluster_data[cluster]["min"]
+            cluster_max = self.transaction_cluster_data[cluster]["max"]
+            cluster_distribution_func = self.transaction_cluster_data[cluster]["distribution_function"]
+
+            # For low and mini level spending all values have same probability, no real need for a prob. dist. with low amounts
+            if cluster_distribution_func == "random":
+                amounts[mask] = self.rng.uniform(cluster_min, cluster_max, size=n)
+
+            # Trapezoidal distribution for mid level spending (inverse CDF), most amounts around max-min / 2
+            elif cluster_distribution_func == "trapezoidal":
+                u = self.rng.random(size=n)
+                sample_scaled = (1 - np.sqrt(1 - u * (1 - TRAPEZOID_FLOOR_RATIO ** 2))) / (1 - TRAPEZOID_FLOOR_RATIO)
+                amounts[mask] = cluster_min + (cluster_max - cluster_min) * sample_scaled
+
+            elif cluster_distribution_func == "exp":
+                amounts[mask] = np.minimum(self.rng.exponential(scale=EXP_SPENDING_SCALE, size=n) + cluster_min, cluster_max)
+
+            else:
+                raise ValueError(f"{cluster_distribution_func} is an invalid distribution function. "
+                                 f"Only {self.cluster_probability_distributions} are available!")
+
+        return np.round(amounts, 2)
+
+    def sample_transaction_currencies(self, n: int) -> np.ndarray:
+        """
+        Draws n transaction currencies weighted by the country weights in COUNTRY_DATA.
+
+        Args:
+            n (int): Number of currencies to draw
+        Returns:
+            np.ndarray: Currency codes
+        """
+        return self.currency_sampler.sample_batch(n)
+
+    def convert_to_local_currency(self, usd_amounts, currencies, conversion_rates: dict | None = None) -> np.ndarray:
+        """
+        Converts dollar amounts into their local currencies.
+
+        Args:
+            usd_amounts (array-like): Amounts in dollars
+            currencies (array-like | str): Currency per amount or one currency for all amounts
+            conversion_rates (dict | None): Raw or lean conversion rates, see CurrencyConvertor. Defaults to None
+            (conversion rates set in init).
+        Returns:
+            np.ndarray: float64 amounts in the local currencies, rounded to two decimal places
+        """
+        # Conversion rates can be of "lean" format {"currency" : "rate"}, see CurrencyConvertor Class
+        active_conversion_rates = conversion_rates or self.conversion_rates
+        rates = active_conversion_rates.get("conversion_rates", active_conversion_rates)
+
+        usd_amounts = np.asarray(usd_amounts, dtype="float64")
+        currencies = np.broadcast_to(np.asarray(currencies), usd_amounts.shape)
+        unique_currencies, inverse = np.unique(currencies, return_inverse=True)
+        factors = np.array([rates[currency] for currency in unique_currencies.tolist()], dtype="float64")
+
+        return np.round(usd_amounts * factors[inverse.reshape(usd_amounts.shape)], 2)
+
+    def sample_inter_arrival_seconds(self, n: int, min_seconds: float, max_seconds: float) -> np.ndarray:
+        """
+        Draws n uniform times between consecutive transactions. util.timestamps_from_deltas turns them into timestamps.
+
+        Args:
+            n (int): Number of deltas to draw
+            min_seconds (float): Lower bound in seconds
+            max_seconds (float): Upper bound in seconds
+        Returns:
+            np.ndarray: float64 deltas in seconds
+        """
+        return self.rng.uniform(min_seconds, max_seconds, size=n)
+
     def _determine_transaction_status(
+            self,
             is_fraudulent: bool,
             fraud_type: str | None = None,
             usd_amount: float | None = None,
@@ -98,13 +278,7 @@ class TransactionGenerator:
             set_approved_rate = const.FRAUD_TYPE_DATA[fraud_type]["transaction_approved_rate"] # Get the rates from constants
             if set_approved_rate > 1:
                 raise ValueError(f"Approved rate cannot be above 1, got {set_approved_rate}")
-            transaction_status = random.choices(
-                population=[const.DECLINED, const.APPROVED],
-                weights=[1-set_approved_rate, set_approved_rate],
-                k=1
-            )[0]
-
-            return transaction_status
+            return self.fraud_status_samplers[fraud_type].sample()
 
         if payment_method is None or usd_amount is None:
             raise ValueError("Payment method and amount cannot be None for non-fraudulent transactions.")
@@ -117,13 +291,7 @@ class TransactionGenerator:
                 return const.APPROVED
             return const.DECLINED
 
-        transaction_status = random.choices(
-                population=[const.DECLINED, const.APPROVED],
-                weights=[0.02, 0.98],
-                k=1
-            )[0]
-
-        return transaction_status
+        return self.normal_status_sampler.sample()
 
 
 
@@ -137,21 +305,12 @@ class TransactionGenerator:
             str : Type of fraud, if fraud has been selected, else None
         """
         # Choose transaction type first
-        transaction_type = random.choices(
-            population=["fraudulent", "normal"],
-            weights=[self.fraud_rate, 1 - self.fraud_rate],
-            k=1
-        )[0]
+        transaction_type = self.transaction_type_sampler.sample()
         fraudulent_indicator = 0 if transaction_type == "normal" else 1
 
         # Choose fraud type (if applicable) second
         if fraudulent_indicator:
-            fraud_types, fraud_weights = util.unpack_weighted_dict(const.FRAUD_TYPE_DATA)
-            fraud_type = random.choices(
-                population=fraud_types,
-                weights=fraud_weights,
-                k=1
-            )[0]
+            fraud_type = self.fraud_type_sampler.sample()
         else:
             fraud_type = None
 
@@ -175,35 +334,9 @@ class TransactionGenerator:
         """
         # Set or randomly select a transaction cluster that will be our spending range
         if transaction_context.transaction_cluster is None:
-            transaction_context.transaction_cluster = random.choices(
-                self.transaction_clusters, weights=self.transaction_cluster_weights, k=1)[0]
-
-
-        # Extract corresponding spending range and the distribution function
-        cluster_min = self.transaction_cluster_data[transaction_context.transaction_cluster]["min"]
-        cluster_max = self.transaction_cluster_data[transaction_context.transaction_cluster]["max"]
-        cluster_distribution_func = self.transaction_cluster_data[transaction_context.transaction_cluster]["distribution_function"]
-
-        # For low and mini level spending all values have same probability, no real need for a prob. dist. with low amounts
-        if cluster_distribution_func == "random":
-            transaction_amount_dollar = round(random.uniform(cluster_min, cluster_max), 2)
-
-        # Trapezoidal distribution for mid level spending, most amounts around max-min / 2,
-        elif cluster_distribution_func == "trapezoidal":
-            floor_ratio = 0.2  # floor value 1/floor_ratio (5x) times more likely than ceil.
-            u = random.random()
-            sample_scaled = (1 - math.sqrt(1 - u * (1 - floor_ratio ** 2))) / (1 - floor_ratio)
-            transaction_amount_dollar = round(cluster_min + (cluster_max - cluster_min) * sample_scaled, 2)
+            transaction_context.transaction_cluster = str(self.sample_transaction_clusters(1)[0])
 
-        elif cluster_distribution_func == "exp":
-            # 1% probability at 5 mil --> calculate scale: P(x) = exp[-(x-min)/scale]
-            # scale = -(x-min) / ln(P(x)) =(approx) 1,083,564
-            scale = 1083564
-            transaction_amount_dollar = round(min((np.random.exponential(scale=scale) + cluster_min), cluster_max), 2)
-
-        else:
-            raise ValueError(f"{cluster_distribution_func} is an invalid distribution function. "
-                             f"Only {self.cluster_probability_distributions} are available!")
+        transaction_amount_dollar = float(self.sample_transaction_amounts_dollar([transaction_context.transaction_cluster])[0])
 
         return transaction_amount_dollar, transaction_context
 
@@ -228,28 +361,17 @@ class TransactionGenerator:
             float: The generated transaction amount in usd.
             TransactionContext: Updated TransactionContext object.
         """
-        # Get current conversion rates, or fallback to initial conversion rates
-        active_conversion_rates = conversion_rates or self.conversion_rates
-
         if transaction_context.transaction_currency is None:
-            # Validate currency weights and select a transaction currency
-            currencies = [value["currency"] for value in const.COUNTRY_DATA.values()]
-            _, currency_weights = util.unpack_weighted_dict(const.COUNTRY_DATA)
-            transaction_context.transaction_currency = random.choices(currencies, weights=currency_weights, k=1)[0]
+            transaction_context.transaction_currency = str(self.sample_transaction_currencies(1)[0])
 
         if set_transaction_amount_dollar is None:
             dollar_amount, transaction_context = self._generate_transaction_amount_dollar(transaction_context)
         else:
             dollar_amount = set_transaction_amount_dollar # Allow for specific transaction amounts, needed for pattern generation
 
-        # I do try and except here because the active_conversion_rate variable can be of "lean" format, see
-        # CurrencyConvertor Class. Basically lean looks like this {"currency" : "rate"} and not
-        # like this {"conversion_rates" : {"currency" : "rate"}}
-        # TODO: Think about a function that does this.
-        try:
-            transaction_amount_local_currency = round(active_conversion_rates["conversion_rates"][transaction_context.transaction_currency] * dollar_amount, 2)
-        except KeyError:
-            transaction_amount_local_currency = round(active_conversion_rates[transaction_context.transaction_currency] * dollar_amount, 2)
+        # Falls back to the initial conversion rates if no current ones are given
+        transaction_amount_local_currency = float(self.convert_to_local_currency(
+            [dollar_amount], transaction_context.transaction_currency, conversion_rates)[0])
 
         return transaction_amount_local_currency, dollar_amount, transaction_context
 
@@ -318,7 +440,8 @@ class TransactionGenerator:
             as initial conversion rates are set in class attribute.
         Returns:
             List[dict]: List of transactions in the pattern. List entries are dictionaries with the relevant information
-            for the specific transaction
+            for the specific transaction, including the metadata of the used payment method (payment_method,
+            payment_service_provider, payment_created_at)
 
         Raises:
             ValueError: For unrecognized fraud types.
@@ -337,24 +460,25 @@ class TransactionGenerator:
         transaction_start_time = pattern_start_time
 
         if not fraudulent_transaction_classifier:
-            target_successful_transactions = random.randint(1, 3)
+            target_successful_transactions = int(self.rng.integers(1, 3, endpoint=True))
             successful_transactions = 0
             transaction_pattern = []
 
             # Fixed transaction channel as it is unlikely to buy something in the store while also buying sth online
-            transaction_channel = random.choices([const.ONLINE_TX_CHANNEL, const.LOCAL_TX_CHANNEL], [0.7, 0.3])[0]
+            transaction_channel = self.channel_sampler.sample()
             TC.transaction_channel = transaction_channel
 
             while successful_transactions < target_successful_transactions:
-                transaction_delta_seconds = random.uniform(
+                transaction_delta_seconds = float(self.sample_inter_arrival_seconds(
+                    1,
                     const.NORMAL_TRANSACTION_DATA["min_time_seconds"],
                     const.NORMAL_TRANSACTION_DATA["max_time_seconds"]
-                )
+                )[0])
                 transaction_start_time = transaction_start_time + timedelta(seconds=transaction_delta_seconds)
                 TC.transaction_timestamp = transaction_start_time
 
                 active_payment_method = self._get_active_payment_method(user_id=user_id, payment_creation=transaction_start_time)
-                TC.payment_id = active_payment_method["payment_method_id"]
+                self._assign_payment_method(TC, active_payment_method)
 
                 local_amount, usd_amount, TC = self._generate_transaction_amount_local_currency(TC)
                 TC.transaction_status = self._determine_transaction_status(False, payment_method=active_payment_method, usd_amount=usd_amount)
@@ -373,24 +497,32 @@ class TransactionGenerator:
 
         min_transactions = const.FRAUD_TYPE_DATA[fraud_type]["min_transactions"]
         max_transactions = const.FRAUD_TYPE_DATA[fraud_type]["max_transactions"]
-        number_of_transactions_in_pattern = random.randint(min_transactions, max_transactions)
+        number_of_transactions_in_pattern = int(self.rng.integers(min_transactions, max_transactions, endpoint=True))
 
         if fraud_type == "Card Probing":
             transaction_pattern = []
 
-            for k in range(number_of_transactions_in_pattern):
-                # Between 30 and 90 seconds per attempt, putting in new card numbers and pin
-                # Vary in each iteration to make it more dynamics
-                time_delta_seconds = random.uniform(
-                    const.FRAUD_TYPE_DATA[fraud_type]["min_time_seconds"],
-                    const.FRAUD_TYPE_DATA[fraud_type]["max_time_seconds"]
-                )
+            # Between 30 and 90 seconds per attempt, putting in new card numbers and pin
+            # Vary in each iteration to make it more dynamics. Timestamps and amounts of the whole pattern in one draw.
+            transaction_timestamps = util.timestamps_from_deltas(transaction_start_time, self.sample_inter_arrival_seconds(
+                number_of_transactions_in_pattern,
+                const.FRAUD_TYPE_DATA[fraud_type]["min_time_seconds"],
+                const.FRAUD_TYPE_DATA[fraud_type]["max_time_seconds"]
+            ))
+            usd_amounts = self.sample_transaction_amounts_dollar(np.full(number_of_transactions_in_pattern, TC.transaction_cluster))
+            local_amounts = self.convert_to_local_currency(usd_amounts, TC.transaction_currency, conversion_rates)
 
-                transaction_start_time = transaction_start_time + timedelta(seconds=time_delta_seconds)
+            for k in range(number_of_transactions_in_pattern):
+                transaction_start_time = transaction_timestamps[k]
                 TC.transaction_timestamp = transaction_start_time
 
                 payment_method_info = self.PMG.generate_payment_method(user_id, generated_at=transaction_start_time) # Create new payment method for user
-                TC.payment_id = self.DBM.insert_payment_method(payment_method_info)
+                self._assign_payment_method(TC, {
+                    "payment_method_id": self.DBM.insert_payment_method(payment_method_info),
+                    "payment_method": payment_method_info["payment_method"],
+                    "payment_service_provider": payment_method_info["service_provider"],
+                    "created_at": payment_method_info["created_at"],
+                })
 
                 # Choose random transaction status
                 TC.transaction_status = self._determine_transaction_status(True, "Card Probing")
@@ -398,14 +530,9 @@ class TransactionGenerator:
                 if TC.transaction_status == const.DECLINED:
                     self.DBM.deactivate_payment_method(TC.payment_id)
 
-                local_currency_amount, usd_amount, TC = self._generate_transaction_amount_local_currency(
-                    transaction_context=TC,
-                    conversion_rates=conversion_rates
-                )
-
                 # Generate a small amount in each transaction
                 transaction_data = self._generate_full_single_transaction_data(
-                    transaction_context=TC, local_amount=local_currency_amount, usd_amount=usd_amount)
+                    transaction_context=TC, local_amount=float(local_amounts[k]), usd_amount=float(usd_amounts[k]))
                 transaction_pattern.append(transaction_data)
 
             return transaction_pattern
@@ -415,26 +542,26 @@ class TransactionGenerator:
             transaction_pattern = []
 
             active_payment_method = self._get_active_payment_method(user_id=user_id, payment_creation=transaction_start_time)
-            TC.payment_id = active_payment_method["payment_method_id"]
+            self._assign_payment_method(TC, active_payment_method)
 
             local_amount, usd_amount, TC = self._generate_transaction_amount_local_currency(
                 transaction_context=TC, conversion_rates=conversion_rates)
 
-            for k in range(number_of_transactions_in_pattern):
-                # Between 0.5 and 1 seconds per attempt, botting repeatedly
-                # Vary in each iteration to make it more dynamics
-                time_delta_seconds = random.uniform(
-                    const.FRAUD_TYPE_DATA[fraud_type]["min_time_seconds"],
-                    const.FRAUD_TYPE_DATA[fraud_type]["max_time_seconds"]
-                )
+            # Between 0.5 and 1 seconds per attempt, botting repeatedly
+            # Vary in each iteration to make it more dynamics
+            transaction_timestamps = util.timestamps_from_deltas(transaction_start_time, self.sample_inter_arrival_seconds(
+                number_of_transactions_in_pattern,
+                const.FRAUD_TYPE_DATA[fraud_type]["min_time_seconds"],
+                const.FRAUD_TYPE_DATA[fraud_type]["max_time_seconds"]
+            ))
 
+            for k in range(number_of_transactions_in_pattern):
                 TC.transaction_status = self._determine_transaction_status(True, "Botting")
 
                 # I don't deactivate the payment method here when status is declined, because the declined transaction
                 # is due to rate limits and not wrong payment when botting
 
-                transaction_start_time = transaction_start_time + timedelta(seconds=time_delta_seconds)
-                TC.transaction_timestamp = transaction_start_time
+                TC.transaction_timestamp = transaction_timestamps[k]
 
                 transaction_data = self._generate_full_single_transaction_data(
                     transaction_context=TC, local_amount=local_amount, usd_amount=usd_amount
@@ -461,8 +588,8 @@ class TransactionGenerator:
         else:
             raise ValueError(f"Fraud type {fraud_type} is not supported, See keys in FRAUD_TYPE_DATA for possible values.")
 
-    @staticmethod
     def _generate_transaction_context(
+            self,
             fraud_type: str | None,
             user_id: int,
             device_id: int,
@@ -493,9 +620,8 @@ class TransactionGenerator:
         is_fraudulent = 0 if fraud_type is None else 1
         fraud_type_str = "No Fraud" if fraud_type is None else fraud_type
 
-        # Validate country weights and select a transaction country and fitting currency
-        countries, weights = util.unpack_weighted_dict(const.COUNTRY_DATA)
-        country = random.choices(countries, weights=weights, k=1)[0]
+        # Select a transaction country and fitting currency
+        country = self.country_sampler.sample()
         currency = const.COUNTRY_DATA[country]["currency"]
 
         # Initial constants are similar in fraud and non-fraud cases.
@@ -0,0 +1,123 @@
+import numpy as np
+import psycopg2.extensions
+from datetime import timezone
+
+
+# Postgres type OIDs (pg_type.oid) as reported in cursor.description
+INT_OIDS = {20: "int64", 21: "int16", 23: "int32"}
+FLOAT_OIDS = {700: "float32", 701: "float64"}
+NUMERIC_OID = 1700
+TIMESTAMP_OID = 1114
+TIMESTAMPTZ_OID = 1184
+BOOL_OID = 16
+STRING_OIDS = {25, 1042, 1043, 2950}  # text, char, varchar, uuid
+
+COLUMNAR_OUTPUTS = ("numpy", "arrow")
+
+# NUMERIC values are parsed into Decimal objects by default. For columnar output we skip that: the NumPy path parses
+# straight to float, the Arrow path keeps the text and lets Arrow cast it to an exact decimal128.
+_NUMERIC_AS_FLOAT = psycopg2.extensions.new_type(
+    (NUMERIC_OID,), "NUMERIC_AS_FLOAT", lambda value, cursor: float(value) if value is not None else None
+)
+_NUMERIC_AS_TEXT = psycopg2.extensions.new_type(
+    (NUMERIC_OID,), "NUMERIC_AS_TEXT", lambda value, cursor: value
+)
+
+
+def register_columnar_casters(cursor, output: str) -> None:
+    """
+    Registers the NUMERIC type caster matching the columnar output on a single cursor, other cursors are unaffected.
+
+    Args:
+        cursor: psycopg2 cursor the query will run on
+        output (str): 'numpy' or 'arrow'
+    Returns:
+        None
+    Raises:
+        ValueError: If output is not one of COLUMNAR_OUTPUTS.
+    """
+    if output not in COLUMNAR_OUTPUTS:
+        raise ValueError(f"Unknown columnar output '{output}', expected one of {COLUMNAR_OUTPUTS}")
+
+    psycopg2.extensions.register_type(_NUMERIC_AS_FLOAT if output == "numpy" else _NUMERIC_AS_TEXT, cursor)
+
+
+def _transpose(description, rows: list[tuple]) -> list[list]:
+    """Turns row tuples into one list per column."""
+    if not rows:
+        return [[] for _ in description]
+    return [list(values) for values in zip(*rows)]
+
+
+def to_numpy_columns(description, rows: list[tuple]) -> dict[str, np.ndarray]:
+    """
+    Converts the rows of a plain (tuple) cursor into one NumPy array per column. Integer columns become int arrays, or
+    float64 with NaN if they contain NULLs. NUMERIC and float columns become float64, timestamps datetime64[us] with NaT
+    for NULL. Everything else is kept as object array.
+
+    Args:
+        description: cursor.description of the query
+        rows (list[tuple]): Rows returned by cursor.fetchall()
+    Returns:
+        dict[str, np.ndarray]: {column_name: array}, all arrays have the same length
+    """
+    columns = {}
+    for column, values in zip(description, _transpose(description, rows)):
+        oid = column.type_code
+        if oid in INT_OIDS:
+            dtype = "float64" if None in values else INT_OIDS[oid]
+        elif oid in FLOAT_OIDS or oid == NUMERIC_OID:
+            dtype = FLOAT_OIDS.get(oid, "float64")
+        elif oid in (TIMESTAMP_OID, TIMESTAMPTZ_OID):
+            # numpy has no time zones, timestamptz values are converted to naive UTC
+            if oid == TIMESTAMPTZ_OID:
+                values = [v.astimezone(timezone.utc).replace(tzinfo=None) if v is not None else None for v in values]
+            dtype = "datetime64[us]"
+        elif oid == BOOL_OID and None not in values:
+            dtype = "bool"
+        else:
+            dtype = object
+
+        columns[column.name] = np.array(values, dtype=dtype)
+
+    return columns
+
+
+def to_arrow_table(description, rows: list[tuple]):
+    """
+    Converts the rows of a plain (tuple) cursor into a pyarrow Table with NULLs preserved. NUMERIC(p, s) columns become
+    decimal128(p, s) (float64 if the column has no declared precision), timestamps timestamp[us] (UTC for timestamptz).
+
+    Args:
+        description: cursor.description of the query, fetched with the 'arrow' casters
+        rows (list[tuple]): Rows returned by cursor.fetchall()
+    Returns:
+        pyarrow.Table: One column per result column
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+    import pyarrow as pa  # Only needed for arrow output
+
+    arrays = []
+    for column, values in zip(description, _transpose(description, rows)):
+        oid = column.type_code
+        if oid in INT_OIDS:
+            array = pa.array(values, type=getattr(pa, INT_OIDS[oid])())
+        elif oid in FLOAT_OIDS:
+            array = pa.array(values, type=getattr(pa, FLOAT_OIDS[oid])())
+        elif oid == NUMERIC_OID:
+            target = pa.decimal128(column.precision, column.scale) if column.precision else pa.float64()
+            array = pa.array(values, type=pa.string()).cast(target)
+        elif oid == TIMESTAMP_OID:
+            array = pa.array(values, type=pa.timestamp("us"))
+        elif oid == TIMESTAMPTZ_OID:
+            array = pa.array(values, type=pa.timestamp("us", tz="UTC"))
+        elif oid == BOOL_OID:
+            array = pa.array(values, type=pa.bool_())
+        elif oid in STRING_OIDS:
+            array = pa.array(values, type=pa.string())
+        else:
+            array = pa.array(values)
+        arrays.append(array)
+
+    return pa.Table.from_arrays(arrays, names=[column.name for column in description])
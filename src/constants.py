@@ -2,6 +2,9 @@
 FEATURE_PATH = "data/features/transactions_features.parquet"
 MODEL_OUTPUT_DIR = "data/models"
 EVALUATION_OUTPUT_DIR = "data/evaluation"
+# Closed months moved out of postgres by spark/jobs/archive_job.py, one transaction_month=YYYY-MM directory per month
+ARCHIVE_PATH = "data/archive/transactions"
+BENCHMARK_PATH = "data/benchmark"
 
 # String values for approved and declined transactions
 APPROVED = "Approved"
@@ -19,6 +22,117 @@ INIT_DATA_PARAMS = {
     "max_patterns" : 12
 }
 
+# Scale factor benchmark datasets (scripts/build_benchmark_dataset.py). SF1 has 100k users and 1k merchants, every
+# other size scales linearly. Seed, as-of timestamp, shard size and conversion rates are fixed, so a scale factor
+# always produces the same dataset regardless of the machine, the number of workers or the day it is built.
+BENCHMARK_DATASET_PARAMS = {
+    "users_per_scale_factor" : 100000,
+    "merchants_per_scale_factor" : 1000,
+    "users_per_shard" : 50000,
+    "seed" : 20250101,
+    "as_of" : "2025-01-01T00:00:00"
+}
+
+# Snapshot of USD conversion rates (lean format, see CurrencyConvertor) used instead of the live API for benchmarks
+BENCHMARK_CONVERSION_RATES = {
+    "USD" : 1.0,
+    "CNY" : 7.2993,
+    "INR" : 85.6158,
+    "CAD" : 1.4382,
+    "JPY" : 157.2021,
+    "EUR" : 0.9626,
+    "GBP" : 0.7979
+}
+
+# Number of distinct Faker values drawn once per generator for the batch APIs (generate_users / generate_merchants)
+FAKER_POOL_PARAMS = {
+    "names" : 20000,
+    "companies" : 5000
+}
+
+# Sharded, reproducible dataset builds (scripts/init_data.py --shards). Every shard gets its own seed derived from seed
+SHARDED_INIT_PARAMS = {
+    "shards" : 8,
+    "users_per_chunk" : 10000,
+    "seed" : 42
+}
+
+# Connection pool sizing for pooled DatabaseManager instances. Min/Max can be overwritten with the env variables
+# POSTGRES_POOL_MIN and POSTGRES_POOL_MAX
+DB_POOL_PARAMS = {
+    "min_connections" : 1,
+    "max_connections" : 10,
+    "wait_timeout_seconds" : 30
+}
+
+# Rows per multi-row INSERT statement for the bulk insert methods in DatabaseManager
+BULK_INSERT_PAGE_SIZE = 1000
+
+# Rows fetched per network round trip by the server-side cursors of the DatabaseManager iter_* methods
+SERVER_CURSOR_ITERSIZE = 2000
+
+# Monthly partition lifecycle of the transactions table (see db/migrations/002_partition_transactions.sql).
+# Streaming only reads 30 days, retention covers the 12 months of generated history plus the current month.
+TRANSACTION_PARTITION_PARAMS = {
+    "months_ahead" : 3,
+    "retention_months" : 13
+}
+
+# Months (including the current one) that stay in postgres when archiving to ARCHIVE_PATH. Streaming reads 30 days,
+# so at least the previous month has to stay hot.
+TRANSACTION_ARCHIVE_PARAMS = {
+    "hot_months" : 2
+}
+
+# Read-through caches of cached DatabaseManager instances. Merchants are static, payment methods are invalidated
+# explicitly by insert_payment_method(s) and deactivate_payment_method, the ttl only covers writes by other processes
+LOOKUP_CACHE_PARAMS = {
+    "merchant" : {"max_size" : 10000, "ttl_seconds" : 3600},
+    "payment_method" : {"max_size" : 100000, "ttl_seconds" : 300},
+    "active_payment_method" : {"max_size" : 100000, "ttl_seconds" : 300}
+}
+
+# Write-behind sink for the streaming job (see BufferedDatabaseWriter)
+BUFFERED_WRITER_PARAMS = {
+    "max_batch_size" : 1000,
+    "flush_interval_seconds" : 1.0,
+    "max_queue_size" : 50000,
+    "enqueue_timeout_seconds" : 30,
+    "max_retries" : 3,
+    "drop_failed" : False  # Drop rows after max_retries failures instead of raising from the next flush()/close()
+}
+
+# In-memory user/device sampler of the kafka producer (see EntitySampler)
+ENTITY_SAMPLER_PARAMS = {
+    "refresh_interval_seconds" : 60
+}
+
+# KafkaProducer settings of the high throughput producer modes (see ThroughputProducer). Records are batched per
+# partition for up to linger_ms and compressed per batch, gzip needs no extra client library.
+KAFKA_PRODUCER_PARAMS = {
+    "bootstrap_servers" : "localhost:9092",
+    "linger_ms" : 20,
+    "batch_size" : 256 * 1024,
+    "compression_type" : "gzip",
+    "acks" : 1,
+    "buffer_memory" : 64 * 1024 * 1024
+}
+
+# Rate control and reporting of the high throughput producer modes
+PRODUCER_RATE_PARAMS = {
+    "burst_seconds" : 0.1,  # Sends allowed in advance after an idle period, in seconds of the target rate
+    "report_interval_seconds" : 10,
+    "queued_patterns_per_worker" : 64
+}
+
+# Historical replay producer (scripts/replay_producer.py). Parquet sources are read one time window at a time, sorted in
+# memory, so a window has to fit into memory.
+REPLAY_PARAMS = {
+    "speedup" : 1.0,  # Event time seconds per wall clock second, 0 replays as fast as possible
+    "parquet_window_hours" : 6,
+    "batch_size" : 500  # Messages handed to the producer at once when the schedule allows it
+}
+
 # Country data for User, Merchant and Transaction generation
 COUNTRY_DATA = {
     "US" : {"currency" : "USD", "weight" : 0.5},
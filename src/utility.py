@@ -2,6 +2,8 @@ import math
 from datetime import datetime, timedelta
 import random
 
+import numpy as np
+
 
 def unpack_weighted_dict(distribution_data: dict) -> tuple[list, list]:
     """
@@ -22,6 +24,94 @@ def unpack_weighted_dict(distribution_data: dict) -> tuple[list, list]:
     return keys, weights
 
 
+class WeightedSampler:
+    """
+    Draws keys with fixed weights through the alias method (Vose). The tables are built once in O(n), afterward every
+    draw costs one uniform number and one table lookup, independent of the number of keys. Build one sampler per
+    distribution and reuse it instead of calling unpack_weighted_dict and random.choices per draw.
+    """
+    def __init__(self, keys: list, weights: list, rng: np.random.Generator | None = None):
+        """
+        Args:
+            keys (list): Values that are drawn
+            weights (list): Weight per key, validated with confirm_weights
+            rng (np.random.Generator | None): Generator for all draws. Defaults to None (single draws use the random
+            module like random.choices, batch draws a new unseeded numpy Generator).
+        Raises:
+            ValueError: If keys and weights differ in length, are empty, a weight is negative or weights don't sum up to 1.
+        """
+        if not keys or len(keys) != len(weights):
+            raise ValueError(f"Expected one weight per key, got {len(keys)} keys and {len(weights)} weights")
+        if any(weight < 0 for weight in weights):
+            raise ValueError(f"Weights must not be negative, got {weights}")
+        confirm_weights(weights)
+
+        self.keys = list(keys)
+        self.weights = list(weights)
+        self.rng = rng
+        self._batch_rng = rng if rng is not None else np.random.default_rng()
+        self._key_array = np.array(self.keys)
+
+        # Vose's alias method: column i keeps key i with probability prob[i] and the key alias[i] otherwise
+        n = len(weights)
+        total = sum(weights)
+        scaled = [weight * n / total for weight in weights]
+        prob, alias = [1.0] * n, list(range(n))
+        small = [i for i, value in enumerate(scaled) if value < 1]
+        large = [i for i, value in enumerate(scaled) if value >= 1]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            prob[s], alias[s] = scaled[s], l
+            scaled[l] = scaled[l] + scaled[s] - 1
+            (small if scaled[l] < 1 else large).append(l)
+        # Leftovers are 1 up to rounding errors
+
+        self._prob, self._alias = prob, alias
+        self._prob_array, self._alias_array = np.array(prob), np.array(alias)
+
+    @classmethod
+    def from_weighted_dict(cls, distribution_data: dict, rng: np.random.Generator | None = None) -> "WeightedSampler":
+        """
+        Builds a sampler over the keys of a weighted distribution dictionary, see unpack_weighted_dict.
+
+        Args:
+            distribution_data (dict): Dictionary of weighted distribution data.
+            rng (np.random.Generator | None): Generator for all draws, see __init__.
+        Returns:
+            WeightedSampler: Sampler over the keys of distribution_data
+        Raises:
+            ValueError: If weights don't sum up to 1.
+        """
+        keys, weights = unpack_weighted_dict(distribution_data)
+        return cls(keys, weights, rng=rng)
+
+    def sample(self):
+        """
+        Draws a single key in O(1).
+
+        Returns:
+            One of the keys
+        """
+        u = (self.rng.random() if self.rng is not None else random.random()) * len(self._prob)
+        column = int(u)
+        return self.keys[column] if u - column < self._prob[column] else self.keys[self._alias[column]]
+
+    def sample_batch(self, n: int, rng: np.random.Generator | None = None) -> np.ndarray:
+        """
+        Draws n keys in one vectorized call.
+
+        Args:
+            n (int): Number of draws
+            rng (np.random.Generator | None): Generator for this draw. Defaults to None (the sampler's generator).
+        Returns:
+            np.ndarray: Drawn keys
+        """
+        u = (rng if rng is not None else self._batch_rng).random(size=n) * len(self._prob)
+        columns = u.astype("int64")
+        indices = np.where(u - columns < self._prob_array[columns], columns, self._alias_array[columns])
+        return self._key_array[indices]
+
+
 def confirm_weights(weight_list: list, tolerance: float=1e-9) -> None:
     """
     Takes a list of weights and confirms that they sum up to 1.
@@ -40,15 +130,16 @@ def confirm_weights(weight_list: list, tolerance: float=1e-9) -> None:
         raise ValueError(f"Weighting must sum to 1, got {total_weight}")
 
 
-def generate_random_past_timestamp(months: int=12) -> datetime:
+def generate_random_past_timestamp(months: int=12, now: datetime | None = None) -> datetime:
     """
     Generates a random past timestamp in the past x months.
     Args:
         months (int): Number of months prior that will be considered for the generation of the past timestamp.
+        now (datetime | None): Reference timestamp, fixed for reproducible datasets. Defaults to None (datetime.now()).
     Returns:
         datetime: The generated past timestamp.
     """
-    current_stamp = datetime.now()
+    current_stamp = now if now is not None else datetime.now()
     start_stamp = current_stamp - timedelta(days=months * 30)
     return start_stamp + timedelta(seconds=random.randint(0, int((current_stamp - start_stamp).total_seconds())))
 
@@ -63,4 +154,58 @@ def generate_random_timestamp_in_range(start: datetime, end: datetime) -> dateti
         datetime: The generated timestamp in range.
     """
     random_seconds = random.randint(0, int((end - start).total_seconds()))
-    return start + timedelta(seconds=random_seconds)
\ No newline at end of file
+    return start + timedelta(seconds=random_seconds)
+
+
+def generate_random_timestamps_in_range(
+        start: datetime, end: datetime, n: int, rng: np.random.Generator | None = None) -> list[datetime]:
+    """
+    Vectorized version of generate_random_timestamp_in_range, draws n independent timestamps with second precision.
+    Args:
+        start (datetime): Datetime object of the lower bound
+        end (datetime): Datetime object of the upper bound
+        n (int): Number of timestamps
+        rng (np.random.Generator | None): Generator to draw from. Defaults to None (a new unseeded generator).
+    Returns:
+        list[datetime]: The generated timestamps in range, in draw order (not sorted).
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    random_seconds = rng.integers(0, int((end - start).total_seconds()), size=n, endpoint=True)
+    return (np.datetime64(start, "us") + random_seconds.astype("timedelta64[s]")).tolist()
+
+
+def timestamps_from_deltas(start: datetime, delta_seconds: np.ndarray) -> list[datetime]:
+    """
+    Turns inter-arrival times into absolute timestamps: timestamp k is start + sum(delta_seconds[:k + 1]).
+    Args:
+        start (datetime): Datetime object the first delta is added to
+        delta_seconds (np.ndarray): Seconds between consecutive timestamps
+    Returns:
+        list[datetime]: Chronological timestamps with microsecond precision, one per delta.
+    """
+    offsets_us = np.rint(np.cumsum(delta_seconds) * 1_000_000).astype("int64").astype("timedelta64[us]")
+    return (np.datetime64(start, "us") + offsets_us).tolist()
+
+
+def month_start(timestamp: datetime) -> datetime:
+    """
+    Truncates a timestamp to the first day of its month at midnight.
+    Args:
+        timestamp (datetime): Timestamp to truncate
+    Returns:
+        datetime: Start of the month
+    """
+    return timestamp.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(timestamp: datetime, months: int) -> datetime:
+    """
+    Shifts the start of the month of a timestamp by a number of months. Negative values go back in time.
+    Args:
+        timestamp (datetime): Reference timestamp
+        months (int): Number of months to add
+    Returns:
+        datetime: Start of the shifted month
+    """
+    month_index = timestamp.year * 12 + timestamp.month - 1 + months
+    return datetime(month_index // 12, month_index % 12 + 1, 1)
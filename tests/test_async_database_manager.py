@@ -0,0 +1,48 @@
+import asyncio
+
+from src.AsyncDatabaseManager import AsyncDatabaseManager
+
+
+class FakePool:
+    """Answers merchant lookups like asyncpg's Pool.fetchrow, counting the queries."""
+    def __init__(self, merchants: dict[int, dict]):
+        self.merchants = merchants
+        self.queries = 0
+
+    async def fetchrow(self, query, merchant_id):
+        self.queries += 1
+        return self.merchants.get(merchant_id)
+
+
+MERCHANTS = {
+    1: {"merchant_id": 1, "merchant_name": "Acme", "country": "US", "rating": "High", "merchant_category": "Retail"},
+    2: {"merchant_id": 2, "merchant_name": "Bistro", "country": "DE", "rating": "Low", "merchant_category": "Food"},
+}
+
+
+def _manager(cached: bool = False) -> AsyncDatabaseManager:
+    dbm = AsyncDatabaseManager(cached=cached, instrumented=True)
+    dbm.pool = FakePool(MERCHANTS)
+    return dbm
+
+
+def test_fetch_merchant_infos_is_recorded_once_with_one_row_per_merchant():
+    dbm = _manager()
+
+    merchants = asyncio.run(dbm.fetch_merchant_infos([1, 2, 1, 3]))
+
+    assert merchants == {1: MERCHANTS[1], 2: MERCHANTS[2]}  # Unknown merchants are missing
+    summary = dbm.metrics.summary()
+    assert summary["fetch_merchant_infos"]["calls"] == 1
+    assert summary["fetch_merchant_infos"]["rows"] == 2
+    assert "fetch_merchant_info" not in summary
+
+
+def test_fetch_merchant_infos_serves_cached_merchants_without_query():
+    dbm = _manager(cached=True)
+
+    asyncio.run(dbm.fetch_merchant_info(1))
+    asyncio.run(dbm.fetch_merchant_infos([1, 2]))
+
+    assert dbm.pool.queries == 2
+    assert dbm.metrics.summary()["fetch_merchant_info"]["rows"] == 1
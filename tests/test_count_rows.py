@@ -0,0 +1,45 @@
+from datetime import datetime
+
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from src.DatabaseManager import _count_rows
+
+
+@pytest.mark.parametrize("result, expected", [
+    # Scalars and single rows
+    (None, 0),
+    (True, 1),
+    (False, 0),
+    (42, 1),
+    ("3f1c0d9e-2f4c-4a53-9a3c-0c1f7a0b8e11", 1),
+    ({"merchant_id": 1, "merchant_name": "Acme", "merchant_category": "Retail"}, 1),
+    # Row lists
+    ([], 0),
+    ([{"user_id": 1}, {"user_id": 2}], 2),
+    ([(1, 10), (1, 11), (2, 12)], 3),
+    # Columnar results
+    ({"user_id": np.array([1, 2, 3]), "transaction_amount_usd": np.array([1.0, 2.0, 3.0])}, 3),
+    (pa.table({"user_id": [1, 2]}), 2),
+    # Grouped histories (fetch_transaction_histories)
+    ({"user_id": {1: [{"a": 1}, {"a": 2}], 2: []}, "device_id": {7: [{"a": 3}]}}, 3),
+    ({"user_id": {}, "device_id": {}}, 0),
+    # Keyed rows (fetch_merchant_infos) and stats (fetch_user_amount_aggregates)
+    ({}, 0),
+    ({1: {"merchant_id": 1, "merchant_category": "Retail"}, 2: {"merchant_id": 2, "merchant_category": "Food"}}, 2),
+    ({
+        "24h": {"transaction_count": 2, "amount_sum": 30.0, "avg_amount": 15.0, "stddev_amount": 7.07, "decline_count": 0},
+        "7d": {"transaction_count": 0, "amount_sum": 0.0, "avg_amount": None, "stddev_amount": None, "decline_count": 0},
+    }, 2),
+    # Behavioral aggregates hold sets and scalars
+    ({
+        "merchant_categories_24h": {"Retail"},
+        "merchant_categories_30d": {"Retail", "Food"},
+        "transaction_count_24h": 1,
+        "transaction_count_30d": 4,
+        "last_transaction_timestamp": datetime(2025, 1, 1),
+    }, 1),
+])
+def test_count_rows(result, expected):
+    assert _count_rows(result) == expected
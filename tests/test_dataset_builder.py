@@ -0,0 +1,89 @@
+import json
+import shutil
+from datetime import datetime
+
+import pytest
+
+from src.DatasetBuilder import MANIFEST_FILE, ShardedDatasetBuilder, derive_seeds
+from src.constants import BENCHMARK_CONVERSION_RATES
+
+
+AS_OF = datetime(2026, 3, 1)
+CONFIG = {"n_users": 6, "n_merchants": 4, "n_shards": 2, "seed": 7, "users_per_chunk": 2}
+
+
+def _builder(output_dir, **overrides) -> ShardedDatasetBuilder:
+    return ShardedDatasetBuilder(output_dir, **{**CONFIG, **overrides}, as_of=AS_OF,
+                                 conversion_rates=BENCHMARK_CONVERSION_RATES)
+
+
+def _merged(builder: ShardedDatasetBuilder) -> dict[str, list[dict]]:
+    merged = {}
+    for table, arrow_table in builder.iter_merged():
+        merged.setdefault(table, []).extend(arrow_table.to_pylist())
+    return merged
+
+
+@pytest.fixture(scope="module")
+def reference(tmp_path_factory) -> dict[str, list[dict]]:
+    builder = _builder(tmp_path_factory.mktemp("reference"))
+    builder.build(workers=2)
+    return _merged(builder)
+
+
+def test_derive_seeds_is_deterministic():
+    assert derive_seeds(7, (0, 1)) == derive_seeds(7, (0, 1))
+    assert derive_seeds(7, (0, 1)) != derive_seeds(7, (0, 2))
+    assert derive_seeds(7, (0, 1)) != derive_seeds(8, (0, 1))
+
+
+def test_build_is_reproducible_across_worker_counts(tmp_path, reference):
+    builder = _builder(tmp_path)
+    counts = builder.build(workers=1)
+
+    merged = _merged(builder)
+    assert merged == reference
+    assert counts == {table: len(rows) for table, rows in merged.items()}
+    assert [row["user_id"] for row in merged["users"]] == list(range(1, CONFIG["n_users"] + 1))
+    assert {row["merchant_id"] for row in merged["transactions"]} <= set(range(1, CONFIG["n_merchants"] + 1))
+
+
+def test_resume_rebuilds_only_missing_shards(tmp_path, reference):
+    builder = _builder(tmp_path)
+    builder.build(workers=2)
+    shard_0_files = {path: path.stat().st_mtime_ns for path in builder.shard_dir(0).rglob("*.parquet")}
+
+    # Simulate a crash: shard 1 never finished and left its temporary directory behind
+    shutil.rmtree(builder.shard_dir(1))
+    builder.shard_dir(1).with_name(builder.shard_dir(1).name + ".tmp").mkdir()
+    manifest_path = tmp_path / MANIFEST_FILE
+    manifest = json.loads(manifest_path.read_text())
+    del manifest["shards"]["1"]
+    manifest_path.write_text(json.dumps(manifest))
+
+    resumed = ShardedDatasetBuilder(tmp_path, **CONFIG)  # as_of and rates come from the manifest
+    assert resumed.as_of == AS_OF
+    assert resumed.pending_shards() == [1]
+    resumed.build(workers=1)
+
+    assert resumed.pending_shards() == []
+    assert {path: path.stat().st_mtime_ns for path in resumed.shard_dir(0).rglob("*.parquet")} == shard_0_files
+    assert _merged(resumed) == reference
+
+
+def test_pending_shards_block_merging(tmp_path):
+    builder = _builder(tmp_path)
+
+    assert builder.pending_shards() == [0, 1]
+    with pytest.raises(RuntimeError):
+        builder.shard_id_offsets()
+
+
+def test_manifest_rejects_a_different_configuration(tmp_path):
+    builder = _builder(tmp_path)
+    builder._save_manifest()
+
+    with pytest.raises(ValueError):
+        _builder(tmp_path, seed=8)
+    with pytest.raises(ValueError):
+        ShardedDatasetBuilder(tmp_path, **CONFIG, as_of=datetime(2026, 4, 1))
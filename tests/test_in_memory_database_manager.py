@@ -0,0 +1,147 @@
+import inspect
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from src.DatabaseManager import DatabaseManager
+from src.InMemoryDatabaseManager import InMemoryDatabaseManager, InMemoryTables
+
+
+def _public_methods(cls) -> dict:
+    return {name: member for name, member in inspect.getmembers(cls, callable) if not name.startswith("_")}
+
+
+def test_in_memory_manager_has_every_database_manager_method():
+    missing = set(_public_methods(DatabaseManager)) - set(_public_methods(InMemoryDatabaseManager))
+
+    assert missing == set()
+
+
+@pytest.mark.parametrize("name", sorted(_public_methods(DatabaseManager)))
+def test_in_memory_manager_signatures_match(name):
+    def parameters(method):
+        return [(p.name, p.kind, p.default) for p in inspect.signature(method).parameters.values()]
+
+    assert parameters(getattr(InMemoryDatabaseManager, name)) == parameters(getattr(DatabaseManager, name))
+
+
+NOW = datetime.now().replace(microsecond=0)
+
+
+@pytest.fixture
+def dbm() -> InMemoryDatabaseManager:
+    dbm = InMemoryDatabaseManager(tables=InMemoryTables(), instrumented=True)
+    travel = dbm.insert_merchant({"name": "Air", "country": "US", "rating": "High", "category": "Travel"})
+    food = dbm.insert_merchant({"name": "Deli", "country": "US", "rating": "High", "category": "Groceries"})
+    crypto = dbm.insert_merchant({"name": "Coins", "country": "US", "rating": "Low", "category": "Crypto"})
+
+    def transaction(user_id, device_id, merchant_id, age, amount, status="Approved"):
+        return {"user_id": user_id, "device_id": device_id, "merchant_id": merchant_id, "payment_id": 1,
+                "transaction_amount_usd": amount, "transaction_status": status, "transaction_country": "US",
+                "transaction_channel": "online", "transaction_timestamp": NOW - age}
+
+    dbm.insert_transactions([
+        transaction(1, 10, food, timedelta(days=20), 100),
+        transaction(1, 10, travel, timedelta(days=2), 10, status="Declined"),
+        transaction(1, 11, travel, timedelta(minutes=30), 20.5),
+        transaction(1, 11, crypto, timedelta(minutes=20), 30),  # Category without a rollup bit
+        transaction(2, 11, food, timedelta(minutes=10), 5),
+    ])
+    dbm.metrics.reset()
+    return dbm
+
+
+def test_history_columns_numpy(dbm):
+    columns = dbm.fetch_user_transaction_history_columns(1, 24)
+
+    assert columns["transaction_amount_usd"].dtype == np.float64
+    assert columns["transaction_amount_usd"].tolist() == [20.5, 30.0]
+    assert columns["transaction_timestamp"].dtype == np.dtype("datetime64[us]")
+    assert columns["user_id"].dtype == np.int32
+    assert columns["merchant_category"].tolist() == ["Travel", "Crypto"]
+
+
+def test_history_columns_arrow(dbm):
+    table = dbm.fetch_transaction_histories_columns([2], 24, device_ids=[11], output="arrow")
+
+    assert table.schema.field("transaction_amount_usd").type == pa.decimal128(15, 2)
+    assert table.schema.field("transaction_timestamp").type == pa.timestamp("us")
+    # User 2 and device 11 share a row, it is returned once
+    assert table.column("transaction_amount_usd").to_pylist() == [Decimal("20.50"), Decimal("30.00"), Decimal("5.00")]
+
+
+def test_device_columns_and_unknown_output(dbm):
+    columns = dbm.fetch_device_recent_transactions_columns(11, 1)
+
+    assert list(columns) == ["device_id", "transaction_timestamp"]
+    assert len(columns["device_id"]) == 3
+    with pytest.raises(ValueError):
+        dbm.fetch_device_recent_transactions_columns(11, 1, output="pandas")
+
+
+def test_rollup_buckets(dbm):
+    daily = dbm.fetch_rollup_buckets("user", 1, 30 * 24, grain="daily")
+
+    assert [bucket["bucket_start"] for bucket in daily] == sorted(bucket["bucket_start"] for bucket in daily)
+    assert sum(bucket["transaction_count"] for bucket in daily) == 4
+    assert sum(bucket["decline_count"] for bucket in daily) == 1
+    assert sum(bucket["amount_sum"] for bucket in daily) == Decimal("160.50")
+    assert sum(bucket["amount_sumsq"] for bucket in daily) == Decimal("11420.25")
+    bits = 0
+    for bucket in daily:
+        bits |= bucket["category_bits"]
+    assert bits == (1 << 0) | (1 << 3)  # Groceries and Travel, Crypto has no bit
+    assert sum(b["transaction_count"] for b in dbm.fetch_rollup_buckets("device", 11, 24)) == 3
+    with pytest.raises(ValueError):
+        dbm.fetch_rollup_buckets("merchant", 1, 24)
+
+
+def test_amount_aggregates(dbm):
+    aggregates = dbm.fetch_user_amount_aggregates(1)
+
+    assert aggregates["24h"]["transaction_count"] == 2
+    assert aggregates["24h"]["avg_amount"] == 25.25
+    assert aggregates["7d"]["transaction_count"] == 3
+    assert aggregates["7d"]["decline_count"] == 1
+    assert aggregates["7d"]["stddev_amount"] == pytest.approx(np.std([10, 20.5, 30], ddof=1))
+    assert dbm.fetch_user_amount_aggregates(3)["7d"]["avg_amount"] is None
+
+
+def test_behavioral_aggregates(dbm):
+    aggregates = dbm.fetch_user_behavioral_aggregates(1)
+
+    assert aggregates == {
+        "merchant_categories_24h": {"Travel"},
+        "merchant_categories_30d": {"Travel", "Groceries"},
+        "transaction_count_24h": 2,
+        "transaction_count_30d": 4,
+        "last_transaction_timestamp": NOW - timedelta(minutes=20),
+    }
+
+
+def test_explain_analyze_and_partitions(dbm):
+    plan = dbm.explain_analyze("SELECT 1")
+
+    assert plan["Plan"]["Node Type"]
+    assert plan["Execution Time"] == 0.0
+    assert dbm.detach_transaction_partition("transactions_p2025_01") is None
+    assert len(dbm.fetch_user_transaction_history(1, 24 * 30)) == 4
+
+
+def test_bulk_methods_are_recorded_once(dbm):
+    dbm.insert_fraud_alerts([
+        {"transaction_id": "a", "user_id": 1, "fraud_probability": 0.9, "model_name": "m", "alerted_at": NOW},
+        {"transaction_id": "b", "user_id": 2, "fraud_probability": 0.8, "model_name": "m", "alerted_at": NOW},
+    ])
+    dbm.sync_serial_sequence("fraud_alerts", "alert_id")
+    assert len(list(dbm.iter_user_transaction_history(1, 24))) == 2
+
+    summary = dbm.metrics.summary()
+    assert summary["insert_fraud_alerts"]["calls"] == 1
+    assert summary["insert_fraud_alerts"]["rows"] == 2
+    assert summary["sync_serial_sequence"]["calls"] == 1
+    assert summary["iter_user_transaction_history"]["rows"] == 2
+    assert {"insert_fraud_alert", "fetch_max_id", "fetch_user_transaction_history"}.isdisjoint(summary)
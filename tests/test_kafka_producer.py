@@ -0,0 +1,68 @@
+import pytest
+
+import scripts.kafka_producer as kafka_producer
+from src.InMemoryDatabaseManager import InMemoryDatabaseManager, InMemoryTables
+
+
+class StopProducer(Exception):
+    pass
+
+
+class FakeKafkaProducer:
+    """Stops run_producer's endless loop after a few patterns."""
+    def __init__(self, max_flushes: int = 3, **kwargs):
+        self.sent = []
+        self.flushes = 0
+        self.max_flushes = max_flushes
+
+    def send(self, topic, value):
+        self.sent.append((topic, value))
+
+    def flush(self):
+        self.flushes += 1
+        if self.flushes >= self.max_flushes:
+            raise StopProducer()
+
+
+class FakeCurrencyConvertor:
+    def fetch_conversion_rates(self):
+        return {"USD": 1.0}
+
+
+class FakeTransactionGenerator:
+    def __init__(self, conversion_rates, db_manager):
+        pass
+
+    def generate_transaction_pattern(self, user_id, device_id, merchant_id, pattern_start_time):
+        return [{"user_id": user_id, "device_id": device_id, "merchant_id": merchant_id}]
+
+
+@pytest.fixture
+def sleeps(monkeypatch) -> list[float]:
+    dbm = InMemoryDatabaseManager(tables=InMemoryTables(), instrumented=True)
+    user_id = dbm.insert_user({"created_at": "2026-01-01T00:00:00"})
+    dbm.insert_device({"user_id": user_id, "device_type": "mobile", "first_used": None, "last_used": None})
+    dbm.insert_merchant({"name": "Air", "country": "US", "rating": "High", "category": "Travel"})
+
+    sleeps = []
+    monkeypatch.setattr(kafka_producer, "KafkaProducer", FakeKafkaProducer)
+    monkeypatch.setattr(kafka_producer.CC, "CurrencyConvertor", FakeCurrencyConvertor)
+    monkeypatch.setattr(kafka_producer.TG, "TransactionGenerator", FakeTransactionGenerator)
+    monkeypatch.setattr(kafka_producer.DBM, "create_database_manager", lambda **kwargs: dbm)
+    monkeypatch.setattr(kafka_producer.time, "sleep", sleeps.append)
+    return sleeps
+
+
+@pytest.mark.parametrize("rate", [0, -1])
+def test_run_producer_without_rate_does_not_sleep(sleeps, rate):
+    with pytest.raises(StopProducer):
+        kafka_producer.run_producer(transactions_per_second=rate)
+
+    assert sleeps == []
+
+
+def test_run_producer_sleeps_between_patterns(sleeps):
+    with pytest.raises(StopProducer):
+        kafka_producer.run_producer(transactions_per_second=4)
+
+    assert sleeps == [0.25, 0.25]
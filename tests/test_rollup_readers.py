@@ -0,0 +1,212 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from spark.features.rollup_features import apply_rollup_features
+from src.DatabaseManager import DatabaseManager
+from src.InMemoryDatabaseManager import InMemoryDatabaseManager, InMemoryTables
+
+
+AS_OF = datetime(2026, 3, 10, 12, 30)
+
+
+class FakeCursor:
+    """Returns preset rows like a RealDictCursor and keeps the executed parameters."""
+    def __init__(self, rows: list[dict]):
+        self.rows = rows
+        self.params = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, query, params=None):
+        self.params.append(params)
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeConnection:
+    def __init__(self, cursor: FakeCursor):
+        self._cursor = cursor
+
+    def cursor(self, cursor_factory=None):
+        return self._cursor
+
+
+def _manager(rows: list[dict]) -> tuple[DatabaseManager, FakeCursor]:
+    dbm = DatabaseManager(instrumented=True)
+    cursor = FakeCursor(rows)
+
+    @contextmanager
+    def get_connection():
+        yield FakeConnection(cursor)
+
+    dbm.get_connection = get_connection
+    return dbm, cursor
+
+
+def _assert_recorded(dbm: DatabaseManager, method: str, rows: int) -> None:
+    summary = dbm.metrics.summary()[method]
+    assert summary["calls"] == 1
+    assert summary["errors"] == 0
+    assert summary["rows"] == rows
+
+
+def test_fetch_rollup_buckets_through_instrumented_manager():
+    buckets = [
+        {"bucket_start": AS_OF - timedelta(hours=1), "transaction_count": 2, "amount_sum": Decimal("30.00"),
+         "amount_sumsq": Decimal("500.0000"), "decline_count": 0, "category_bits": 1},
+        {"bucket_start": AS_OF, "transaction_count": 1, "amount_sum": Decimal("5.00"),
+         "amount_sumsq": Decimal("25.0000"), "decline_count": 1, "category_bits": 4},
+    ]
+    dbm, cursor = _manager(buckets)
+
+    assert dbm.fetch_rollup_buckets("user", 7, 24) == buckets
+    assert cursor.params == [(7, 24)]
+    _assert_recorded(dbm, "fetch_rollup_buckets", rows=2)
+
+
+def test_fetch_rollup_buckets_rejects_unknown_rollup():
+    dbm, _ = _manager([])
+
+    with pytest.raises(ValueError):
+        dbm.fetch_rollup_buckets("merchant", 1, 24)
+    assert dbm.metrics.summary()["fetch_rollup_buckets"]["errors"] == 1
+
+
+def test_fetch_user_amount_aggregates_through_instrumented_manager():
+    dbm, _ = _manager([{
+        "count_24h": 2, "sum_24h": Decimal("30.00"), "sumsq_24h": Decimal("500.0000"), "declines_24h": 1,
+        "count_7d": 3, "sum_7d": Decimal("60.00"), "sumsq_7d": Decimal("1400.0000"), "declines_7d": 1,
+    }])
+
+    aggregates = dbm.fetch_user_amount_aggregates(7, as_of=AS_OF)
+
+    assert aggregates["24h"] == {"transaction_count": 2, "amount_sum": 30.0, "avg_amount": 15.0,
+                                 "stddev_amount": pytest.approx(7.0710678), "decline_count": 1}
+    assert aggregates["7d"]["avg_amount"] == 20.0
+    assert aggregates["7d"]["stddev_amount"] == pytest.approx(10.0)
+    _assert_recorded(dbm, "fetch_user_amount_aggregates", rows=2)
+
+
+def test_fetch_user_amount_aggregates_without_buckets():
+    dbm, _ = _manager([{f"{column}_{window}": None for column in ("count", "sum", "sumsq", "declines")
+                        for window in ("24h", "7d")}])
+
+    aggregates = dbm.fetch_user_amount_aggregates(7)
+
+    assert aggregates["7d"] == {"transaction_count": 0, "amount_sum": 0.0, "avg_amount": None,
+                                "stddev_amount": None, "decline_count": 0}
+
+
+def test_fetch_user_behavioral_aggregates_through_instrumented_manager():
+    dbm, _ = _manager([{
+        "merchant_categories_24h": ["Travel"], "merchant_categories_30d": ["Travel", "Groceries"],
+        "transaction_count_24h": 1, "transaction_count_30d": 4, "last_transaction_timestamp": AS_OF,
+    }])
+
+    aggregates = dbm.fetch_user_behavioral_aggregates(7, as_of=AS_OF)
+
+    assert aggregates == {
+        "merchant_categories_24h": {"Travel"}, "merchant_categories_30d": {"Travel", "Groceries"},
+        "transaction_count_24h": 1, "transaction_count_30d": 4, "last_transaction_timestamp": AS_OF,
+    }
+    _assert_recorded(dbm, "fetch_user_behavioral_aggregates", rows=1)
+
+
+def test_fetch_users_rollup_aggregates_through_instrumented_manager():
+    dbm, cursor = _manager([
+        {"user_id": 1, "transaction_count_7d": 3, "amount_sum_7d": Decimal("60.00"),
+         "merchant_categories_30d": ["Travel"], "last_transaction_timestamp": AS_OF},
+        {"user_id": 2, "transaction_count_7d": 0, "amount_sum_7d": Decimal("0"),
+         "merchant_categories_30d": [], "last_transaction_timestamp": None},
+    ])
+
+    aggregates = dbm.fetch_users_rollup_aggregates([1, 2, 1], as_of=AS_OF)
+
+    assert sorted(cursor.params[0]["user_ids"]) == [1, 2]
+    assert aggregates[1] == {"transaction_count_7d": 3, "amount_sum_7d": Decimal("60.00"),
+                             "merchant_categories_30d": {"Travel"}, "last_transaction_timestamp": AS_OF}
+    assert aggregates[2]["merchant_categories_30d"] == set()
+    _assert_recorded(dbm, "fetch_users_rollup_aggregates", rows=2)
+
+
+def test_fetch_users_rollup_aggregates_without_users_skips_the_query():
+    dbm, cursor = _manager([])
+
+    assert dbm.fetch_users_rollup_aggregates([]) == {}
+    assert cursor.params == []
+
+
+def test_in_memory_users_rollup_aggregates():
+    dbm = InMemoryDatabaseManager(tables=InMemoryTables(), instrumented=True)
+    travel = dbm.insert_merchant({"name": "Air", "country": "US", "rating": "High", "category": "Travel"})
+    food = dbm.insert_merchant({"name": "Deli", "country": "US", "rating": "High", "category": "Groceries"})
+
+    def transaction(merchant_id, ts, amount):
+        return {"user_id": 1, "device_id": 1, "merchant_id": merchant_id, "transaction_amount_usd": amount,
+                "transaction_status": "Approved", "transaction_timestamp": ts}
+
+    dbm.insert_transactions([
+        transaction(food, AS_OF - timedelta(days=20), 100),  # Only in the 30 day window
+        transaction(travel, AS_OF - timedelta(days=2), 10),
+        transaction(travel, AS_OF - timedelta(hours=1), 20),
+        transaction(food, AS_OF + timedelta(hours=2), 40),  # After as_of
+        transaction(None, AS_OF - timedelta(hours=2), 80),  # Unknown merchant, not in the rollups
+    ])
+
+    aggregates = dbm.fetch_users_rollup_aggregates([1, 2], as_of=AS_OF)
+
+    assert aggregates[1] == {
+        "transaction_count_7d": 2, "amount_sum_7d": Decimal("30.00"),
+        "merchant_categories_30d": {"Travel", "Groceries"},
+        "last_transaction_timestamp": AS_OF - timedelta(hours=1),
+    }
+    assert aggregates[2] == {"transaction_count_7d": 0, "amount_sum_7d": Decimal(0),
+                             "merchant_categories_30d": set(), "last_transaction_timestamp": None}
+    assert dbm.metrics.summary()["fetch_users_rollup_aggregates"]["rows"] == 2
+
+
+def _batch_row(ts: datetime, amount: float, category: str) -> dict:
+    return {"transaction_timestamp": ts, "transaction_amount_usd": amount, "merchant_category": category}
+
+
+def test_apply_rollup_features_adds_the_batch_to_the_aggregates():
+    current = _batch_row(AS_OF, 40.0, "Electronics")
+    batch_rows = [_batch_row(AS_OF - timedelta(minutes=5), 20.0, "Travel"), current,
+                  _batch_row(AS_OF + timedelta(minutes=5), 1000.0, "Electronics")]
+    aggregates = {"transaction_count_7d": 2, "amount_sum_7d": Decimal("60.00"),
+                  "merchant_categories_30d": {"Groceries"}, "last_transaction_timestamp": AS_OF - timedelta(days=3)}
+    spark_features = {"user_avg_amount_7d": 40.0, "user_amount_ratio_7d": 1.0, "is_new_merchant_category": 0,
+                      "seconds_since_last_transaction": 300, "user_avg_amount_24h": 30.0}
+
+    features = apply_rollup_features(spark_features, current, batch_rows, aggregates)
+
+    assert features["user_avg_amount_7d"] == 30.0  # (60 + 20 + 40) / 4, the later batch row is not counted
+    assert features["user_amount_ratio_7d"] == pytest.approx(40.0 / 30.0)
+    assert features["is_new_merchant_category"] == 1
+    assert features["seconds_since_last_transaction"] == 300  # Raw history had an earlier transaction
+    assert features["user_avg_amount_24h"] == 30.0
+    assert spark_features["user_avg_amount_7d"] == 40.0  # Input is not modified
+
+
+def test_apply_rollup_features_falls_back_to_the_last_stored_transaction():
+    current = _batch_row(AS_OF, 40.0, "Groceries")
+    aggregates = {"transaction_count_7d": 0, "amount_sum_7d": Decimal(0),
+                  "merchant_categories_30d": {"Groceries"}, "last_transaction_timestamp": AS_OF - timedelta(days=3)}
+
+    features = apply_rollup_features({"seconds_since_last_transaction": None}, current, [current], aggregates)
+
+    assert features["seconds_since_last_transaction"] == 3 * 24 * 3600
+    assert features["is_new_merchant_category"] == 0
+    assert features["user_avg_amount_7d"] == 40.0
+    assert features["user_amount_ratio_7d"] == 1.0